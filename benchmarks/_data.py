@@ -0,0 +1,56 @@
+"""
+Synthetic data and reference implementations shared by the benchmarks and their tests.
+"""
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+
+def legacy_deduplicate(embeddings: np.ndarray, threshold: float = 0.95) -> list[int]:
+    """
+    The original keep-first loop, one cosine_similarity call per candidate.
+    """
+    keep_indexes = []
+    keep_embeddings = []
+    for i, embed in enumerate(embeddings):
+        if keep_embeddings:
+            similarities = cosine_similarity([embed], keep_embeddings)[0]
+            if np.any(similarities > threshold):
+                continue
+        keep_indexes.append(i)
+        keep_embeddings.append(embed)
+    return keep_indexes
+
+
+def synthetic_embeddings(n: int, dimensions: int = 384, duplicate_rate: float = 0.3, seed: int = 0) -> np.ndarray:
+    """
+    Random unit vectors where roughly duplicate_rate of the rows are small perturbations
+    of an earlier row.
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n, dimensions)).astype(np.float32)
+    for i in range(1, n):
+        if rng.random() < duplicate_rate:
+            source = rng.integers(0, i)
+            embeddings[i] = embeddings[source] + rng.normal(0, 0.05, dimensions)
+    return embeddings
+
+
+def clustered_embeddings(n: int, dimensions: int = 384, clusters: int = 1000, spread: float = 0.6,
+                         seed: int = 0) -> np.ndarray:
+    """
+    Unit vectors drawn around random cluster centres, a rough stand-in for text embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    embeddings = np.empty((n, dimensions), dtype=np.float32)
+    for start in range(0, n, 100000):
+        end = min(n, start + 100000)
+        block = centres[rng.integers(0, clusters, end - start)]
+        block += spread * rng.standard_normal(block.shape).astype(np.float32)
+        embeddings[start:end] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return embeddings
+
+
+def recall(found: list[list[str]], expected: list[list[str]]) -> float:
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)]))
@@ -0,0 +1,135 @@
+"""
+Benchmark for document chunking.
+
+Writes a synthetic JSONL corpus of --documents long documents, each --sentences
+sentences of filler about animals with one "needle" sentence at a random position that
+only that document contains.  Then:
+
+1. Chunks the file with each strategy, streaming one line at a time through
+   Chunker.chunk_stream, and reports chunks per document, mean chunk tokens, documents
+   per second and the peak Python memory of the run.  "whole file" does the same after
+   reading every document into a list first, which is what streaming avoids.
+
+2. Stores the corpus whole and chunked in a numpy VectorStore and asks one question per
+   needle.  Dense search returns --n-results hits, collapsed to their parent documents,
+   and recall@k is the share of questions whose needle document is among the first k.
+   A whole document is embedded from its first few hundred word pieces only, so needles
+   further in cannot be found; a chunk holding the needle can.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --documents 500 --sentences 200 --chunk-size 128 --overlap 16
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from rag.chunking import Chunker, collapse_chunks
+from rag.embedding import Embedder
+from rag.vectorstore import VectorStore
+from schema.document import Document
+
+FILLER = ["The platypus lays eggs and hunts for shrimp along muddy river banks.",
+          "Crocodiles bask in the sun for hours before sliding back into the water.",
+          "Penguins dive for fish in the cold southern seas.",
+          "Owls turn their heads almost all the way around to watch for mice.",
+          "Elephants remember the routes to water holes for decades.",
+          "Hummingbirds beat their wings more than fifty times a second."]
+KEEPERS = ["zebra", "walrus", "gecko", "toucan", "bison", "lemur", "otter", "heron", "lynx", "ibis"]
+
+
+def _write_corpus(path: Path, documents: int, sentences: int, seed: int = 0) -> list[tuple[str, str]]:
+    """Write the corpus and return a (question, document id) pair per needle"""
+    rng = np.random.default_rng(seed)
+    questions = []
+    with open(path, "w") as f:
+        for i in range(documents):
+            keeper = f"{KEEPERS[i % len(KEEPERS)]} keeper number {i}"
+            body = [FILLER[j] for j in rng.integers(0, len(FILLER), sentences)]
+            body[int(rng.integers(0, sentences))] = f"The {keeper} always feeds the animals at {i % 12 + 1} o'clock."
+            f.write(json.dumps({"id": f"doc-{i}", "data": " ".join(body),
+                                "metadata": {"title": f"Zoo log {i}", "source_species": "mixed",
+                                             "data_source": "benchmark"}}) + "\n")
+            questions.append((f"When does the {keeper} feed the animals?", f"doc-{i}"))
+    return questions
+
+
+def _read(path: Path) -> Iterator[Document]:
+    with open(path) as f:
+        for line in f:
+            yield Document(**json.loads(line))
+
+
+def _chunk_run(chunker: Chunker, path: Path, whole_file: bool) -> tuple[int, float, float, int]:
+    """Chunk the corpus, returning (chunks, tokens, seconds, peak bytes)"""
+    def _chunks() -> Iterator[Document]:
+        return chunker.chunk_stream(list(_read(path)) if whole_file else _read(path))
+
+    start = time.perf_counter()
+    chunks = sum(1 for _ in _chunks())
+    seconds = time.perf_counter() - start
+    # A second pass measures memory, since tracing allocations slows chunking down
+    tracemalloc.start()
+    tokens = sum(chunker.tokenizer.count(chunk.data) for chunk in _chunks())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return chunks, tokens, seconds, peak
+
+
+def _recall(store: VectorStore, questions: list[tuple[str, str]], n_results: int, ks: list[int]) -> list[float]:
+    hits = np.zeros(len(ks))
+    batch = store.query_batch([question for question, _ in questions], n_results=n_results)
+    for (_, expected), documents in zip(questions, batch):
+        found = [doc.id for doc in collapse_chunks(documents)]
+        hits += [expected in found[:k] for k in ks]
+    return (hits / len(questions)).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--overlap", type=int, default=40)
+    parser.add_argument("--n-results", type=int, default=50)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2")
+    parser.add_argument("--skip-retrieval", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "corpus.jsonl"
+        questions = _write_corpus(path, args.documents, args.sentences)
+        print(f"{'strategy':>22} {'chunks/doc':>11} {'tokens/chunk':>13} {'docs/s':>9} {'peak MiB':>9}")
+        runs = [("sentence", False), ("token", False), ("sentence", True)]
+        for strategy, whole_file in runs:
+            chunker = Chunker(strategy, args.chunk_size, args.overlap)
+            chunks, tokens, seconds, peak = _chunk_run(chunker, path, whole_file)
+            label = f"{strategy} ({'whole file' if whole_file else 'streamed'})"
+            print(f"{label:>22} {chunks / args.documents:>11.1f} {tokens / chunks:>13.1f} "
+                  f"{args.documents / seconds:>9.1f} {peak / 2 ** 20:>9.1f}")
+        if args.skip_retrieval:
+            return
+
+        embedder = Embedder(args.embedder)
+        print(f"\n{'store':>10} {'entries':>8} {'ingest s':>9} " + " ".join(f"{f'recall@{k}':>9}" for k in args.k))
+        for strategy in ("none", "sentence", "token"):
+            store = VectorStore(embedder=embedder, persist_path=None, backend="numpy",
+                                chunker=Chunker(strategy, args.chunk_size, args.overlap))
+            start = time.perf_counter()
+            stats = store.seed_documents(path)
+            seconds = time.perf_counter() - start
+            recalls = _recall(store, questions, args.n_results, args.k)
+            print(f"{strategy:>10} {stats.added:>8} {seconds:>9.1f} " + " ".join(f"{r:>9.3f}" for r in recalls))
+
+
+if __name__ == "__main__":
+    main()
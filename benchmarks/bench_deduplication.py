@@ -0,0 +1,54 @@
+"""
+Benchmark for near-duplicate filtering.
+
+Compares the original per-document sklearn loop that Retriever.de_duplicate_documents
+used to run against the exact and SimHash engines in rag.deduplication on a synthetic
+corpus with planted near-duplicates.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_deduplication
+"""
+
+import argparse
+import time
+
+from benchmarks._data import legacy_deduplicate, synthetic_embeddings
+from rag.deduplication import greedy_deduplicate, simhash_deduplicate
+
+
+def _time(fn, *args) -> tuple[float, list[int]]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000, 5000])
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--legacy-limit", type=int, default=5000,
+                        help="Skip the legacy loop above this many candidates")
+    args = parser.parse_args()
+
+    print(f"{'n':>7} {'legacy s':>10} {'exact s':>10} {'simhash s':>10} {'speedup':>8} {'exact==legacy':>14} "
+          f"{'simhash recall':>15}")
+    for n in args.sizes:
+        embeddings = synthetic_embeddings(n)
+        exact_time, exact = _time(greedy_deduplicate, embeddings, args.threshold)
+        simhash_time, simhash = _time(simhash_deduplicate, embeddings, args.threshold)
+        if n <= args.legacy_limit:
+            legacy_time, legacy = _time(legacy_deduplicate, embeddings, args.threshold)
+            speedup = f"{legacy_time / exact_time:.1f}x"
+            matches = str(exact == legacy)
+        else:
+            legacy_time, speedup, matches = float("nan"), "-", "-"
+        dropped = set(range(n)) - set(exact)
+        simhash_dropped = set(range(n)) - set(simhash)
+        recall = len(dropped & simhash_dropped) / len(dropped) if dropped else 1.0
+        print(f"{n:>7} {legacy_time:>10.4f} {exact_time:>10.4f} {simhash_time:>10.4f} {speedup:>8} {matches:>14} "
+              f"{recall:>15.4f}")
+
+
+if __name__ == "__main__":
+    main()
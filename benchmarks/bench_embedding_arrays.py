@@ -0,0 +1,75 @@
+"""
+Benchmark for returning embeddings as NumPy arrays instead of nested lists.
+
+Compares, per batch, the old list path (encode, .tolist(), then np.array again for
+de-duplication and the index) with the array path (embed_batch_array).  The conversion
+section isolates the round-trip on random float32 matrices; the model section runs both
+paths through a real Embedder.  Time is per batch, and peak memory is the largest
+allocation tracemalloc saw while the batch was converted.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_embedding_arrays
+    python -m benchmarks.bench_embedding_arrays --batch-sizes 32 256 --model all-MiniLM-L6-v2
+
+Pass --skip-model when the model can't be loaded.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def _measure(fn, repeats: int) -> tuple[float, int]:
+    """
+    Mean seconds per call, and the peak bytes allocated by one call.
+    """
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    seconds = (time.perf_counter() - start) / repeats
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def _report(section: str, batch_size: int, path: str, seconds: float, peak: int):
+    print(f"{section:>10} {batch_size:>6} {path:>6} {seconds * 1000:>9.3f} {peak / 2 ** 10:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--skip-model", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'section':>10} {'batch':>6} {'path':>6} {'ms/batch':>9} {'peak KiB':>10}")
+    rng = np.random.default_rng(0)
+    for batch_size in args.batch_sizes:
+        matrix = rng.standard_normal((batch_size, args.dimensions)).astype(np.float32)
+        _report("conversion", batch_size, "list", *_measure(lambda: np.array(matrix.tolist()), args.repeats))
+        _report("conversion", batch_size, "array",
+                *_measure(lambda: np.ascontiguousarray(matrix, dtype=np.float32), args.repeats))
+
+    if args.skip_model:
+        return
+    from rag.embedding import Embedder
+
+    embedder = Embedder(args.model)
+    for batch_size in args.batch_sizes:
+        texts = [f"Document {i} is about animals that lay eggs and have fur." for i in range(batch_size)]
+        _report("model", batch_size, "list",
+                *_measure(lambda: np.array(embedder.embed_batch(texts)), args.repeats))
+        _report("model", batch_size, "array", *_measure(lambda: embedder.embed_batch_array(texts), args.repeats))
+
+
+if __name__ == "__main__":
+    main()
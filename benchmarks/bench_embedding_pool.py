@@ -0,0 +1,61 @@
+"""
+Benchmark for the multi-process embedding pool.
+
+Embeds a synthetic corpus in process and on pools of several worker counts, and reports
+throughput and the speed-up over the in-process encoder.  Pool start-up (spawning the
+workers and loading the model in each) is reported separately, since ingestion jobs pay
+it once.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_embedding_pool
+    python -m benchmarks.bench_embedding_pool --texts 20000 --workers 4 8 16 32
+
+On a CPU box, setting OMP_NUM_THREADS to cores / workers stops the workers' torch thread
+pools from competing for the same cores.
+"""
+
+import argparse
+import time
+
+from rag.embedding import Embedder
+from rag.model_registry import MODEL_REGISTRY
+
+
+def _corpus(n: int) -> list[str]:
+    species = ["mammal", "bird", "reptile", "fish", "amphibian"]
+    return [f"Document {i}: the {species[i % len(species)]} number {i} lives near water, "
+            f"eats {i % 7} kinds of food and raises {i % 4} young each season." for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    texts = _corpus(args.texts)
+    embedder = Embedder(args.model, pool_workers=0)
+    embedder.embed_batch_array(texts[:32])  # warm up
+    start = time.perf_counter()
+    embedder.embed_batch_array(texts)
+    baseline = time.perf_counter() - start
+
+    print(f"{'workers':>8} {'start s':>8} {'embed s':>8} {'docs/s':>9} {'speed-up':>9}")
+    print(f"{'-':>8} {'-':>8} {baseline:>8.2f} {args.texts / baseline:>9.1f} {1.0:>9.2f}")
+    for workers in args.workers:
+        pooled = Embedder(args.model, pool_workers=workers, pool_threshold=1, pool_chunk_size=args.chunk_size)
+        start = time.perf_counter()
+        pooled.embed_batch_array(texts[:workers])  # starts the pool
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        pooled.embed_batch_array(texts)
+        seconds = time.perf_counter() - start
+        print(f"{workers:>8} {startup:>8.2f} {seconds:>8.2f} {args.texts / seconds:>9.1f} {baseline / seconds:>9.2f}")
+        MODEL_REGISTRY.stop_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark for metadata filters pushed down into the vector search.
+
+Builds a NumpyIndex over random vectors whose metadata gives each document one of
+--species values, then runs the same queries three ways:
+
+- pushed:    query(where=...), which turns the filter into a bitmap with the metadata
+             index and scores only the matching rows.
+- predicate: the same exact search with the mask built by calling compile_where on every
+             row's metadata, as the index used to (exact mode only).
+- post:      an unfiltered query for --overfetch * n_results candidates, filtered
+             afterwards, as callers had to do before.
+
+For each it reports per-query latency and recall: the share of the n_results true
+filtered neighbours that were returned.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_filtered_retrieval
+    python -m benchmarks.bench_filtered_retrieval --size 200000 --species 2 10 50 --mode hnsw
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from rag.vector_index import NumpyIndex, compile_where
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--species", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=5)
+    parser.add_argument("--mode", default="exact", choices=["exact", "ivf", "hnsw"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.size, args.dimensions)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dimensions)).astype(np.float32)
+    ids = [str(i) for i in range(args.size)]
+
+    print(f"{'species':>8} {'way':>10} {'ms/query':>9} {'recall':>7}")
+    for species in args.species:
+        index = NumpyIndex(mode=args.mode)
+        index.add(ids, vectors, [{"species": f"s{i % species}", "title": f"Doc {i}"} for i in range(args.size)])
+        where = {"species": "s0"}
+        allowed = np.flatnonzero(np.arange(args.size) % species == 0)
+        reference = NumpyIndex(mode="exact")
+        reference.add([ids[row] for row in allowed], vectors[allowed])
+        truth = [set(found) for found in reference.query(queries, args.n_results, include=[])['ids']]
+
+        def pushed():
+            return index.query(queries, args.n_results, where=where, include=[])['ids']
+
+        def predicate():
+            matches = compile_where(where)
+            mask = index._alive[:index._size].copy()
+            for row in np.flatnonzero(mask):
+                mask[row] = matches(index._metadatas[row])
+            return [[ids[row] for row in rows] for rows, _ in index._exact_search(queries, args.n_results, mask)]
+
+        def post():
+            found = index.query(queries, args.n_results * args.overfetch, include=["metadatas"])
+            return [[id for id, metadata in zip(row_ids, metadatas) if metadata["species"] == "s0"][:args.n_results]
+                    for row_ids, metadatas in zip(found['ids'], found['metadatas'])]
+
+        ways = [("pushed", pushed), ("post", post)]
+        if args.mode == "exact":
+            ways.insert(1, ("predicate", predicate))
+        for name, run in ways:
+            start = time.perf_counter()
+            found = run()
+            latency = (time.perf_counter() - start) / args.queries
+            recall = np.mean([len(truth_ids & set(row_ids)) / len(truth_ids)
+                              for truth_ids, row_ids in zip(truth, found)])
+            print(f"{species:>8} {name:>10} {latency * 1000:>9.3f} {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark for dense, lexical and hybrid candidate search.
+
+Seeds a numpy-backed VectorStore with the seed data and runs a fixed set of species
+questions, some naming the animal and some using a synonym.  For each candidate count it
+reports per-query latency and hit@n: the share of questions whose expected document is
+among the candidates handed to the cross-encoder.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_hybrid_retrieval
+    python -m benchmarks.bench_hybrid_retrieval --model all-MiniLM-L6-v2 --n-results 1 2 3 5
+"""
+
+import argparse
+import time
+
+from rag.embedding import Embedder
+from rag.vectorstore import QUERY_MODES, VectorStore
+
+# (question, id of the document that answers it)
+QUESTIONS = [
+    ("Do platypuses lay eggs?", "3"),
+    ("Are penguins flightless?", "9"),
+    ("Does a horse have live young?", "2"),
+    ("Tell me about crocodiles", "6"),
+    ("What is special about bats?", "15"),
+    ("Do kangaroos carry their young in pouches?", "5"),
+    ("Where do turtles lay their eggs?", "16"),
+    ("Do salmon migrate upstream?", "7"),
+    ("Can lizards regrow their tails?", "12"),
+    ("Which animal's male carries the eggs?", "20"),
+    ("Does a mare give birth to live young?", "2"),
+    ("Do macropods carry their young in pouches?", "5"),
+    ("Do cetaceans nurse their calves?", "19"),
+    ("Do crocodilians lay eggs?", "6"),
+    ("Which reptiles are oviparous?", "6"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--n-results", type=int, nargs="+", default=[1, 2, 3, 5])
+    args = parser.parse_args()
+
+    store = VectorStore(embedder=Embedder(args.model), persist_path=None, backend="numpy")
+    store.seed_documents()
+    queries = [question for question, _ in QUESTIONS]
+    store.query_batch(queries, 1)  # warm the query embedding cache
+
+    print(f"{'mode':>8} {'n':>3} {'ms/query':>9} {'hit@n':>6}")
+    for mode in QUERY_MODES:
+        for n_results in args.n_results:
+            start = time.perf_counter()
+            found = [store.query(question, n_results, mode=mode) for question in queries]
+            latency = (time.perf_counter() - start) / len(queries)
+            hits = sum(expected in [doc.id for doc in documents]
+                       for (_, expected), documents in zip(QUESTIONS, found))
+            print(f"{mode:>8} {n_results:>3} {latency * 1000:>9.3f} {hits / len(QUESTIONS):>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for the ONNX Runtime inference backend.
+
+Embeds a synthetic corpus and scores (query, document) pairs with the embedder and the
+cross-encoder on eager PyTorch, on ONNX Runtime and on ONNX Runtime with dynamic int8
+quantization.  For each it reports the load time (which includes the one-off ONNX export
+and quantization when the graph is not yet in ONNX_MODEL_DIR), throughput, the speed-up
+over PyTorch, and parity with the PyTorch outputs: the lowest embedding cosine similarity
+and the largest cross-encoder score difference.
+
+The ONNX backend needs the optional Optimum dependency:
+
+    pip install "sentence-transformers[onnx]"
+
+Run from the repository root:
+
+    python -m benchmarks.bench_inference_backend
+    python -m benchmarks.bench_inference_backend --texts 4000 --threads 1 4 --quantization avx512_vnni
+
+Pin torch to the same thread count (e.g. OMP_NUM_THREADS=4) for a like-for-like comparison.
+"""
+
+import argparse
+import time
+
+from benchmarks.bench_embedding_pool import _corpus
+from rag.embedding import Embedder
+from rag.inference_backend import compare_outputs, variant_name
+from rag.model_registry import MODEL_REGISTRY
+
+
+def _throughput(run, items: int) -> tuple[float, object]:
+    run()  # warm up
+    start = time.perf_counter()
+    outputs = run()
+    return items / (time.perf_counter() - start), outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[None])
+    parser.add_argument("--quantization", default="int8")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2")
+    parser.add_argument("--ranker", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    args = parser.parse_args()
+
+    texts = _corpus(args.texts)
+    pairs = [("Which animals live near water?", text) for text in texts]
+    variants = [("torch", None, None)]
+    for threads in args.threads:
+        variants.append(("onnx", None, threads))
+        variants.append(("onnx", args.quantization, threads))
+
+    print(f"{'model':>14} {'variant':>34} {'load s':>7} {'items/s':>9} {'speed-up':>9} {'cosine':>8} {'max diff':>9}")
+    reference = {}
+    for kind in ("embedder", "cross-encoder"):
+        for backend, quantization, threads in variants:
+            start = time.perf_counter()
+            if kind == "embedder":
+                embedder = Embedder(args.embedder, backend=backend, quantization=quantization, threads=threads)
+                run = lambda: embedder.model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+            else:
+                ranker = MODEL_REGISTRY.cross_encoder(args.ranker, backend=backend, quantization=quantization,
+                                                      threads=threads)
+                run = lambda: ranker.predict(pairs, batch_size=args.batch_size)
+            load_seconds = time.perf_counter() - start
+            throughput, outputs = _throughput(run, len(texts))
+            reference.setdefault(kind, (throughput, outputs))
+            parity = compare_outputs(reference[kind][1], outputs)
+            print(f"{kind:>14} {variant_name(backend, quantization, threads):>34} {load_seconds:>7.2f} "
+                  f"{throughput:>9.1f} {throughput / reference[kind][0]:>8.2f}x "
+                  f"{parity.min_cosine:>8.5f} {parity.max_abs_diff:>9.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark for length-bucketed batching.
+
+Builds a synthetic corpus that mixes short chunks (about --short-words words) with long
+ones (about --long-words words, truncated to the model's maximum sequence length), then
+embeds it and scores (query, chunk) pairs three ways:
+
+- input order:   fixed batches of --batch-size in corpus order, one call each, so every
+                 batch is padded to whichever long chunk it happens to contain.
+- library sort:  one call with --batch-size; sentence-transformers sorts by character
+                 count and cuts fixed-size batches.
+- buckets N:     rag.length_bucketing, sorted by token count and cut into buckets of at
+                 most N padded tokens.
+
+For each it reports throughput, the speed-up over input order, and padding efficiency:
+the share of computed token positions that hold real tokens.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_length_bucketing
+    python -m benchmarks.bench_length_bucketing --texts 4000 --short-share 0.9 --max-tokens 4096 16384
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+from rag.length_bucketing import (encode_bucketed, fixed_batches, length_buckets, max_sequence_length,
+                                  padding_efficiency, predict_bucketed, token_lengths)
+
+WORDS = ("the platypus lays eggs and hunts for shrimp and insect larvae along the muddy banks of slow "
+         "rivers while crocodiles bask in the sun and penguins dive for fish in cold southern seas").split()
+
+
+def _corpus(n: int, short_share: float, short_words: int, long_words: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n):
+        words = short_words if rng.random() < short_share else long_words
+        texts.append(" ".join(rng.choice(WORDS, max(1, int(rng.normal(words, words / 5))))))
+    return texts
+
+
+def _library_batches(texts: list[str], batch_size: int) -> list[np.ndarray]:
+    """The batches sentence-transformers forms: sorted by character count, fixed size"""
+    order = np.argsort([-len(text) for text in texts], kind="stable")
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def _time(run) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--short-share", type=float, default=0.8)
+    parser.add_argument("--short-words", type=int, default=20)
+    parser.add_argument("--long-words", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[4096, 16384])
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2")
+    parser.add_argument("--ranker", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    args = parser.parse_args()
+
+    texts = _corpus(args.texts, args.short_share, args.short_words, args.long_words)
+    pairs = [("Which animals lay eggs near rivers?", text) for text in texts]
+    embedder = SentenceTransformer(args.embedder)
+    ranker = CrossEncoder(args.ranker)
+    embedder.encode(texts[:args.batch_size])  # warm up
+    ranker.predict(pairs[:args.batch_size])
+
+    print(f"{'model':>14} {'batching':>16} {'texts/s':>9} {'speed-up':>9} {'padding eff':>12}")
+    for kind, model in (("embedder", embedder), ("cross-encoder", ranker)):
+        if kind == "embedder":
+            lengths = token_lengths(model.tokenizer, texts, max_sequence_length(model))
+            call = lambda indexes, batch_size: model.encode([texts[i] for i in indexes], batch_size=batch_size)
+            bucketed = lambda max_tokens: encode_bucketed(model, texts, max_tokens)
+        else:
+            lengths = token_lengths(model.tokenizer, [query for query, _ in pairs], max_sequence_length(model),
+                                    texts)
+            call = lambda indexes, batch_size: model.predict([pairs[i] for i in indexes], batch_size=batch_size)
+            bucketed = lambda max_tokens: predict_bucketed(model, pairs, max_tokens)
+        batches = fixed_batches(len(texts), args.batch_size)
+        ways = [("input order", lambda: [call(batch, args.batch_size) for batch in batches], batches),
+                ("library sort", lambda: call(range(len(texts)), args.batch_size),
+                 _library_batches(texts, args.batch_size))]
+        for max_tokens in args.max_tokens:
+            ways.append((f"buckets {max_tokens}", lambda max_tokens=max_tokens: bucketed(max_tokens),
+                         length_buckets(lengths, max_tokens)))
+        baseline = None
+        for name, run, way_batches in ways:
+            throughput = len(texts) / _time(run)
+            baseline = baseline or throughput
+            print(f"{kind:>14} {name:>16} {throughput:>9.1f} {throughput / baseline:>8.2f}x "
+                  f"{padding_efficiency(lengths, way_batches):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
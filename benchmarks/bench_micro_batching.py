@@ -0,0 +1,85 @@
+"""
+Benchmark for micro-batching concurrent retrievals.
+
+Runs --requests retrieve() calls from thread pools of several sizes, once with each call
+doing its own query encode and cross-encoder predict and once with micro-batching, which
+merges the model calls of concurrent retrievals.  Every request uses a distinct query
+text, so neither the query embedding cache nor the rerank cache can answer it.  For each
+it reports throughput, median and 99th percentile latency, and the query encode and
+cross-encoder predict calls made per query.  Without micro-batching that is one of each.
+
+A lone request waits up to --max-wait-ms at each of the two stages, so micro-batching
+only pays off once several retrievals run at the same time.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_micro_batching
+    python -m benchmarks.bench_micro_batching --threads 1 16 64 --requests 512 --max-wait-ms 2 10
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.bench_rerank_cascade import labelled_queries
+from rag.retriever import Retriever
+
+
+def _run(retriever: Retriever, queries: list[str], threads: int, n_results: int) -> tuple[float, np.ndarray]:
+    def _retrieve(query: str) -> float:
+        start = time.perf_counter()
+        retriever.retrieve(query, n_results=n_results, threshold=-1)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        latencies = np.array(list(executor.map(_retrieve, queries)))
+    return len(queries) / (time.perf_counter() - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[5.0])
+    parser.add_argument("--max-queries", type=int, default=64)
+    parser.add_argument("--max-pairs", type=int, default=512)
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2")
+    parser.add_argument("--ranker", default="cross-encoder/ms-marco-MiniLM-L-12-v2")
+    args = parser.parse_args()
+
+    retriever = Retriever(args.embedder, args.ranker, micro_batching=False)
+    retriever.vector_store.seed_documents()
+    base_queries = [query for query, _, _ in labelled_queries()]
+    run = 0
+
+    def _queries() -> list[str]:
+        nonlocal run
+        run += 1
+        return [f"{base_queries[i % len(base_queries)]} ({run}.{i})" for i in range(args.requests)]
+
+    _run(retriever, _queries()[:8], 1, args.n_results)  # warm up
+    print(f"{'threads':>7} {'batching':>14} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'encodes/q':>10} {'predicts/q':>11}")
+    for threads in args.threads:
+        for max_wait_ms in [None] + args.max_wait_ms:
+            if max_wait_ms is None:
+                retriever.stop_micro_batching()
+                label = "off"
+            else:
+                retriever.start_micro_batching(args.max_queries, args.max_pairs, max_wait_ms)
+                label = f"{max_wait_ms:g} ms"
+            throughput, latencies = _run(retriever, _queries(), threads, args.n_results)
+            stats = list(retriever.micro_batch_stats().values())
+            encodes, predicts = (stats[0].batches, stats[1].batches) if stats else (len(latencies), len(latencies))
+            print(f"{threads:>7} {label:>14} {throughput:>10.1f} {np.percentile(latencies, 50) * 1000:>8.1f} "
+                  f"{np.percentile(latencies, 99) * 1000:>8.1f} {encodes / len(latencies):>10.2f} "
+                  f"{predicts / len(latencies):>11.2f}")
+    retriever.stop_micro_batching()
+
+
+if __name__ == "__main__":
+    main()
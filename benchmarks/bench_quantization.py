@@ -0,0 +1,85 @@
+"""
+Benchmark for quantized NumpyIndex storage.
+
+Builds float32, float16 and int8 NumpyIndex instances over the seed corpus and a synthetic
+clustered corpus, then reports the RAM taken by the vectors, per-query latency and
+recall@k against float32 exact search, with and without full-precision rescoring.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_quantization
+    python -m benchmarks.bench_quantization --sizes 100000 --mode ivf --model all-MiniLM-L6-v2
+
+The seed corpus is embedded with --model and queried with the document titles; pass
+--skip-seed when the model can't be loaded.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks._data import clustered_embeddings, recall
+from benchmarks.bench_vector_index import _search
+from rag.vector_index import DEFAULT_RESCORE_FACTOR, NumpyIndex
+from rag.vectorstore import SEED_DATA_PATH
+
+
+def _seed_corpus(model_name: str, seed_path=SEED_DATA_PATH) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Embed the seed documents, and their titles as queries.
+    """
+    from rag.embedding import Embedder
+
+    with open(seed_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    embedder = Embedder(model_name)
+    corpus = np.asarray(embedder.embed_batch([record['data'] for record in records]), dtype=np.float32)
+    queries = np.asarray(embedder.embed_batch([record['metadata']['title'] for record in records]), dtype=np.float32)
+    return corpus, queries
+
+
+def _benchmark(name: str, corpus: np.ndarray, queries: np.ndarray, args):
+    ids = [str(i) for i in range(len(corpus))]
+    k = min(args.k, len(corpus))
+    exact = NumpyIndex(mode="exact")
+    exact.add(ids=ids, embeddings=corpus)
+    _, expected = _search(lambda q: exact.query(q, k, include=[]), queries)
+
+    for quantization in (None, "float16", "int8"):
+        for rescore_factor in ((0,) if quantization is None else (0, args.rescore_factor)):
+            index = NumpyIndex(mode=args.mode, quantization=quantization, rescore_factor=rescore_factor,
+                               exact_search_limit=0)
+            index.add(ids=ids, embeddings=corpus)
+            index.query(queries[:1], k, include=[])  # trains the IVF clusters outside the timing
+            latency, found = _search(lambda q: index.query(q, k, include=[]), queries)
+            memory = index.memory_usage()
+            print(f"{name:>10} {len(corpus):>8} {quantization or 'float32':>8} {rescore_factor:>7} "
+                  f"{memory.resident_bytes / 2 ** 10:>8.1f} {memory.saved_fraction:>6.1%} "
+                  f"{latency * 1000:>9.3f} {recall(found, expected):>9.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--mode", choices=("exact", "ivf", "hnsw"), default="exact")
+    parser.add_argument("--rescore-factor", type=int, default=DEFAULT_RESCORE_FACTOR)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedder for the seed corpus")
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'corpus':>10} {'n':>8} {'storage':>8} {'rescore':>7} {'RAM KiB':>8} {'saved':>6} "
+          f"{'ms/query':>9} {'recall@k':>9}")
+    if not args.skip_seed:
+        _benchmark("seed", *_seed_corpus(args.model), args)
+    for n in args.sizes:
+        embeddings = clustered_embeddings(n + args.queries, args.dimensions)
+        _benchmark("synthetic", embeddings[:n], embeddings[n:], args)
+
+
+if __name__ == "__main__":
+    main()
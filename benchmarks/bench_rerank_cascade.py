@@ -0,0 +1,99 @@
+"""
+Benchmark for the cascaded cross-encoder rerank.
+
+Runs the labelled queries of the direct-retrieval and synonym tests in
+tests/test_retrieval.py through one Retriever under several rerank configurations: the
+heavy cross-encoder over every candidate, and cascades whose cheap first stage (bi-encoder
+cosine similarity or a small cross-encoder) passes the top m candidates on, with and
+without early exit (the small cross-encoder only, since cosine similarities are not on
+the threshold's scale).  For each it reports per-query rerank latency (the rerank cache is
+cleared first), heavy-model pairs per query, early exits, and hit@1: the share of queries
+whose expected document is ranked first.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rerank_cascade
+    python -m benchmarks.bench_rerank_cascade --top-m 3 5 --cheap-ranker cross-encoder/ms-marco-TinyBERT-L-2-v2
+"""
+
+import argparse
+import time
+
+from rag.cache import RerankScoreCache
+from rag.model_registry import MODEL_REGISTRY
+from rag.retriever import BI_ENCODER_RANKER, CascadeStats, Retriever
+from tests import test_retrieval
+
+
+def labelled_queries() -> list[tuple[str, str, float]]:
+    """
+    (query, expected document text, threshold) for each parametrized retrieval test case.
+    """
+    queries = []
+    for test in (test_retrieval.test_direct_retrieval_should_return_expected_data,
+                 test_retrieval.test_retrieval_synonym):
+        for mark in test.pytestmark:
+            if mark.name != "parametrize":
+                continue
+            names = [name.strip() for name in mark.args[0].split(",")]
+            for values in mark.args[1]:
+                case = dict(zip(names, values))
+                queries.append((case["query"], case["expected_data"], case.get("threshold", 0.5)))
+    return queries
+
+
+def _configure(retriever: Retriever, cascade_ranker_name, top_m: int, early_exit: bool):
+    retriever.cascade_ranker_name = cascade_ranker_name
+    retriever.cascade_ranker = (MODEL_REGISTRY.cross_encoder(cascade_ranker_name)
+                                if cascade_ranker_name not in (None, BI_ENCODER_RANKER) else None)
+    retriever.cascade_top_m = top_m
+    retriever.early_exit = early_exit
+    retriever.cascade_stats = CascadeStats()
+    retriever.rerank_cache = RerankScoreCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--top-m", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2")
+    parser.add_argument("--heavy-ranker", default="cross-encoder/ms-marco-MiniLM-L-12-v2")
+    parser.add_argument("--cheap-ranker", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    args = parser.parse_args()
+
+    retriever = Retriever(args.embedder, args.heavy_ranker, cascade_ranker_name=None)
+    retriever.vector_store.seed_documents()
+    cases = labelled_queries()
+    queries = [query for query, _, _ in cases]
+    candidates = [retriever.de_duplicate_documents(documents) for documents in
+                  retriever.vector_store.query_batch(queries, args.n_results, include_embeddings=True)]
+    MODEL_REGISTRY.cross_encoder(args.cheap_ranker)
+
+    configurations = [("heavy only", None, args.n_results, False)]
+    for cheap in (BI_ENCODER_RANKER, args.cheap_ranker):
+        label = "bi-encoder" if cheap == BI_ENCODER_RANKER else cheap.rsplit("/", 1)[-1]
+        for top_m in args.top_m:
+            configurations.append((f"{label} m={top_m}", cheap, top_m, False))
+            if cheap != BI_ENCODER_RANKER:
+                # Cosine similarities are not on the threshold's scale, see Retriever
+                configurations.append((f"{label} m={top_m} exit", cheap, top_m, True))
+
+    print(f"{'configuration':>36} {'ms/query':>9} {'heavy/q':>8} {'exits':>6} {'hit@1':>6}")
+    for name, cheap, top_m, early_exit in configurations:
+        _configure(retriever, cheap, top_m, early_exit)
+        retriever.rerank_batch(queries[:1], candidates[:1])  # warm up
+        _configure(retriever, cheap, top_m, early_exit)
+        hits = 0
+        start = time.perf_counter()
+        for query, documents, (_, expected, threshold) in zip(queries, candidates, cases):
+            ranked = retriever.rerank_batch([query], [list(documents)], threshold)[0]
+            hits += bool(ranked) and ranked[0].data == expected
+        latency = (time.perf_counter() - start) / len(queries)
+        stats = retriever.cascade_stats
+        heavy_pairs = stats.heavy_pairs if cheap else sum(len(documents) for documents in candidates)
+        print(f"{name:>36} {latency * 1000:>9.2f} {heavy_pairs / len(queries):>8.1f} "
+              f"{stats.early_exits:>6} {hits / len(queries):>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark for the vector index backends.
+
+Builds a ChromaDB collection and NumpyIndex instances in exact, IVF and HNSW mode over a
+synthetic clustered corpus, then reports build time, per-query latency and recall@k
+against exact search for several search breadths (nprobe for IVF, ef for HNSW).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_vector_index
+    python -m benchmarks.bench_vector_index --sizes 10000 100000 1000000 --hnsw-limit 20000
+
+The NumpyIndex HNSW graph is built in Python, roughly 2-5ms per vector, so it is skipped
+above --hnsw-limit vectors.
+"""
+
+import argparse
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+from benchmarks._data import clustered_embeddings, recall
+from rag.vector_index import NumpyIndex
+
+
+def _search(search, queries: np.ndarray) -> tuple[float, list[list[str]]]:
+    """
+    Run queries one at a time, as the retriever does, returning mean latency and the ids found.
+    """
+    ids = []
+    start = time.perf_counter()
+    for query in queries:
+        ids.append(search(query[None, :])['ids'][0])
+    return (time.perf_counter() - start) / len(queries), ids
+
+
+def _build_chroma(ids: list[str], embeddings: np.ndarray):
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"bench-{uuid.uuid4().hex}")
+    batch = client.get_max_batch_size()
+    for start in range(0, len(ids), batch):
+        collection.add(ids=ids[start:start + batch], embeddings=embeddings[start:start + batch])
+    return collection
+
+
+def _build_numpy(ids: list[str], embeddings: np.ndarray, **params) -> NumpyIndex:
+    index = NumpyIndex(exact_search_limit=0, **params)
+    index.add(ids=ids, embeddings=embeddings)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--hnsw-limit", type=int, default=20000,
+                        help="Skip the NumpyIndex HNSW mode above this many vectors")
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'n':>8} {'backend':>8} {'mode':>6} {'param':>10} {'build s':>8} {'ms/query':>9} {'recall@k':>9}")
+    for n in args.sizes:
+        embeddings = clustered_embeddings(n + args.queries, args.dimensions)
+        corpus, queries = embeddings[:n], embeddings[n:]
+        ids = [str(i) for i in range(n)]
+
+        def report(backend, mode, param, build, latency, found):
+            print(f"{n:>8} {backend:>8} {mode:>6} {param:>10} {build:>8.2f} {latency * 1000:>9.3f} "
+                  f"{recall(found, expected):>9.4f}")
+
+        start = time.perf_counter()
+        exact = _build_numpy(ids, corpus, mode="exact")
+        build = time.perf_counter() - start
+        latency, expected = _search(lambda q: exact.query(q, args.k, include=[]), queries)
+        report("numpy", "exact", "-", build, latency, expected)
+
+        start = time.perf_counter()
+        ivf = _build_numpy(ids, corpus, mode="ivf")
+        ivf.query(queries[:1], args.k, include=[])  # trains the clusters
+        build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            latency, found = _search(lambda q: ivf.query(q, args.k, include=[], nprobe=nprobe), queries)
+            report("numpy", "ivf", f"nprobe={nprobe}", build, latency, found)
+
+        if n <= args.hnsw_limit:
+            start = time.perf_counter()
+            hnsw = _build_numpy(ids, corpus, mode="hnsw")
+            build = time.perf_counter() - start
+            for ef in args.ef:
+                latency, found = _search(lambda q: hnsw.query(q, args.k, include=[], ef=ef), queries)
+                report("numpy", "hnsw", f"ef={ef}", build, latency, found)
+
+        if not args.skip_chroma:
+            start = time.perf_counter()
+            collection = _build_chroma(ids, corpus)
+            build = time.perf_counter() - start
+            latency, found = _search(lambda q: collection.query(query_embeddings=q, n_results=args.k, include=[]),
+                                     queries)
+            report("chroma", "hnsw", "default", build, latency, found)
+
+
+if __name__ == "__main__":
+    main()
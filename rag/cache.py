@@ -0,0 +1,259 @@
+"""
+Cache module for RAG (Retrieval-Augmented Generation) system.
+
+This module provides the bounded, thread-safe caches used on the retrieval hot path:
+
+- LRUCache: a generic least-recently-used cache with an optional time-to-live and
+  hit-rate statistics.
+- RerankScoreCache: cross-encoder scores keyed by (query, document id, content hash),
+  which can be invalidated per document when the vector store changes.
+
+It also provides the key helpers: normalize_text for query text and content_hash for
+documents, which the vector store records to detect changed documents at ingestion.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from rag.config import RERANK_CACHE_SIZE, RERANK_CACHE_TTL_SECONDS
+from schema.document import Document
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for use in a cache key by collapsing runs of whitespace.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The text with leading, trailing and repeated whitespace removed.
+    """
+    return " ".join(text.split())
+
+
+def content_hash(document: Document) -> str:
+    """
+    Hash the parts of a document that end up in the index.
+
+    Args:
+        document (Document): The document to hash.
+
+    Returns:
+        str: A hex digest that changes whenever the document's data or metadata change.
+    """
+    # Unset chunk fields are left out so documents stored whole keep their earlier hash
+    metadata = document.metadata.model_dump(exclude_none=True)
+    payload = json.dumps({'data': document.data, 'metadata': metadata}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters for a cache.
+
+    Attributes:
+        hits (int): Lookups that found a live entry.
+        misses (int): Lookups that found nothing or an expired entry.
+        evictions (int): Entries dropped to stay within the size limit.
+        expirations (int): Entries dropped because their time-to-live passed.
+        invalidations (int): Entries dropped explicitly.
+    """
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Fraction of lookups that were hits, 0 when there were no lookups.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with an optional time-to-live.
+
+    Attributes:
+        max_size (int): Maximum number of entries before the least recently used is evicted.
+        ttl_seconds (Optional[float]): Seconds an entry stays valid, None for no expiry.
+        stats (CacheStats): Hit, miss and eviction counters.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size (int): Maximum number of entries. Defaults to 1024.
+            ttl_seconds (Optional[float]): Time-to-live of an entry. Defaults to None (no expiry).
+            clock (Callable[[], float]): Time source, injectable for tests.
+                                         Defaults to time.monotonic.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the cached value for a key and mark it as recently used.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any): Value returned on a miss. Defaults to None.
+
+        Returns:
+            Any: The cached value, or default if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            value, stored_at = entry
+            if self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> list[Hashable]:
+        """
+        Store a value, evicting least recently used entries if the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+
+        Returns:
+            list[Hashable]: The keys that were evicted to make room.
+        """
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_size:
+                evicted_key, _ = self._entries.popitem(last=False)
+                evicted.append(evicted_key)
+                self.stats.evictions += 1
+            return evicted
+
+    def invalidate(self, keys: Iterable[Hashable]) -> int:
+        """
+        Drop entries from the cache.
+
+        Args:
+            keys (Iterable[Hashable]): Keys to drop.  Missing keys are ignored.
+
+        Returns:
+            int: The number of entries dropped.
+        """
+        with self._lock:
+            dropped = 0
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    dropped += 1
+            self.stats.invalidations += dropped
+            return dropped
+
+    def clear(self):
+        """
+        Drop every entry.  Statistics are kept.
+        """
+        with self._lock:
+            self.stats.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class RerankScoreCache:
+    """
+    Cache of cross-encoder scores for (query, document) pairs.
+
+    Scores are keyed by the ranker model, the normalized query, the document id and the
+    document's content hash, so an edited document never reuses a stale score.  Entries
+    for a document can also be dropped explicitly when the vector store changes it.
+
+    Attributes:
+        cache (LRUCache): The underlying bounded cache.
+    """
+
+    def __init__(self, max_size: int = RERANK_CACHE_SIZE, ttl_seconds: Optional[float] = RERANK_CACHE_TTL_SECONDS):
+        """
+        Initialize an empty score cache.
+
+        Args:
+            max_size (int): Maximum number of scores kept. Defaults to RERANK_CACHE_SIZE.
+            ttl_seconds (Optional[float]): Time-to-live of a score.
+                                           Defaults to RERANK_CACHE_TTL_SECONDS.
+        """
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._keys_by_document: dict[str, set[tuple]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    @staticmethod
+    def key(model_name: str, query: str, document_id: str, document_hash: str) -> tuple:
+        """
+        Build the cache key for a (query, document) pair.
+        """
+        return (model_name, normalize_text(query), document_id, document_hash)
+
+    def get(self, key: tuple) -> Optional[float]:
+        """
+        Return the cached score for a key, or None.
+        """
+        return self.cache.get(key)
+
+    def put(self, key: tuple, score: float):
+        """
+        Store a score and index it by document id for invalidation.
+        """
+        evicted = self.cache.put(key, score)
+        with self._lock:
+            self._keys_by_document.setdefault(key[2], set()).add(key)
+            for evicted_key in evicted:
+                keys = self._keys_by_document.get(evicted_key[2])
+                if keys is not None:
+                    keys.discard(evicted_key)
+                    if not keys:
+                        del self._keys_by_document[evicted_key[2]]
+
+    def invalidate_documents(self, document_ids: Iterable[str]) -> int:
+        """
+        Drop every cached score for the given documents.
+
+        Args:
+            document_ids (Iterable[str]): Ids of documents that were added, changed or deleted.
+
+        Returns:
+            int: The number of scores dropped.
+        """
+        with self._lock:
+            keys = [key for id in document_ids for key in self._keys_by_document.pop(id, ())]
+        return self.cache.invalidate(keys)
@@ -0,0 +1,242 @@
+"""
+Chunking module for RAG (Retrieval-Augmented Generation) system.
+
+A long document stored as a single vector gets an embedding diluted across every topic
+it covers, and the cross-encoder only sees its first few hundred tokens.  A Chunker
+splits each document at ingestion time into chunks of at most chunk_size tokens, which
+are stored and searched in its place:
+
+- "token":    windows of chunk_size tokens, each starting chunk_size - overlap tokens
+              after the previous one.
+- "sentence": whole sentences packed into chunks of up to chunk_size tokens; each chunk
+              repeats the trailing sentences of the previous one, up to overlap tokens.
+              A sentence longer than chunk_size is cut into token windows.
+- "none":     documents are stored whole.
+
+Chunks are cut from the original text, so they keep its spacing and punctuation.  Each
+chunk is stored under "<parent id>#<index>" with the parent's metadata plus parent_id
+and chunk_index, which lets retrieval collapse chunk hits back to their documents (see
+collapse_chunks).  A document that already fits in one chunk is stored unchanged.
+
+Tokens are counted with rag.tokenizer, so chunk_size is in LLM tokens; the embedder's
+word pieces run a little longer.  chunk_stream() splits documents one at a time as they
+are read, so chunking adds no more than one document's chunks to the memory an ingestion
+run needs.
+"""
+
+import logging
+import re
+from typing import Iterable, Iterator, Optional
+
+from rag.config import CHUNK_OVERLAP, CHUNK_SIZE, CHUNK_STRATEGY
+from rag.tokenizer import get_tokenizer
+from schema.document import Document
+
+logger = logging.getLogger(__name__)
+
+CHUNK_STRATEGIES = ('none', 'sentence', 'token')
+CHUNK_ID_SEPARATOR = '#'
+# A sentence ends at terminal punctuation, with any closing quotes or brackets, followed
+# by whitespace, or at a blank line
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)|\n\s*\n')
+
+
+def sentence_spans(text: str) -> list[tuple[int, int]]:
+    """
+    Split a text into sentences.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list[tuple[int, int]]: (start, end) character offsets of each sentence, without
+                               surrounding whitespace.
+    """
+    spans = []
+    start = 0
+    for end in [match.end() for match in _SENTENCE_END.finditer(text)] + [len(text)]:
+        sentence = text[start:end]
+        stripped = sentence.strip()
+        if stripped:
+            first = start + len(sentence) - len(sentence.lstrip())
+            spans.append((first, first + len(stripped)))
+        start = end
+    return spans
+
+
+def collapse_chunks(documents: list[Document]) -> list[Document]:
+    """
+    Keep the best ranked chunk of each parent document.
+
+    Args:
+        documents (list[Document]): Documents sorted by descending rank; chunks among
+                                    them carry a parent_id.
+
+    Returns:
+        list[Document]: One document per parent, in rank order.  A chunk stands in for
+                        its parent under the parent's id and keeps its own text, so the
+                        caller gets the passage that matched.  chunk_index tells which
+                        chunk it was.
+    """
+    collapsed = []
+    seen = set()
+    for document in documents:
+        parent_id = document.metadata.parent_id
+        if (parent_id or document.id) in seen:
+            continue
+        seen.add(parent_id or document.id)
+        collapsed.append(document if parent_id is None else document.model_copy(update={'id': parent_id}))
+    if len(collapsed) < len(documents):
+        logger.debug(f"Collapsed {len(documents)} hits into {len(collapsed)} documents")
+    return collapsed
+
+
+class Chunker:
+    """
+    Splits documents into overlapping chunks of at most chunk_size tokens.
+
+    Attributes:
+        strategy (str): "none", "sentence" or "token".
+        chunk_size (int): Most tokens per chunk.
+        overlap (int): Tokens repeated from the end of one chunk at the start of the
+                       next; with the sentence strategy only whole sentences are
+                       repeated, so the overlap can be smaller.
+        tokenizer: The tokenizer chunks are measured with, see rag.tokenizer.  Built on
+                   first use, so a Chunker that never splits never loads an encoding.
+    """
+
+    def __init__(self,
+                 strategy: str = CHUNK_STRATEGY,
+                 chunk_size: int = CHUNK_SIZE,
+                 overlap: int = CHUNK_OVERLAP,
+                 tokenizer=None):
+        """
+        Initialize the Chunker.
+
+        Args:
+            strategy (str): "none", "sentence" or "token". Defaults to the CHUNK_STRATEGY
+                            environment variable, or "none".
+            chunk_size (int): Most tokens per chunk. Defaults to CHUNK_SIZE, or 200.
+            overlap (int): Tokens shared by consecutive chunks. Defaults to CHUNK_OVERLAP,
+                           or 40.
+            tokenizer: Tokenizer with count() and spans(). Defaults to get_tokenizer(),
+                       loaded the first time a document is split.
+        """
+        if strategy not in CHUNK_STRATEGIES:
+            raise ValueError(f"strategy must be one of {CHUNK_STRATEGIES}, got {strategy}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if not 0 <= overlap < chunk_size:
+            raise ValueError("overlap must be at least 0 and less than chunk_size")
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        """
+        The tokenizer chunks are measured with.
+        """
+        if self._tokenizer is None:
+            self._tokenizer = get_tokenizer()
+        return self._tokenizer
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether documents are split at all.
+        """
+        return self.strategy != 'none'
+
+    def chunk(self, document: Document) -> list[Document]:
+        """
+        Split one document into chunks.
+
+        Args:
+            document (Document): The document to split.
+
+        Returns:
+            list[Document]: The document's chunks in text order, or the document itself
+                            when chunking is off or it fits in one chunk.
+        """
+        if not self.enabled:
+            return [document]
+        if self.strategy == 'token':
+            windows = self._token_windows(document.data)
+        else:
+            windows = self._sentence_windows(document.data)
+        if len(windows) <= 1:
+            return [document]
+        return [Document(id=f"{document.id}{CHUNK_ID_SEPARATOR}{i}",
+                         data=document.data[start:end],
+                         metadata=document.metadata.model_copy(update={'parent_id': document.id,
+                                                                       'chunk_index': i}))
+                for i, (start, end) in enumerate(windows)]
+
+    def chunk_stream(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Lazily split a stream of documents, one document at a time.
+
+        Args:
+            documents (Iterable[Document]): The documents to split, e.g. a generator over
+                                            the lines of a JSONL file.
+
+        Returns:
+            Iterator[Document]: The chunks of each document in turn.
+        """
+        for document in documents:
+            yield from self.chunk(document)
+
+    def _token_windows(self, text: str, overlap: Optional[int] = None) -> list[tuple[int, int]]:
+        """
+        Character offsets of windows of chunk_size tokens, overlap tokens apart.
+        """
+        overlap = self.overlap if overlap is None else overlap
+        spans = self.tokenizer.spans(text)
+        if len(spans) <= self.chunk_size:
+            return [(0, len(text))]
+        windows = []
+        for first in range(0, len(spans), self.chunk_size - overlap):
+            last = min(first + self.chunk_size, len(spans)) - 1
+            windows.append((spans[first][0], spans[last][1]))
+            if last == len(spans) - 1:
+                break
+        return windows
+
+    def _sentence_windows(self, text: str) -> list[tuple[int, int]]:
+        """
+        Character offsets of chunks made of whole sentences.
+        """
+        if self.tokenizer.count(text) <= self.chunk_size:
+            return [(0, len(text))]
+        # (start, end, tokens) of each sentence, with oversized sentences cut into windows
+        units = []
+        for start, end in sentence_spans(text):
+            tokens = self.tokenizer.count(text[start:end])
+            if tokens <= self.chunk_size:
+                units.append((start, end, tokens))
+                continue
+            for window_start, window_end in self._token_windows(text[start:end], overlap=0):
+                window = text[start + window_start:start + window_end]
+                units.append((start + window_start, start + window_end, self.tokenizer.count(window)))
+        windows = []
+        first = 0
+        while first < len(units):
+            last = first
+            tokens = units[first][2]
+            while last + 1 < len(units) and tokens + units[last + 1][2] <= self.chunk_size:
+                last += 1
+                tokens += units[last][2]
+            windows.append((units[first][0], units[last][1]))
+            if last == len(units) - 1:
+                break
+            # Start the next chunk with the trailing sentences that fit in the overlap, but
+            # always move past this chunk's first sentence
+            next_first = last + 1
+            repeated = 0
+            while next_first - 1 > first and repeated + units[next_first - 1][2] <= self.overlap:
+                next_first -= 1
+                repeated += units[next_first][2]
+            first = next_first
+        return windows
@@ -0,0 +1,223 @@
+"""
+Completion cache module for RAG (Retrieval-Augmented Generation) system.
+
+This module provides a pluggable cache for LLM completions.  Generator and Judge build
+deterministic prompts, so a completion can be reused whenever the same prompt is sent to
+the same model with the same settings.  Entries are keyed on a hash of the prompt, model
+name, temperature and prompt template version, so changing any of them misses the cache.
+
+Two backends are provided:
+
+- InMemoryCompletionCache: a bounded LRU cache that lives as long as the process.
+- SQLiteCompletionCache: an on-disk cache that survives between runs, e.g. so that
+  running the test suite a second time makes no network calls.  It is bounded like the
+  in-memory cache: once it holds max_size entries, the least recently used are deleted.
+
+The default cache used by every OpenAI_LLM is configured with COMPLETION_CACHE_BACKEND
+("none", "memory" or "sqlite"), COMPLETION_CACHE_PATH, COMPLETION_CACHE_SIZE and
+COMPLETION_CACHE_TTL_SECONDS.
+"""
+
+import abc
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from rag.cache import CacheStats, LRUCache
+from rag.config import (
+    COMPLETION_CACHE_BACKEND,
+    COMPLETION_CACHE_PATH,
+    COMPLETION_CACHE_SIZE,
+    COMPLETION_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def completion_key(prompt: str, model_name: str, temperature: Optional[float], template_version: Optional[str],
+                   **options) -> str:
+    """
+    Build the cache key for a completion request.
+
+    Args:
+        prompt (str): The prompt sent to the model.
+        model_name (str): The model the prompt is sent to.
+        temperature (Optional[float]): The sampling temperature, None for the API default.
+        template_version (Optional[str]): Version of the prompt template that built the prompt.
+        **options: Any other request settings that change the completion.
+
+    Returns:
+        str: A hex digest identifying the request.
+    """
+    payload = json.dumps({'prompt': prompt, 'model': model_name, 'temperature': temperature,
+                          'template_version': template_version, **options}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CompletionCache(abc.ABC):
+    """
+    Interface for completion cache backends.
+
+    Attributes:
+        stats (CacheStats): Hit and miss counters.
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    def put(self, key: str, completion: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class InMemoryCompletionCache(CompletionCache):
+    """
+    Completion cache held in a bounded in-process LRU cache.
+    """
+
+    def __init__(self, max_size: int = COMPLETION_CACHE_SIZE,
+                 ttl_seconds: Optional[float] = COMPLETION_CACHE_TTL_SECONDS):
+        self._cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.stats = self._cache.stats
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def put(self, key: str, completion: str) -> None:
+        self._cache.put(key, completion)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SQLiteCompletionCache(CompletionCache):
+    """
+    Completion cache stored in a SQLite database on disk.
+
+    Attributes:
+        path (Path): The database file.
+        max_size (int): Most entries kept; the least recently used are deleted beyond it.
+        ttl_seconds (Optional[float]): Seconds an entry stays valid, None for no expiry.
+    """
+
+    def __init__(self, path: Union[str, Path] = COMPLETION_CACHE_PATH,
+                 max_size: int = COMPLETION_CACHE_SIZE,
+                 ttl_seconds: Optional[float] = COMPLETION_CACHE_TTL_SECONDS):
+        super().__init__()
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS completions "
+                                     "(key TEXT PRIMARY KEY, completion TEXT NOT NULL, created_at REAL NOT NULL)")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(completions)")]
+            if 'accessed_at' not in columns:
+                # Databases written before eviction existed treat their entries as least recently used
+                self._connection.execute("ALTER TABLE completions ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS completions_accessed_at "
+                                     "ON completions (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT completion, created_at FROM completions WHERE key = ?",
+                                           (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+                with self._connection:
+                    self._connection.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.stats.expirations += 1
+                row = None
+            if row is None:
+                self.stats.misses += 1
+                return None
+            with self._connection:
+                self._connection.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.stats.hits += 1
+            return row[0]
+
+    def put(self, key: str, completion: str) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO completions (key, completion, created_at, accessed_at) "
+                                     "VALUES (?, ?, ?, ?)", (key, completion, now, now))
+            evicted = self._connection.execute("DELETE FROM completions WHERE key IN "
+                                               "(SELECT key FROM completions ORDER BY accessed_at DESC, rowid DESC "
+                                               "LIMIT -1 OFFSET ?)", (self.max_size,)).rowcount
+            self.stats.evictions += evicted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM completions")
+
+
+def _cache_from_config() -> Optional[CompletionCache]:
+    backend = COMPLETION_CACHE_BACKEND.lower()
+    if backend in ("", "none"):
+        return None
+    if backend == "memory":
+        return InMemoryCompletionCache()
+    if backend == "sqlite":
+        return SQLiteCompletionCache()
+    raise ValueError(f"Unknown completion cache backend: {COMPLETION_CACHE_BACKEND}")
+
+
+_default_cache: Optional[CompletionCache] = None
+_default_cache_configured = False
+_default_cache_lock = threading.Lock()
+
+
+def get_default_completion_cache() -> Optional[CompletionCache]:
+    """
+    Return the process-wide completion cache, creating it from configuration on first use.
+
+    Returns:
+        Optional[CompletionCache]: The default cache, or None if caching is disabled.
+    """
+    global _default_cache, _default_cache_configured
+    with _default_cache_lock:
+        if not _default_cache_configured:
+            _default_cache = _cache_from_config()
+            _default_cache_configured = True
+        return _default_cache
+
+
+def set_default_completion_cache(cache: Optional[CompletionCache]) -> Optional[CompletionCache]:
+    """
+    Replace the process-wide completion cache.
+
+    Args:
+        cache (Optional[CompletionCache]): The new default cache, or None to disable caching.
+
+    Returns:
+        Optional[CompletionCache]: The previous default cache.
+    """
+    global _default_cache, _default_cache_configured
+    with _default_cache_lock:
+        previous = _default_cache
+        _default_cache = cache
+        _default_cache_configured = True
+        return previous
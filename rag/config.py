@@ -7,5 +7,46 @@ load_dotenv()
 
 MODEL_NAME = os.getenv("MODEL_NAME")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 LOGGING_LEVEL = getattr(logging, os.getenv("LOGGING_LEVEL", "DEBUG").upper())
 THIRD_PARTY_LOGGING_LEVEL = getattr(logging, os.getenv("THIRD_PARTY_LOGGING_LEVEL", "WARNING").upper())
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH")
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "100000"))
+RERANK_CACHE_TTL_SECONDS = float(os.getenv("RERANK_CACHE_TTL_SECONDS", "3600"))
+PIPELINE_MAX_CONCURRENCY = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "16"))
+CONNECTIVITY_CHECK_TTL_SECONDS = float(os.getenv("CONNECTIVITY_CHECK_TTL_SECONDS", "300"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")) or None
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0")) or None
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "30"))
+COMPLETION_CACHE_BACKEND = os.getenv("COMPLETION_CACHE_BACKEND", "none")
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", ".cache/completions.sqlite")
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "10000"))
+COMPLETION_CACHE_TTL_SECONDS = float(os.getenv("COMPLETION_CACHE_TTL_SECONDS", "0")) or None
+JUDGE_MAX_CONCURRENCY = int(os.getenv("JUDGE_MAX_CONCURRENCY", "8"))
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "exact")
+EMBEDDING_POOL_WORKERS = int(os.getenv("EMBEDDING_POOL_WORKERS", "0"))
+EMBEDDING_POOL_THRESHOLD = int(os.getenv("EMBEDDING_POOL_THRESHOLD", "256"))
+EMBEDDING_POOL_CHUNK_SIZE = int(os.getenv("EMBEDDING_POOL_CHUNK_SIZE", "0")) or None
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+RRF_K = int(os.getenv("RRF_K", "60"))
+RERANK_CASCADE_RANKER = os.getenv("RERANK_CASCADE_RANKER") or None
+RERANK_CASCADE_TOP_M = int(os.getenv("RERANK_CASCADE_TOP_M", "5"))
+RERANK_EARLY_EXIT = os.getenv("RERANK_EARLY_EXIT", "false").lower() in ("1", "true", "yes")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION") or None
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0")) or None
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", ".cache/onnx")
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "false").lower() in ("1", "true", "yes")
+MICRO_BATCH_MAX_QUERIES = int(os.getenv("MICRO_BATCH_MAX_QUERIES", "64"))
+MICRO_BATCH_MAX_PAIRS = int(os.getenv("MICRO_BATCH_MAX_PAIRS", "512"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "0")) or None
+RERANK_MAX_BATCH_TOKENS = int(os.getenv("RERANK_MAX_BATCH_TOKENS", "0")) or None
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "none")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "40"))
@@ -0,0 +1,96 @@
+"""
+Context assembly module for RAG (Retrieval-Augmented Generation) system.
+
+This module packs retrieved documents into the LLM prompt under a token budget.  Documents
+are taken in rank order.  One that doesn't fit is truncated if enough of the budget is
+left to be useful, and skipped otherwise.  Whatever was cut is recorded so callers can see
+what the LLM never saw.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from rag.tokenizer import RegexTokenizer, TiktokenTokenizer
+from schema.document import Document
+
+logger = logging.getLogger(__name__)
+
+# A document is only truncated if at least this many tokens of it fit; a shorter stub
+# costs tokens without giving the LLM much to work with.
+MIN_TRUNCATED_TOKENS = 32
+DOCUMENT_SEPARATOR = "\n"
+
+
+@dataclass
+class PackedContext:
+    """
+    The documents that made it into a prompt.
+
+    Attributes:
+        documents (list[Document]): Documents in the prompt, highest rank first.  Truncated
+                                    documents are copies holding the truncated text.
+        tokens (int): Tokens used by the documents and their separators.
+        budget (Optional[int]): The token budget, None if unlimited.
+        truncated (list[str]): Ids of documents that were cut short.
+        dropped (list[str]): Ids of documents that were left out entirely.
+    """
+    documents: list[Document] = field(default_factory=list)
+    tokens: int = 0
+    budget: Optional[int] = None
+    truncated: list[str] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """
+        The packed documents joined for the prompt.
+        """
+        return DOCUMENT_SEPARATOR.join(doc.data for doc in self.documents)
+
+
+def pack_documents(documents: list[Document],
+                   budget: Optional[int],
+                   tokenizer: RegexTokenizer | TiktokenTokenizer,
+                   min_truncated_tokens: int = MIN_TRUNCATED_TOKENS) -> PackedContext:
+    """
+    Pack the highest ranked documents into a token budget.
+
+    Documents are considered in descending rank (ties keep their retrieval order).  Each
+    one that fits is added whole.  One that doesn't fit is truncated to the remaining
+    budget if at least min_truncated_tokens of it fit, and dropped otherwise; smaller,
+    lower ranked documents may still fill the space that is left.  With no budget every
+    document is kept, in the order given.
+
+    Args:
+        documents (list[Document]): The retrieved documents.
+        budget (Optional[int]): Maximum tokens for the documents, None for no limit.
+        tokenizer (RegexTokenizer | TiktokenTokenizer): Counts and truncates tokens.
+        min_truncated_tokens (int): Smallest useful truncated document. Defaults to 32.
+
+    Returns:
+        PackedContext: The documents that fit and a record of what was cut.
+    """
+    ranked = sorted(documents, key=lambda doc: doc.rank, reverse=True) if budget is not None else documents
+    separator_tokens = tokenizer.count(DOCUMENT_SEPARATOR)
+    packed = PackedContext(budget=budget)
+    for doc in ranked:
+        cost = tokenizer.count(doc.data) + (separator_tokens if packed.documents else 0)
+        remaining = budget - packed.tokens if budget is not None else cost
+        if cost <= remaining:
+            packed.documents.append(doc)
+            packed.tokens += cost
+            continue
+        separator = separator_tokens if packed.documents else 0
+        available = remaining - separator
+        if available >= min_truncated_tokens:
+            data = tokenizer.truncate(doc.data, available)
+            packed.documents.append(doc.model_copy(update={'data': data}))
+            packed.tokens += separator + tokenizer.count(data)
+            packed.truncated.append(doc.id)
+        else:
+            packed.dropped.append(doc.id)
+    if packed.truncated or packed.dropped:
+        logger.info(f"Packed {len(packed.documents)} of {len(documents)} documents into {packed.tokens}/{budget} "
+                    f"tokens; truncated {packed.truncated}, dropped {packed.dropped}")
+    return packed
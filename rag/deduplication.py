@@ -0,0 +1,202 @@
+"""
+De-duplication module for RAG (Retrieval-Augmented Generation) system.
+
+This module provides near-duplicate filtering over embedding vectors.  Documents are
+considered duplicates when their cosine similarity is above a threshold, and the first
+document of every group of duplicates is kept (keep-first semantics).
+
+Two engines are provided:
+
+- An exact engine that normalizes the vectors once and performs the greedy selection
+  block by block with batched matrix products.
+- A SimHash (random hyperplane LSH) engine for large candidate sets, which only compares
+  each document against kept documents that share a hash bucket with it.
+"""
+
+import logging
+from typing import Literal, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Above this many candidates de_duplicate switches from the exact engine to SimHash
+SIMHASH_CANDIDATE_LIMIT = 10000
+BLOCK_SIZE = 256
+SIMHASH_SEED = 42
+SIMHASH_TARGET_RECALL = 0.999
+# SimHash aims for buckets of roughly 2**SIMHASH_BUCKET_SIZE_BITS documents
+SIMHASH_BUCKET_SIZE_BITS = 5
+SIMHASH_MIN_ROWS = 8
+SIMHASH_MAX_ROWS = 24
+
+Embeddings = Union[np.ndarray, Sequence[Sequence[float]]]
+
+
+def normalize_embeddings(embeddings: Embeddings) -> np.ndarray:
+    """
+    L2 normalize a matrix of embeddings so dot products are cosine similarities.
+
+    Floating point input keeps its dtype, anything else is converted to float64.
+    Zero vectors are left as zeros, which gives them a similarity of 0 to everything,
+    matching sklearn's cosine_similarity.
+
+    Args:
+        embeddings (Embeddings): Matrix of shape (n_documents, dimensions).
+
+    Returns:
+        np.ndarray: A new C-contiguous matrix of unit length rows.
+    """
+    matrix = np.asarray(embeddings)
+    if not np.issubdtype(matrix.dtype, np.floating):
+        matrix = matrix.astype(np.float64)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return np.ascontiguousarray(matrix / norms)
+
+
+def greedy_deduplicate(embeddings: Embeddings, threshold: float = 0.95, block_size: int = BLOCK_SIZE) -> list[int]:
+    """
+    Exact keep-first near-duplicate filtering.
+
+    Candidates are processed in blocks.  Each block is compared against every document
+    kept so far with a single matrix product, and against itself with a second one.
+    The sequential keep-first decision within the block then only propagates boolean
+    rows, so no similarity is ever computed more than once.
+
+    Args:
+        embeddings (Embeddings): Matrix of shape (n_documents, dimensions) in priority order.
+        threshold (float): Documents with a cosine similarity above this value to an
+                           already kept document are dropped.  Defaults to 0.95.
+        block_size (int): Number of candidates compared per batch. Defaults to 256.
+
+    Returns:
+        list[int]: Indexes of the kept documents, in their original order.
+    """
+    if len(embeddings) == 0:
+        return []
+    vectors = normalize_embeddings(embeddings)
+    kept: list[int] = []
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        if kept:
+            duplicate = (block @ vectors[kept].T > threshold).any(axis=1)
+        else:
+            duplicate = np.zeros(len(block), dtype=bool)
+        within_block = block @ block.T > threshold
+        for offset in range(len(block)):
+            if duplicate[offset]:
+                continue
+            kept.append(start + offset)
+            duplicate[offset + 1:] |= within_block[offset, offset + 1:]
+    return kept
+
+
+def _simhash_shape(n: int, threshold: float, target_recall: float = SIMHASH_TARGET_RECALL) -> tuple[int, int]:
+    """
+    Choose the number of bands and hyperplanes per band for a candidate set.
+
+    More hyperplanes per band keeps buckets small as the candidate set grows, and the
+    number of bands is then raised until a pair of documents exactly at the threshold
+    shares at least one bucket with probability target_recall.
+
+    Args:
+        n (int): Number of candidates.
+        threshold (float): Cosine similarity above which documents are duplicates.
+        target_recall (float): Probability that a pair at the threshold collides.
+
+    Returns:
+        tuple[int, int]: The number of bands and the hyperplanes per band.
+    """
+    rows = int(np.clip(np.log2(max(n, 1)) - SIMHASH_BUCKET_SIZE_BITS, SIMHASH_MIN_ROWS, SIMHASH_MAX_ROWS))
+    bit_agreement = 1 - np.arccos(np.clip(threshold, -1, 1)) / np.pi
+    band_collision = bit_agreement ** rows
+    if band_collision >= 1:
+        return 1, rows
+    bands = int(np.ceil(np.log(1 - target_recall) / np.log(1 - band_collision)))
+    return max(bands, 1), rows
+
+
+def simhash_deduplicate(embeddings: Embeddings, threshold: float = 0.95, seed: int = SIMHASH_SEED) -> list[int]:
+    """
+    Approximate keep-first near-duplicate filtering using SimHash buckets.
+
+    Each vector is hashed with random hyperplanes and the signature is split into bands,
+    each of which is a bucket key.  Similarities are only computed between documents that
+    share a bucket, which finds the candidate duplicate pairs without comparing every
+    pair.  The keep-first selection then walks the documents in order and drops the
+    duplicates of every kept document.  A pair exactly at the threshold shares a bucket
+    with probability SIMHASH_TARGET_RECALL, so unlike greedy_deduplicate a duplicate can
+    occasionally be missed.  The threshold must be positive for bucketing to make sense.
+
+    Args:
+        embeddings (Embeddings): Matrix of shape (n_documents, dimensions) in priority order.
+        threshold (float): Cosine similarity above which documents are duplicates.
+                           Defaults to 0.95.
+        seed (int): Seed for the random hyperplanes, so results are reproducible.
+
+    Returns:
+        list[int]: Indexes of the kept documents, in their original order.
+    """
+    if len(embeddings) == 0:
+        return []
+    if threshold <= 0:
+        raise ValueError("SimHash de-duplication requires a positive similarity threshold")
+    vectors = normalize_embeddings(embeddings)
+    n = len(vectors)
+    bands, rows = _simhash_shape(n, threshold)
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((vectors.shape[1], bands * rows)).astype(vectors.dtype)
+    bits = (vectors @ planes > 0).reshape(n, bands, rows)
+    keys = bits.astype(np.int64) @ (1 << np.arange(rows, dtype=np.int64))
+
+    sources, targets = [], []
+    for band in range(bands):
+        order = np.argsort(keys[:, band], kind="stable")
+        boundaries = np.flatnonzero(np.diff(keys[order, band])) + 1
+        for members in np.split(order, boundaries):
+            if len(members) < 2:
+                continue
+            members = np.sort(members)
+            similar = np.triu(vectors[members] @ vectors[members].T > threshold, k=1)
+            first, second = np.nonzero(similar)
+            sources.append(members[first])
+            targets.append(members[second])
+
+    dropped = np.zeros(n, dtype=bool)
+    if sources:
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        order = np.argsort(sources, kind="stable")
+        sources, targets = sources[order], targets[order]
+        offsets = np.searchsorted(sources, np.arange(n + 1))
+        for index in np.unique(sources):
+            if not dropped[index]:
+                dropped[targets[offsets[index]:offsets[index + 1]]] = True
+    return np.flatnonzero(~dropped).tolist()
+
+
+def de_duplicate(embeddings: Embeddings,
+                 threshold: float = 0.95,
+                 method: Literal["auto", "exact", "simhash"] = "auto") -> list[int]:
+    """
+    Return the indexes of the documents to keep after near-duplicate filtering.
+
+    Args:
+        embeddings (Embeddings): Matrix of shape (n_documents, dimensions) in priority order.
+        threshold (float): Cosine similarity above which documents are duplicates.
+                           Defaults to 0.95.
+        method (str): "exact", "simhash", or "auto" to use the exact engine up to
+                      SIMHASH_CANDIDATE_LIMIT candidates and SimHash above it.
+
+    Returns:
+        list[int]: Indexes of the kept documents, in their original order.
+    """
+    if method == "auto":
+        method = "exact" if len(embeddings) <= SIMHASH_CANDIDATE_LIMIT else "simhash"
+    logger.debug(f"De-duplicating {len(embeddings)} embeddings with the {method} engine")
+    if method == "exact":
+        return greedy_deduplicate(embeddings, threshold)
+    if method == "simhash":
+        return simhash_deduplicate(embeddings, threshold)
+    raise ValueError(f"Unknown de-duplication method: {method}")
@@ -4,12 +4,45 @@ Embedding module for RAG (Retrieval-Augmented Generation) system.
 This module provides functionality for generating text embeddings using pre-trained
 sentence transformer models. It supports both single text and batch text embedding
 operations.
+
+The *_array methods return contiguous float32 NumPy arrays straight from the model and
+are what the vector store, retriever and ingestion pipeline use internally.  The list
+methods remain for callers that want plain Python floats.
+
+Large batches can be spread over a pool of CPU worker processes with sentence-transformers'
+multi-process encoding.  An Embedder with pool_workers > 1 uses the pool for every batch of
+at least pool_threshold texts, so bulk writes through the vector store use it transparently.
+
+With backend="onnx" the model runs on ONNX Runtime, optionally quantized to int8, see
+rag.inference_backend.  ONNX sessions use intra-op threads instead of the worker pool.
+
+With max_batch_tokens set, in-process batches are sorted by token count and encoded in
+length buckets of at most that many padded tokens, see rag.length_bucketing.
 """
 
-from typing import List, Union
+import inspect
+import logging
+from typing import List, Optional, Union
 
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from rag.cache import LRUCache, normalize_text
+from rag.config import (EMBEDDING_MAX_BATCH_TOKENS, EMBEDDING_POOL_CHUNK_SIZE, EMBEDDING_POOL_THRESHOLD,
+                        EMBEDDING_POOL_WORKERS, INFERENCE_BACKEND, INFERENCE_THREADS, ONNX_QUANTIZATION,
+                        QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+from rag.length_bucketing import encode_bucketed
+from rag.micro_batching import MicroBatcher
+from rag.model_registry import MODEL_REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Query embeddings are shared by every Embedder in the process; keys include the model name.
+# Entries are read-only float32 arrays.
+QUERY_EMBEDDING_CACHE = LRUCache(max_size=QUERY_EMBEDDING_CACHE_SIZE, ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+# sentence-transformers 5 folded encode_multi_process into encode(pool=...)
+_ENCODE_TAKES_POOL = "pool" in inspect.signature(SentenceTransformer.encode).parameters
+
 
 class Embedder:
     """
@@ -21,10 +54,30 @@ class Embedder:
     
     Attributes:
         model_name (str): The name of the pre-trained sentence transformer model
-        model (SentenceTransformer): The loaded sentence transformer model instance
+        device (Optional[str]): The device the model runs on, None for the library default
+        model (SentenceTransformer): The loaded sentence transformer model instance, shared
+                                     with every other Embedder using the same model and device
+        pool_workers (int): Worker processes for large batches, 0 or 1 to encode in process
+        pool_threshold (int): Smallest batch sent to the worker pool
+        pool_chunk_size (Optional[int]): Texts per chunk handed to a worker, None for the
+                                         library default
+        backend (str): "torch" or "onnx"
+        quantization (Optional[str]): Dynamic int8 quantization of the ONNX model, or None
+        threads (Optional[int]): ONNX Runtime intra-op threads, None for its default
+        max_batch_tokens (Optional[int]): Padded tokens per length bucket, None for the
+                                          library's fixed batch size
+        query_batcher (Optional[MicroBatcher]): Merges the query encodes of concurrent
+                                                callers, None to encode in the caller
     """
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', device: Optional[str] = None,
+                 pool_workers: int = EMBEDDING_POOL_WORKERS,
+                 pool_threshold: int = EMBEDDING_POOL_THRESHOLD,
+                 pool_chunk_size: Optional[int] = EMBEDDING_POOL_CHUNK_SIZE,
+                 backend: str = INFERENCE_BACKEND,
+                 quantization: Optional[str] = ONNX_QUANTIZATION,
+                 threads: Optional[int] = INFERENCE_THREADS,
+                 max_batch_tokens: Optional[int] = EMBEDDING_MAX_BATCH_TOKENS):
         """
         Initialize the Embedder with a specified sentence transformer model.
         Default is 'all-MiniLM-L6-v2' which is a good balance of performance and speed fr
@@ -34,11 +87,44 @@ class Embedder:
             model_name (str): The name of the pre-trained model to use.
                              Defaults to 'all-MiniLM-L6-v2' which is a good
                              balance of performance and speed.
+            device (Optional[str]): The device to run the model on.  Defaults to None,
+                                    which lets sentence-transformers pick.
+            pool_workers (int): CPU worker processes for large batches.  Defaults to the
+                                EMBEDDING_POOL_WORKERS environment variable, or 0 (no pool).
+            pool_threshold (int): Batches of at least this many texts use the pool.
+                                  Defaults to EMBEDDING_POOL_THRESHOLD, or 256.
+            pool_chunk_size (Optional[int]): Texts per chunk sent to a worker.  Defaults to
+                                             EMBEDDING_POOL_CHUNK_SIZE, or the library's choice.
+            backend (str): "torch" for eager PyTorch or "onnx" for ONNX Runtime on the CPU.
+                           Defaults to the INFERENCE_BACKEND environment variable, or "torch".
+            quantization (Optional[str]): Dynamic int8 quantization of the ONNX model: "int8"
+                                          for this CPU, or "avx2", "avx512", "avx512_vnni"
+                                          or "arm64".  Defaults to ONNX_QUANTIZATION, or
+                                          None (fp32).  Ignored by the torch backend.
+            threads (Optional[int]): ONNX Runtime intra-op threads.  Defaults to
+                                     INFERENCE_THREADS, or one per physical core.  Ignored
+                                     by the torch backend.
+            max_batch_tokens (Optional[int]): Budget of padded tokens per batch for length
+                                              bucketed encoding.  Defaults to
+                                              EMBEDDING_MAX_BATCH_TOKENS, or None for
+                                              batches of the library's fixed size.
+
+        The model itself is obtained from the process-wide model registry so that
+        several Embedders for the same model share one loaded copy.
         """
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.device = device
+        self.backend = backend
+        self.quantization = quantization
+        self.threads = threads
+        self.model = MODEL_REGISTRY.sentence_transformer(model_name, device, backend, quantization, threads)
+        self.pool_workers = pool_workers
+        self.pool_threshold = pool_threshold
+        self.pool_chunk_size = pool_chunk_size
+        self.max_batch_tokens = max_batch_tokens
+        self.query_batcher: Optional[MicroBatcher] = None
 
-    def _embed(self, input: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
+    def _embed(self, input: Union[str, List[str]], normalize: bool = False) -> np.ndarray:
         """
         Internal method to generate embeddings for text input.
         
@@ -48,18 +134,46 @@ class Embedder:
         Args:
             input (Union[str, List[str]]): Text to embed. Can be a single string
                                           or a list of strings for batch processing.
+            normalize (bool): Whether the model should L2 normalize the embeddings.
+                              Defaults to False.
         
         Returns:
-            Union[List[float], List[List[float]]]: Embedding vector(s). Returns a
-                                                  single vector for string input,
-                                                  or a list of vectors for list input.
+            np.ndarray: C-contiguous float32 embedding vector(s). A vector for string
+                        input, or a matrix with one row per text for list input.
         
         Raises:
             ValueError: If no text is provided for embedding.
         """
         if not input:
             raise ValueError("No text provided for embedding")
-        return self.model.encode(input).tolist()
+        if self.uses_pool(input):
+            embeddings = self._encode_in_pool(input, normalize)
+        elif self.max_batch_tokens and not isinstance(input, str):
+            embeddings = encode_bucketed(self.model, input, self.max_batch_tokens, normalize)
+        else:
+            embeddings = self.model.encode(input, convert_to_numpy=True, normalize_embeddings=normalize)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def uses_pool(self, input: Union[str, List[str]]) -> bool:
+        """
+        Whether the input is large enough to be encoded by the worker pool.  ONNX models
+        never use it: their sessions can't be shipped to worker processes.
+        """
+        return (self.backend == "torch" and self.pool_workers > 1 and not isinstance(input, str)
+                and len(input) >= self.pool_threshold)
+
+    def _encode_in_pool(self, texts: List[str], normalize: bool) -> np.ndarray:
+        """
+        Encode texts on the shared worker pool.  sentence-transformers splits them into
+        chunks, one per worker at a time, and reassembles the results in input order.
+        """
+        pool = MODEL_REGISTRY.embedding_pool(self.model_name, self.pool_workers, self.device)
+        logger.debug(f"Encoding {len(texts)} texts on {self.pool_workers} worker processes")
+        if _ENCODE_TAKES_POOL:
+            return self.model.encode(texts, pool=pool, chunk_size=self.pool_chunk_size,
+                                     normalize_embeddings=normalize)
+        return self.model.encode_multi_process(texts, pool, chunk_size=self.pool_chunk_size,
+                                               normalize_embeddings=normalize)
 
     def embed(self, text: str) -> List[float]:
         """
@@ -71,7 +185,20 @@ class Embedder:
         Returns:
             List[float]: A vector representation of the input text.
         """
-        return self._embed(text)
+        return self._embed(text).tolist()
+
+    def embed_array(self, text: str, normalize: bool = False) -> np.ndarray:
+        """
+        Generate the embedding of a single text string as a NumPy array.
+
+        Args:
+            text (str): The text string to embed.
+            normalize (bool): Whether to L2 normalize the embedding. Defaults to False.
+
+        Returns:
+            np.ndarray: A float32 vector of shape (dimensions,).
+        """
+        return self._embed(text, normalize)
     
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """
@@ -86,7 +213,79 @@ class Embedder:
         Returns:
             List[List[float]]: List of vector representations, one for each input text.
         """
-        return self._embed(texts)
+        return self._embed(texts).tolist()
+
+    def embed_batch_array(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        """
+        Generate embeddings for a batch of text strings as one NumPy matrix.
+
+        The matrix comes straight from the model, without building a Python float per
+        dimension, and normalization happens once inside the encode call.
+
+        Args:
+            texts (List[str]): List of text strings to embed.
+            normalize (bool): Whether to L2 normalize each embedding. Defaults to False.
+
+        Returns:
+            np.ndarray: A C-contiguous float32 matrix of shape (len(texts), dimensions).
+        """
+        return self._embed(texts, normalize)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for search queries, reusing cached query embeddings.
+
+        Queries are normalized (whitespace collapsed) and looked up in the process-wide
+        QUERY_EMBEDDING_CACHE, keyed by model, backend, quantization and normalized text
+        (see query_cache_key).  Only the misses are encoded, in a single forward pass,
+        shared with concurrent callers when a query_batcher is set.
+
+        Args:
+            queries (List[str]): List of query strings to embed.
+
+        Returns:
+            List[List[float]]: List of vector representations, one for each query.
+        """
+        return self.embed_queries_array(queries).tolist()
+
+    def query_cache_key(self, query: str) -> tuple:
+        """
+        Key of a normalized query in QUERY_EMBEDDING_CACHE.
+
+        Embedders of the same model on different backends or quantizations produce
+        slightly different vectors, so each configuration keeps its own entries.
+        """
+        quantization = self.quantization if self.backend == "onnx" else None
+        return self.model_name, self.backend, quantization, query
+
+    def embed_queries_array(self, queries: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for search queries as one NumPy matrix, reusing cached query
+        embeddings as embed_queries() does.
+
+        Args:
+            queries (List[str]): List of query strings to embed.
+
+        Returns:
+            np.ndarray: A float32 matrix with one row per query.
+        """
+        normalized = [normalize_text(query) for query in queries]
+        embeddings = [QUERY_EMBEDDING_CACHE.get(self.query_cache_key(query)) for query in normalized]
+        misses = list(dict.fromkeys(query for query, embedding in zip(normalized, embeddings) if embedding is None))
+        if misses:
+            if self.query_batcher is not None:
+                encoded = dict(zip(misses, self.query_batcher.map(misses)))
+            else:
+                encoded = dict(zip(misses, self.embed_batch_array(misses)))
+            for query, embedding in encoded.items():
+                # A row of the batch matrix would keep the whole batch alive in the cache
+                embedding = embedding.copy()
+                embedding.flags.writeable = False
+                encoded[query] = embedding
+                QUERY_EMBEDDING_CACHE.put(self.query_cache_key(query), embedding)
+            embeddings = [embedding if embedding is not None else encoded[query]
+                          for query, embedding in zip(normalized, embeddings)]
+        return np.stack(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
     
     def compare(self, text1: str, text2: str) -> float:
         """
@@ -107,29 +306,38 @@ class ChromaEmbedder:
         embedder (Embedder): The underlying embedding model.
     """
     
-    def __init__(self, embedder: 'Embedder'):
+    def __init__(self, embedder: Union['Embedder', str]):
         """
         Initialize the ChromaEmbedder with an Embedder instance.
         
         Args:
-            embedder (Embedder): The embedding model to use for generating vectors.
+            embedder (Union[Embedder, str]): The embedding model to use for generating vectors,
+                                             or a model name to build one from the shared registry.
         """
-        self.embedder = embedder
+        self.embedder = Embedder(embedder) if isinstance(embedder, str) else embedder
     
-    def __call__(self, input: list[str]) -> list[list[float]]:
+    def __call__(self, input: list[str]) -> list[np.ndarray]:
         """
         Generate embeddings for a list of text strings.
         
         This method is called by ChromaDB to generate embeddings for documents
-        during indexing and querying.
+        during indexing and querying.  The vectors are rows of one float32 matrix,
+        which is the form ChromaDB stores them in.
         
         Args:
             input (list[str]): List of text strings to embed.
         
         Returns:
-            list[list[float]]: List of embedding vectors, one for each input text.
+            list[np.ndarray]: List of embedding vectors, one for each input text.
+        """
+        return list(self.embedder.embed_batch_array(input))
+
+    @staticmethod
+    def name() -> str:
+        """
+        Name ChromaDB records for this embedding function in persisted collections.
         """
-        return self.embedder.embed_batch(input)
+        return "rag_chroma_embedder"
     
 
     
\ No newline at end of file
@@ -7,8 +7,13 @@ or replaced with more sophisticated language models.
 """
 
 import logging
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional
 
-from rag.llm import OpenAI_LLM
+from rag.context import PackedContext, pack_documents
+from rag.llm import AsyncOpenAI_LLM, OpenAI_LLM
+from rag.tokenizer import get_tokenizer
 from schema.document import Document
 from schema.generator_config import GeneratorConfig
 
@@ -21,6 +26,33 @@ PROMPT_TEMPLATES = {
     Do not include any information in your response that is not included in the
     attached documents.""",
 }
+# Bump whenever PROMPT_TEMPLATES or the prompt layout changes, so cached completions
+# built from the old prompts are not reused.
+PROMPT_TEMPLATE_VERSION = "1"
+
+
+@dataclass
+class StreamStats:
+    """
+    Timing of a streamed generation.
+
+    Attributes:
+        time_to_first_token (float): Seconds from the request to the first streamed token.
+        seconds (float): Seconds from the request to the end of the stream.
+        tokens (int): Streamed pieces received, about one token each.
+    """
+    time_to_first_token: float = 0.0
+    seconds: float = 0.0
+    tokens: int = 0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """
+        Tokens streamed per second after the first token arrived.
+        """
+        streaming = self.seconds - self.time_to_first_token
+        return (self.tokens - 1) / streaming if self.tokens > 1 and streaming > 0 else 0.0
+
 
 class Generator:
     """
@@ -31,16 +63,34 @@ class Generator:
     debugging and analysis purposes.
     
     Attributes:
-        last_prompt (str): The most recently generated prompt for debugging.
+        last_prompt (str): The most recently generated prompt for debugging.  With
+                           concurrent agenerate calls this is the most recently built one.
+        last_response (str): The most recently generated response, assembled from the
+                             stream for generate_stream().
+        last_stream_stats (Optional[StreamStats]): Timing of the last generate_stream() call.
+        last_context (Optional[PackedContext]): The documents packed into the last prompt,
+                                                and those truncated or dropped to fit
+                                                config.context_token_budget.
+        llm (OpenAI_LLM): The language model used for generate().
     """
     
-    def __init__(self, config: GeneratorConfig):
+    def __init__(self, config: GeneratorConfig, llm: Optional[OpenAI_LLM] = None):
         """
         Initialize the Generator with an empty last prompt.
+
+        Args:
+            config (GeneratorConfig): The generation settings.
+            llm (Optional[OpenAI_LLM]): The language model to use.  Defaults to None,
+                                        which creates an OpenAI_LLM.  Pass an
+                                        AsyncOpenAI_LLM to share it with agenerate().
         """
         self.last_prompt = ""
+        self.last_response = ""
+        self.last_stream_stats: Optional[StreamStats] = None
+        self.last_context: Optional[PackedContext] = None
         self.config = config
-        self.llm = OpenAI_LLM()
+        self.llm = llm or OpenAI_LLM()
+        self._async_llm = llm if isinstance(llm, AsyncOpenAI_LLM) else None
 
     def generate(self, query: str, documents: list[Document])-> str:
         """
@@ -58,11 +108,82 @@ class Generator:
         Returns:
             str: The generated response based on the documents and query.
         """
+        prompt = self._build_prompt(query, documents)
+        self.last_response = self.llm.generate_response(prompt, self.config.model_name,
+                                                        temperature=self.config.temperature,
+                                                        template_version=PROMPT_TEMPLATE_VERSION)
+        return self.last_response
+
+    def generate_stream(self, query: str, documents: list[Document]) -> Iterator[str]:
+        """
+        Generate a response, yielding tokens as the LLM streams them.
+
+        The prompt is the same as for generate().  Once the stream is exhausted the
+        assembled response is available as last_response and the timing as
+        last_stream_stats.
+
+        Args:
+            query (str): The user's query to answer.
+            documents (list[Document]): List of retrieved documents to use for generation.
+
+        Yields:
+            str: Pieces of the response, in order.
+        """
+        prompt = self._build_prompt(query, documents)
+        stats = StreamStats()
+        pieces = []
+        start = time.perf_counter()
+        for piece in self.llm.generate_stream(prompt, self.config.model_name, temperature=self.config.temperature,
+                                              template_version=PROMPT_TEMPLATE_VERSION):
+            if not pieces:
+                stats.time_to_first_token = time.perf_counter() - start
+            pieces.append(piece)
+            stats.tokens += 1
+            yield piece
+        stats.seconds = time.perf_counter() - start
+        self.last_response = "".join(pieces)
+        self.last_stream_stats = stats
+        logger.info(f"Streamed {stats.tokens} tokens in {stats.seconds:.2f}s "
+                    f"(time to first token {stats.time_to_first_token:.3f}s, "
+                    f"{stats.tokens_per_second:.1f} tokens/sec)")
+
+    async def agenerate(self, query: str, documents: list[Document]) -> str:
+        """
+        Generate a response without blocking the event loop.
+
+        This builds the same prompt as generate() and awaits the completion on an
+        asynchronous OpenAI client, so many generations can be in flight on one loop.
+
+        Args:
+            query (str): The user's query to answer.
+            documents (list[Document]): List of retrieved documents to use for generation.
+
+        Returns:
+            str: The generated response based on the documents and query.
+        """
+        prompt = self._build_prompt(query, documents)
+        if self._async_llm is None:
+            self._async_llm = AsyncOpenAI_LLM(api_key=self.llm.api_key, base_url=self.llm.base_url,
+                                              cache=self.llm.cache)
+        self.last_response = await self._async_llm.agenerate_response(prompt, self.config.model_name,
+                                                                       temperature=self.config.temperature,
+                                                                       template_version=PROMPT_TEMPLATE_VERSION)
+        return self.last_response
+
+    def _build_prompt(self, query: str, documents: list[Document]) -> str:
+        """
+        Build the prompt for a query and record it as the last prompt.
+
+        The highest ranked documents are packed into config.context_token_budget tokens;
+        the result is recorded as last_context.
+        """
         logger.info(f"Generating response for query: {query} with mode: {self.config.mode}")
         llm_boilerplate = PROMPT_TEMPLATES.get(self.config.mode, PROMPT_TEMPLATES['loose'])
-        documents_str = "\n".join([doc.data for doc in documents])
+        self.last_context = pack_documents(documents, self.config.context_token_budget,
+                                           get_tokenizer(self.config.model_name))
+        documents_str = self.last_context.text
         self.last_prompt= f"{llm_boilerplate}\n\n{documents_str}\n\nQuery: {query}"
-        return self.llm.generate_response(self.last_prompt, "gpt-4o-mini")
+        return self.last_prompt
     
     def get_last_prompt(self)-> str:
         """
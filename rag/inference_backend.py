@@ -0,0 +1,227 @@
+"""
+Inference backend module for RAG (Retrieval-Augmented Generation) system.
+
+This module loads sentence transformers and cross-encoders on ONNX Runtime instead of
+eager PyTorch, for serving on CPU-only nodes.  A model is exported to ONNX once and saved
+under ONNX_MODEL_DIR, together with a dynamically quantized int8 copy when quantization is
+requested, so later processes load the saved graph directly.  Sessions run with a fixed
+intra-op thread count and every graph optimization enabled.
+
+The ONNX backend needs Optimum, which is not a core dependency:
+
+    pip install "sentence-transformers[onnx]"
+"""
+
+import logging
+import platform
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from rag.config import ONNX_MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+# Dynamic int8 quantization configs known to sentence-transformers, one per instruction set
+QUANTIZATIONS = ("arm64", "avx2", "avx512", "avx512_vnni")
+# Picks the config for the CPU the process runs on
+AUTO_QUANTIZATION = "int8"
+ONNX_FILE_NAME = "onnx/model.onnx"
+
+
+def _cpu_quantization() -> str:
+    """
+    The quantization config matching this CPU's instruction set.
+    """
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        flags = set(re.findall(r"\w+", Path("/proc/cpuinfo").read_text()))
+    except OSError:
+        flags = set()
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def resolve_quantization(quantization: Optional[str]) -> Optional[str]:
+    """
+    Validate a quantization config, resolving "int8" to the one for this CPU.
+
+    Args:
+        quantization (Optional[str]): One of QUANTIZATIONS, "int8", or None for fp32.
+
+    Returns:
+        Optional[str]: The quantization config, or None for fp32.
+
+    Raises:
+        ValueError: If the quantization config is unknown.
+    """
+    if quantization is None:
+        return None
+    if quantization == AUTO_QUANTIZATION:
+        return _cpu_quantization()
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"quantization must be one of {QUANTIZATIONS + (AUTO_QUANTIZATION,)}, got {quantization}")
+    return quantization
+
+
+def variant_name(backend: str, quantization: Optional[str] = None, threads: Optional[int] = None) -> str:
+    """
+    Short description of an inference backend setup, e.g. "onnx qint8_avx2 4 threads".
+
+    Args:
+        backend (str): One of BACKENDS.
+        quantization (Optional[str]): Quantization config, ignored for torch.
+        threads (Optional[int]): Intra-op threads, ignored for torch.
+
+    Returns:
+        str: The description.
+
+    Raises:
+        ValueError: If the backend or quantization config is unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, got {backend}")
+    if backend == "torch":
+        return backend
+    quantization = resolve_quantization(quantization)
+    parts = [backend] + ([f"qint8_{quantization}"] if quantization else [])
+    parts += [f"{threads} threads"] if threads else []
+    return " ".join(parts)
+
+
+def session_options(threads: Optional[int] = None) -> Any:
+    """
+    ONNX Runtime session options for low-latency CPU inference.
+
+    Args:
+        threads (Optional[int]): Intra-op threads, None for ONNX Runtime's default of one
+                                 per physical core.
+
+    Returns:
+        onnxruntime.SessionOptions: The options.
+    """
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if threads:
+        options.intra_op_num_threads = threads
+    return options
+
+
+def onnx_model_dir(model_class: type, model_name: str) -> Path:
+    """
+    Directory the ONNX export of a model is saved to.
+
+    Args:
+        model_class (type): SentenceTransformer or CrossEncoder.
+        model_name (str): The name of, or path to, the pre-trained model.
+
+    Returns:
+        Path: The directory under ONNX_MODEL_DIR.
+    """
+    return Path(ONNX_MODEL_DIR) / model_class.__name__ / re.sub(r"[^\w.-]+", "--", model_name).strip("-")
+
+
+def load_onnx_model(model_class: type, model_name: str, quantization: Optional[str] = None,
+                    threads: Optional[int] = None, **kwargs) -> Any:
+    """
+    Load a model on ONNX Runtime, exporting and quantizing it on first use.
+
+    Args:
+        model_class (type): SentenceTransformer or CrossEncoder.
+        model_name (str): The name of, or path to, the pre-trained model.
+        quantization (Optional[str]): Dynamic int8 quantization config, see
+                                      resolve_quantization(). Defaults to None (fp32).
+        threads (Optional[int]): Intra-op threads. Defaults to ONNX Runtime's default.
+        **kwargs: Passed on to the model class, e.g. activation_fn.
+
+    Returns:
+        Any: The model, with the usual encode() or predict() interface.
+    """
+    quantization = resolve_quantization(quantization)
+    directory = onnx_model_dir(model_class, model_name)
+    if not (directory / ONNX_FILE_NAME).exists():
+        logger.info(f"Exporting {model_name} to ONNX in {directory}")
+        model_class(model_name, backend="onnx", **kwargs).save_pretrained(str(directory))
+    file_name = ONNX_FILE_NAME
+    if quantization:
+        file_name = f"onnx/model_qint8_{quantization}.onnx"
+        if not (directory / file_name).exists():
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+
+            logger.info(f"Quantizing the ONNX export of {model_name} for {quantization}")
+            exported = model_class(str(directory), backend="onnx", model_kwargs={"file_name": ONNX_FILE_NAME}, **kwargs)
+            export_dynamic_quantized_onnx_model(exported, quantization, str(directory))
+    model_kwargs = {"file_name": file_name, "provider": "CPUExecutionProvider",
+                    "session_options": session_options(threads)}
+    return model_class(str(directory), backend="onnx", model_kwargs=model_kwargs, **kwargs)
+
+
+def onnx_model_bytes(model: Any) -> int:
+    """
+    Size of the ONNX graph a model runs, as an estimate of the memory its weights take.
+
+    Args:
+        model (Any): A SentenceTransformer or CrossEncoder.
+
+    Returns:
+        int: The file size in bytes, or 0 if the model does not run on ONNX Runtime.
+    """
+    session_model = getattr(model, "model", None)
+    if session_model is None and hasattr(model, "__getitem__"):
+        try:
+            session_model = getattr(model[0], "auto_model", None)
+        except (IndexError, KeyError, TypeError):
+            session_model = None
+    path = getattr(session_model, "path", None)
+    if path is None or not Path(path).is_file():
+        return 0
+    return Path(path).stat().st_size
+
+
+@dataclass
+class Parity:
+    """
+    Agreement between a backend's outputs and reference (PyTorch) outputs.
+
+    Attributes:
+        max_abs_diff (float): Largest absolute difference of any output value.
+        min_cosine (float): Lowest cosine similarity between matching output rows; 1.0
+                            for one-dimensional outputs such as cross-encoder scores.
+    """
+    max_abs_diff: float
+    min_cosine: float
+
+
+def compare_outputs(reference: np.ndarray, candidate: np.ndarray) -> Parity:
+    """
+    Measure how closely a backend reproduces reference outputs.
+
+    Args:
+        reference (np.ndarray): Reference embeddings (one row per text) or scores.
+        candidate (np.ndarray): The same outputs from the backend under test.
+
+    Returns:
+        Parity: The largest absolute difference and the lowest row cosine similarity.
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    if reference.shape != candidate.shape:
+        raise ValueError(f"Output shapes differ: {reference.shape} and {candidate.shape}")
+    max_abs_diff = float(np.abs(reference - candidate).max()) if reference.size else 0.0
+    if reference.ndim < 2 or not reference.size:
+        return Parity(max_abs_diff=max_abs_diff, min_cosine=1.0)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = np.einsum('ij,ij->i', reference, candidate) / np.maximum(norms, 1e-12)
+    return Parity(max_abs_diff=max_abs_diff, min_cosine=float(cosines.min()))
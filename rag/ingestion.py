@@ -0,0 +1,342 @@
+"""
+Ingestion module for RAG (Retrieval-Augmented Generation) system.
+
+This module provides a streaming, batched pipeline for loading JSONL documents into the
+vector store.  The pipeline runs three stages connected by bounded queues so that memory
+stays bounded no matter how large the input file is:
+
+- reader: parses lines into batches of documents, skipping bad lines, splits long
+  documents into chunks when given a Chunker (see rag.chunking), and drops the documents
+  whose content hash already matches the stored one
+- embedder: embeds each batch while the writer is still storing the previous one
+- writer: upserts the embedded batch and records a checkpoint so an interrupted run can
+  resume where it left off
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional, Union
+
+import numpy as np
+from pydantic import ValidationError
+
+from rag.cache import content_hash
+from schema.document import Document
+
+if TYPE_CHECKING:
+    from rag.chunking import Chunker
+    from rag.vectorstore import VectorStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_QUEUE_SIZE = 4
+_END_OF_STREAM = object()
+
+
+@dataclass
+class IngestionStats:
+    """
+    Summary of an ingestion run.
+
+    Attributes:
+        lines (int): Lines read from the input, including bad lines.
+        skipped (int): Lines skipped because they were not valid documents.
+        chunked (int): Documents split into several chunks.  With chunking the added,
+                       updated, unchanged and removed counts are of stored chunks.
+        added (int): Documents that were not in the index before.
+        updated (int): Documents whose content hash changed and were re-embedded.
+        unchanged (int): Documents skipped because their stored hash matched.
+        removed (int): Documents deleted because they are no longer in the input.
+        batches (int): Batches written to the vector store.
+        resumed_from_line (int): Line the run resumed after, 0 for a full run.
+        seconds (float): Wall clock time of the run.
+    """
+    lines: int = 0
+    skipped: int = 0
+    chunked: int = 0
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    batches: int = 0
+    resumed_from_line: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        """
+        Documents embedded and written per second.
+        """
+        return (self.added + self.updated) / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class _Batch:
+    """
+    A batch of documents moving through the pipeline.
+    """
+    documents: list[Document]
+    end_line: int
+    end_offset: int
+    embeddings: Optional[np.ndarray] = None
+
+
+class IngestionPipeline:
+    """
+    Streaming reader -> embedder -> writer pipeline for JSONL documents.
+
+    Each stage runs on its own thread and hands batches to the next through a bounded
+    queue, so at most a handful of batches are held in memory at once and embedding the
+    next batch overlaps with writing the previous one.
+
+    Attributes:
+        vector_store (VectorStore): The store documents are written to.
+        batch_size (int): Number of lines per batch.
+        queue_size (int): Maximum number of batches waiting between two stages.
+        checkpoint_path (Optional[Path]): File recording the last written line, or None
+                                          to disable resuming.
+        chunker (Optional[Chunker]): Splits each document into chunks before it is
+                                     embedded, or None to store documents whole.
+        stats (IngestionStats): Statistics for the current or last run.
+    """
+
+    def __init__(self,
+                 vector_store: 'VectorStore',
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 checkpoint_path: Optional[Union[str, Path]] = None,
+                 chunker: Optional['Chunker'] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            vector_store (VectorStore): The store to write documents to.
+            batch_size (int): Number of lines per batch. Defaults to 256.
+            queue_size (int): Maximum batches queued between two stages. Defaults to 4.
+            checkpoint_path (Optional[Union[str, Path]]): File to record progress in.
+                                                          Defaults to None (no resume).
+            chunker (Optional[Chunker]): Splits documents into chunks as they are read.
+                                         Defaults to None (documents stored whole).
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.chunker = chunker
+        self.stats = IngestionStats()
+
+    def run(self, path: Union[str, Path], delete_missing: bool = True) -> IngestionStats:
+        """
+        Ingest a JSONL file into the vector store.
+
+        If a checkpoint for the same file exists the run resumes after the last line that
+        was written.  The checkpoint is removed once the whole file has been ingested.
+
+        Args:
+            path (Union[str, Path]): The JSONL file to ingest.
+            delete_missing (bool): Delete stored documents that are not in the file.
+                                   Only applied when the whole file was read in this run,
+                                   since a resumed run has not seen the earlier ids.
+                                   Defaults to True.
+
+        Returns:
+            IngestionStats: Statistics for the run.
+
+        Raises:
+            FileNotFoundError: If the input file doesn't exist.
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"Input file not found at {path}")
+        self.stats = IngestionStats()
+        start_line, start_offset = self._load_checkpoint(path)
+        self.stats.resumed_from_line = start_line
+        seen_ids: Optional[set[str]] = set() if delete_missing and start_line == 0 else None
+        self._started = time.perf_counter()
+
+        to_embed: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        to_write: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        errors: list[BaseException] = []
+        stop = threading.Event()
+        reader = threading.Thread(target=self._stage, name="ingestion-reader", daemon=True,
+                                  args=(self._read(path, start_line, start_offset, seen_ids), to_embed, stop, errors))
+        embedder = threading.Thread(target=self._stage, name="ingestion-embedder", daemon=True,
+                                    args=(self._embed(self._drain(to_embed, stop)), to_write, stop, errors))
+        reader.start()
+        embedder.start()
+        try:
+            for batch in self._drain(to_write, stop):
+                self._write(path, batch)
+        except BaseException as error:
+            errors.append(error)
+        finally:
+            stop.set()
+            reader.join()
+            embedder.join()
+        if errors:
+            raise errors[0]
+
+        if seen_ids is not None:
+            removed = [id for id in self.vector_store.stored_ids() if id not in seen_ids]
+            if removed:
+                self.vector_store.delete_documents(removed)
+            self.stats.removed = len(removed)
+        elif delete_missing:
+            logger.warning("Skipping deletion of missing documents because the run was resumed")
+        if self.checkpoint_path and self.checkpoint_path.exists():
+            self.checkpoint_path.unlink()
+        self.stats.seconds = time.perf_counter() - self._started
+        logger.info(f"Ingested {path}: {self.stats} ({self.stats.docs_per_second:.1f} docs/sec)")
+        return self.stats
+
+    def _stage(self, batches: Iterator, output: queue.Queue, stop: threading.Event, errors: list):
+        """
+        Run one stage, feeding its batches into the next stage's queue.
+        """
+        try:
+            for batch in batches:
+                if not self._put(output, batch, stop):
+                    return
+        except BaseException as error:
+            errors.append(error)
+            stop.set()
+        finally:
+            self._put(output, _END_OF_STREAM, stop)
+
+    @staticmethod
+    def _put(output: queue.Queue, item, stop: threading.Event) -> bool:
+        """
+        Put an item on a bounded queue, giving up if the pipeline is stopping.
+        """
+        while not stop.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _drain(source: queue.Queue, stop: threading.Event) -> Iterator[_Batch]:
+        """
+        Yield batches from a queue until the previous stage finishes.
+        """
+        while True:
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _END_OF_STREAM:
+                return
+            yield item
+
+    def _read(self, path: Path, start_line: int, start_offset: int, seen_ids: Optional[set]) -> Iterator[_Batch]:
+        """
+        Reader stage: parse lines into batches of documents that need embedding.
+        """
+        documents: list[Document] = []
+        line_number = start_line
+        offset = start_offset
+        with open(path, 'rb') as f:
+            f.seek(start_offset)
+            for raw_line in f:
+                line_number += 1
+                offset += len(raw_line)
+                self.stats.lines += 1
+                if raw_line.strip():
+                    try:
+                        document = Document(**json.loads(raw_line))
+                    except (json.JSONDecodeError, UnicodeDecodeError, TypeError, ValidationError) as e:
+                        self.stats.skipped += 1
+                        logger.warning(f"Skipping invalid document on line {line_number} of {path}: {e}")
+                    else:
+                        documents.extend(self._chunk(document))
+                if self.stats.lines % self.batch_size == 0:
+                    yield self._changed(documents, line_number, offset, seen_ids)
+                    documents = []
+        if documents or self.stats.lines % self.batch_size:
+            yield self._changed(documents, line_number, offset, seen_ids)
+
+    def _chunk(self, document: Document) -> list[Document]:
+        """
+        Split a document with the chunker, if there is one.
+        """
+        if self.chunker is None:
+            return [document]
+        chunks = self.chunker.chunk(document)
+        self.stats.chunked += len(chunks) > 1
+        return chunks
+
+    def _changed(self, documents: list[Document], end_line: int, end_offset: int, seen_ids: Optional[set]) -> _Batch:
+        """
+        Keep only the documents whose content hash differs from the stored one.
+        """
+        if seen_ids is not None:
+            seen_ids.update(document.id for document in documents)
+        stored_hashes = self.vector_store.stored_hashes([document.id for document in documents]) if documents else {}
+        changed = []
+        for document in documents:
+            if document.id not in stored_hashes:
+                self.stats.added += 1
+            elif stored_hashes[document.id] != content_hash(document):
+                self.stats.updated += 1
+            else:
+                self.stats.unchanged += 1
+                continue
+            changed.append(document)
+        return _Batch(documents=changed, end_line=end_line, end_offset=end_offset)
+
+    def _embed(self, batches: Iterator[_Batch]) -> Iterator[_Batch]:
+        """
+        Embedder stage: embed the documents of each batch.
+        """
+        for batch in batches:
+            if batch.documents:
+                batch.embeddings = self.vector_store.embedder.embed_batch_array([doc.data for doc in batch.documents])
+            yield batch
+
+    def _write(self, path: Path, batch: _Batch):
+        """
+        Writer stage: store an embedded batch and checkpoint the progress.
+        """
+        if batch.documents:
+            self.vector_store.upsert_documents(batch.documents, embeddings=batch.embeddings)
+            self.stats.batches += 1
+        self._save_checkpoint(path, batch.end_line, batch.end_offset)
+        self.stats.seconds = time.perf_counter() - self._started
+        logger.info(f"Ingested through line {batch.end_line} of {path}: "
+                    f"{self.stats.added + self.stats.updated} embedded, {self.stats.unchanged} unchanged, "
+                    f"{self.stats.skipped} skipped, {self.stats.docs_per_second:.1f} docs/sec")
+
+    def _load_checkpoint(self, path: Path) -> tuple[int, int]:
+        """
+        Return the (line, byte offset) to resume from, (0, 0) for a fresh run.
+        """
+        if not self.checkpoint_path or not self.checkpoint_path.exists():
+            return 0, 0
+        checkpoint = json.loads(self.checkpoint_path.read_text())
+        if checkpoint.get('path') != str(path.resolve()) or checkpoint.get('offset', 0) > path.stat().st_size:
+            logger.warning(f"Ignoring checkpoint {self.checkpoint_path} recorded for a different input")
+            return 0, 0
+        logger.info(f"Resuming ingestion of {path} after line {checkpoint['line']}")
+        return checkpoint['line'], checkpoint['offset']
+
+    def _save_checkpoint(self, path: Path, line: int, offset: int):
+        """
+        Atomically record the last line that has been written.
+        """
+        if not self.checkpoint_path:
+            return
+        temporary = self.checkpoint_path.with_suffix(self.checkpoint_path.suffix + '.tmp')
+        temporary.write_text(json.dumps({'path': str(path.resolve()), 'line': line, 'offset': offset}))
+        temporary.replace(self.checkpoint_path)
@@ -2,12 +2,24 @@
 This module contains the Judge class, which is used to judge the quality of the generated response.
 """
 
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from rag.config import JUDGE_MAX_CONCURRENCY
 from rag.llm import OpenAI_LLM
 from schema.document import Document
 from enum import Enum
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
 
 MODE_JUDGE = "judge"
 MODE_EXPLAIN = "explain"
+MODE_STRUCTURED = "structured"
+# Bump whenever the judge prompts change, so cached verdicts are not reused.
+PROMPT_VERSION = "1"
 
 
 prompts = {
@@ -30,6 +42,19 @@ prompts = {
         Context documents:
         {context_section}
 
+        Generated answer:
+        * {response}""",
+    MODE_STRUCTURED: """You are a helpful and objective query response evaluator.  
+        You will find a set of context documents listed below.  You will also find
+        a generated answer.  Does the generated answer contain any factual claims that are
+        not explicitly stated in the context documents?  Reply with a JSON object with two
+        keys: "verdict", which is true if every claim is supported by the context documents
+        and false otherwise, and "explanation", which explains the verdict and identifies
+        the unsupported (hallucinated) parts, if any.
+
+        Context documents:
+        {context_section}
+
         Generated answer:
         * {response}"""
 }
@@ -55,15 +80,36 @@ class JudgeResult(Enum):
             bool: True if the result is definitive, False if it's MAYBE
         """
         return self in (JudgeResult.TRUE, JudgeResult.FALSE)
-    
+
+
+@dataclass
+class JudgeVerdict:
+    """
+    The outcome of judging one item of a batch.
+
+    Attributes:
+        index: Position of the item in the batch
+        result: The verdict, or None if the item failed
+        explanation: The explanation, for structured judging
+        seconds: Time spent judging the item, including waiting on retries
+        error: The error that made the item fail, if any
+    """
+    index: int
+    result: Optional[JudgeResult]
+    explanation: Optional[str] = None
+    seconds: float = 0.0
+    error: Optional[Exception] = None
+
+
 class Judge:
     """
     A class for evaluating the quality and accuracy of generated responses 
     against provided context documents using an LLM-based evaluation approach.
     
-    The Judge can operate in two modes:
+    The Judge can operate in three modes:
     - JUDGE: Returns a binary evaluation (TRUE/FALSE/MAYBE)
     - EXPLAIN: Returns a detailed explanation of the evaluation
+    - STRUCTURED: Returns both from a single JSON reply (used by judge_batch)
     
     Attributes:
         llm: The language model used for evaluation
@@ -71,14 +117,21 @@ class Judge:
         last_result: The last result received from the LLM
     """
     
-    def __init__(self):
+    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.0, llm: Optional[OpenAI_LLM] = None):
         """
         Initialize the Judge with an OpenAI LLM instance.
         
         Sets up the LLM client and initializes tracking variables for
         the last prompt and result.
+
+        Args:
+            model_name: The model used for evaluation. Defaults to "gpt-4o-mini".
+            temperature: The sampling temperature. Defaults to 0.0.
+            llm: The language model to use. Defaults to None, which creates an OpenAI_LLM.
         """
-        self.llm = OpenAI_LLM()
+        self.llm = llm or OpenAI_LLM()
+        self.model_name = model_name
+        self.temperature = temperature
         self.last_prompt = ""
         self.last_result = ""
 
@@ -97,13 +150,63 @@ class Judge:
         Raises:
             ValueError: If no context documents are provided
         """
+        prompt = self._build_prompt(response, context_documents, mode)
+        self.last_prompt = prompt
+        return self._complete(prompt, mode)
+
+    @staticmethod
+    def _build_prompt(response: str, context_documents: list[Document], mode: str) -> str:
+        """
+        Build the prompt for evaluating a response against its context documents.
+        """
         if len(context_documents) == 0:
             raise ValueError("No context documents provided")
         context_list = [doc.data for doc in context_documents]
         context_section = "\n* " + "\n* ".join(context_list)
-        prompt = prompts[mode].format(context_section=context_section, response=response)
-        self.last_prompt = prompt
-        return self.llm.generate_response(prompt, "gpt-4o-mini")
+        return prompts[mode].format(context_section=context_section, response=response)
+
+    def _complete(self, prompt: str, mode: str) -> str:
+        """
+        Send a judge prompt to the LLM.  Structured prompts ask for a JSON object.
+        """
+        response_format = {"type": "json_object"} if mode == MODE_STRUCTURED else None
+        return self.llm.generate_response(prompt, self.model_name, temperature=self.temperature,
+                                          template_version=f"{mode}:{PROMPT_VERSION}",
+                                          response_format=response_format)
+
+    @staticmethod
+    def _parse_result(text: str) -> JudgeResult:
+        """
+        Map a free-text verdict to a JudgeResult.
+        """
+        text = text.strip().lower()
+        if "false" in text and "true" in text:
+            return JudgeResult.MAYBE
+        elif "false" in text:
+            return JudgeResult.FALSE
+        elif "true" in text:
+            return JudgeResult.TRUE
+        else:
+            return JudgeResult.MAYBE
+
+    @classmethod
+    def _parse_structured(cls, text: str) -> tuple[JudgeResult, Optional[str]]:
+        """
+        Read the verdict and explanation from a structured reply, falling back to
+        free-text parsing if the reply isn't the expected JSON object.
+        """
+        try:
+            reply = json.loads(text)
+        except json.JSONDecodeError:
+            return cls._parse_result(text), text.strip()
+        if not isinstance(reply, dict):
+            return cls._parse_result(text), text.strip()
+        verdict = reply.get("verdict")
+        if isinstance(verdict, bool):
+            result = JudgeResult.TRUE if verdict else JudgeResult.FALSE
+        else:
+            result = cls._parse_result(str(verdict))
+        return result, reply.get("explanation")
         
     def judge(self, response: str, context_documents: list[Document]) -> JudgeResult:
         """
@@ -127,14 +230,7 @@ class Judge:
         """
         response = self._judge(response, context_documents, mode=MODE_JUDGE)
         self.last_result = response.strip().lower()
-        if "false" in self.last_result and "true" in self.last_result:
-            return JudgeResult.MAYBE
-        elif "false" in self.last_result:
-            return JudgeResult.FALSE
-        elif "true" in self.last_result:
-            return JudgeResult.TRUE
-        else:
-            return JudgeResult.MAYBE
+        return self._parse_result(self.last_result)
         
     def explain(self, response: str, context_documents: list[Document]) -> str:
         """
@@ -157,6 +253,77 @@ class Judge:
         self.last_result = explanation.strip()
         return self.last_result
     
+    def judge_iter(self,
+                   items: Iterable[tuple[str, list[Document]]],
+                   max_concurrency: int = JUDGE_MAX_CONCURRENCY,
+                   structured: bool = False) -> Iterator[JudgeVerdict]:
+        """
+        Judge many responses concurrently, yielding each verdict as soon as it is ready.
+
+        Up to max_concurrency LLM calls are in flight at once.  Verdicts come out in
+        completion order; use their index to match them to the input.  A failed item
+        yields a verdict with result None and the error, instead of stopping the batch.
+        Batch judging doesn't touch last_prompt or last_result.
+
+        Args:
+            items: (response, context_documents) pairs to evaluate
+            max_concurrency: Maximum number of concurrent LLM calls. Defaults to JUDGE_MAX_CONCURRENCY.
+            structured: Get the verdict and an explanation from a single call that returns
+                        JSON, instead of the verdict alone. Defaults to False.
+
+        Yields:
+            JudgeVerdict: The verdict for each item, in completion order
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        mode = MODE_STRUCTURED if structured else MODE_JUDGE
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="judge") as executor:
+            futures = [executor.submit(self._judge_item, index, response, context_documents, mode)
+                       for index, (response, context_documents) in enumerate(items)]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def judge_batch(self,
+                    items: Iterable[tuple[str, list[Document]]],
+                    max_concurrency: int = JUDGE_MAX_CONCURRENCY,
+                    structured: bool = False) -> list[JudgeVerdict]:
+        """
+        Judge many responses concurrently and return the verdicts in input order.
+
+        See judge_iter() for the arguments.
+
+        Returns:
+            list[JudgeVerdict]: One verdict per item, in the order of items
+        """
+        verdicts = list(self.judge_iter(items, max_concurrency=max_concurrency, structured=structured))
+        verdicts.sort(key=lambda verdict: verdict.index)
+        failures = sum(1 for verdict in verdicts if verdict.error is not None)
+        seconds = sum(verdict.seconds for verdict in verdicts)
+        logger.info(f"Judged {len(verdicts)} responses ({failures} failed), "
+                    f"{seconds / len(verdicts) if verdicts else 0.0:.2f}s mean latency")
+        return verdicts
+
+    def _judge_item(self, index: int, response: str, context_documents: list[Document], mode: str) -> JudgeVerdict:
+        """
+        Judge one item of a batch, recording its latency and any error.
+        """
+        start = time.perf_counter()
+        try:
+            reply = self._complete(self._build_prompt(response, context_documents, mode), mode)
+            if mode == MODE_STRUCTURED:
+                result, explanation = self._parse_structured(reply)
+            else:
+                result, explanation = self._parse_result(reply), None
+            return JudgeVerdict(index=index, result=result, explanation=explanation,
+                                seconds=time.perf_counter() - start)
+        except Exception as error:
+            logger.warning(f"Judging item {index} failed: {error}")
+            return JudgeVerdict(index=index, result=None, seconds=time.perf_counter() - start, error=error)
+
     def judge_rerank(self):
         pass
 
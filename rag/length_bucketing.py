@@ -0,0 +1,160 @@
+"""
+Length bucketing module for RAG (Retrieval-Augmented Generation) system.
+
+Transformer batches are padded to their longest input, so a batch that mixes a
+20-token chunk with a 500-token one spends most of its compute on padding.
+sentence-transformers already sorts each encode or predict call by character count, but
+it cuts the sorted inputs into batches of a fixed size.  Here inputs are sorted by their
+actual token count and cut into buckets that respect a budget of padded tokens per
+batch: many short texts share one batch and long texts go a few at a time.  Results are
+put back in input order.
+"""
+
+import logging
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A batch is closed once the next input is shorter than this share of its longest, so
+# no more than half of any batch is padding
+MIN_LENGTH_RATIO = 0.5
+
+
+def token_lengths(tokenizer: Any, texts: Sequence[str], max_length: Optional[int] = None,
+                  text_pairs: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    Count the tokens the model will see for each input, after truncation.
+
+    Args:
+        tokenizer (Any): The model's Hugging Face tokenizer.
+        texts (Sequence[str]): The texts, or the first text of each pair.
+        max_length (Optional[int]): The model's maximum sequence length, None for no
+                                    truncation.
+        text_pairs (Optional[Sequence[str]]): The second text of each pair, for
+                                              cross-encoders. Defaults to None.
+
+    Returns:
+        np.ndarray: One token count per input, special tokens included.
+    """
+    encoded = tokenizer(list(texts), list(text_pairs) if text_pairs is not None else None,
+                        truncation=max_length is not None, max_length=max_length, padding=False,
+                        return_attention_mask=False, return_token_type_ids=False)
+    return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+
+def max_sequence_length(model: Any) -> Optional[int]:
+    """
+    The number of tokens a SentenceTransformer or CrossEncoder truncates its input to.
+    """
+    # CrossEncoder renamed max_length to max_seq_length in sentence-transformers 5
+    return getattr(model, "max_seq_length", None) or getattr(model, "max_length", None)
+
+
+def length_buckets(lengths: np.ndarray, max_tokens: int, max_batch_size: Optional[int] = None) -> list[np.ndarray]:
+    """
+    Group input indexes into batches of similar length within a padded token budget.
+
+    Inputs are taken longest first, so each bucket is padded to its first input's
+    length.  A bucket takes inputs until max_tokens would be exceeded at that length
+    (it always holds at least one), or until the next input is shorter than
+    MIN_LENGTH_RATIO of it.
+
+    Args:
+        lengths (np.ndarray): Token count of each input.
+        max_tokens (int): Most padded tokens per batch, batch size x longest input.
+        max_batch_size (Optional[int]): Most inputs per batch. Defaults to None (no limit).
+
+    Returns:
+        list[np.ndarray]: Input indexes of each batch; together they cover every input once.
+    """
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be at least 1")
+    lengths = np.maximum(np.asarray(lengths), 1)
+    order = np.argsort(-lengths, kind="stable")
+    buckets = []
+    start = 0
+    while start < len(order):
+        longest = int(lengths[order[start]])
+        size = max(1, max_tokens // longest)
+        if max_batch_size:
+            size = min(size, max_batch_size)
+        end = min(start + size, len(order))
+        # Sorted descending, so the inputs that are too short for this bucket form a suffix
+        end = start + max(1, int(np.searchsorted(-lengths[order[start:end]], -longest * MIN_LENGTH_RATIO,
+                                                 side="right")))
+        buckets.append(order[start:end])
+        start = end
+    return buckets
+
+
+def fixed_batches(count: int, batch_size: int) -> list[np.ndarray]:
+    """
+    Input indexes cut into batches of batch_size in input order, as an unsorted caller
+    would batch them.
+    """
+    return [np.arange(start, min(start + batch_size, count)) for start in range(0, count, batch_size)]
+
+
+def padding_efficiency(lengths: np.ndarray, buckets: list[np.ndarray]) -> float:
+    """
+    Share of the computed token positions that hold real tokens rather than padding.
+
+    Args:
+        lengths (np.ndarray): Token count of each input.
+        buckets (list[np.ndarray]): Input indexes of each batch.
+
+    Returns:
+        float: Real tokens / padded tokens, 1.0 when there are no inputs.
+    """
+    lengths = np.asarray(lengths)
+    padded = sum(len(bucket) * int(lengths[bucket].max()) for bucket in buckets if len(bucket))
+    return float(lengths.sum()) / padded if padded else 1.0
+
+
+def encode_bucketed(model: Any, texts: Sequence[str], max_tokens: int, normalize: bool = False) -> np.ndarray:
+    """
+    Embed texts with a SentenceTransformer, one encode call per length bucket.
+
+    Args:
+        model (Any): The SentenceTransformer.
+        texts (Sequence[str]): The texts to embed.
+        max_tokens (int): Most padded tokens per batch, see length_buckets().
+        normalize (bool): Whether to L2 normalize the embeddings. Defaults to False.
+
+    Returns:
+        np.ndarray: One embedding per text, in input order.
+    """
+    lengths = token_lengths(model.tokenizer, texts, max_sequence_length(model))
+    embeddings = None
+    for bucket in length_buckets(lengths, max_tokens):
+        batch = model.encode([texts[i] for i in bucket], batch_size=len(bucket), convert_to_numpy=True,
+                             normalize_embeddings=normalize)
+        if embeddings is None:
+            embeddings = np.empty((len(texts),) + batch.shape[1:], dtype=batch.dtype)
+        embeddings[bucket] = batch
+    logger.debug(f"Encoded {len(texts)} texts in length buckets of at most {max_tokens} tokens")
+    return embeddings
+
+
+def predict_bucketed(ranker: Any, pairs: Sequence[tuple[str, str]], max_tokens: int) -> np.ndarray:
+    """
+    Score (query, text) pairs with a CrossEncoder, one predict call per length bucket.
+
+    Args:
+        ranker (Any): The CrossEncoder.
+        pairs (Sequence[tuple[str, str]]): The pairs to score.
+        max_tokens (int): Most padded tokens per batch, see length_buckets().
+
+    Returns:
+        np.ndarray: One score per pair, in input order.
+    """
+    if not pairs:
+        return np.empty(0, dtype=np.float32)
+    lengths = token_lengths(ranker.tokenizer, [query for query, _ in pairs], max_sequence_length(ranker),
+                            [text for _, text in pairs])
+    scores = np.empty(len(pairs), dtype=np.float32)
+    for bucket in length_buckets(lengths, max_tokens):
+        scores[bucket] = ranker.predict([pairs[i] for i in bucket], batch_size=len(bucket))
+    return scores
@@ -0,0 +1,295 @@
+"""
+Lexical index module for RAG (Retrieval-Augmented Generation) system.
+
+This module provides an in-process BM25 inverted index over document text, and reciprocal
+rank fusion for combining its rankings with dense search.  Exact terms such as species
+names then score directly instead of depending on where the embedding model puts them.
+
+Postings are stored in compressed sparse row form: an int32 array of document rows and a
+uint16 array of term frequencies, with each term's postings a contiguous slice given by an
+offsets array.  Added documents are buffered and merged into the arrays on the next query.
+Deleted documents are tombstoned and their postings dropped at the same merge.  Metadata
+filters use the vector index's MetadataIndex, so only postings of matching documents are
+scored.
+"""
+
+import logging
+import math
+import re
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+
+from rag.vector_index import MetadataIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+DEFAULT_RRF_K = 60
+# Rows of deleted documents are renumbered away once they make up this share of the index
+COMPACTION_FRACTION = 0.3
+_MAX_TERM_COUNT = np.iinfo(np.uint16).max
+_TOKEN_PATTERN = re.compile(r"\w+")
+STOP_WORDS = frozenset("""
+a about an and are as at be but by can do does for from has have how i in is it its me my no not of on or
+so that the their them there these they this to was what when where which who why will with you your
+""".split())
+
+
+def _stem(token: str) -> str:
+    """
+    Fold plural endings, so "crocodiles" matches "crocodile".  Deliberately crude: it
+    only has to map the forms in a query and a document to the same term.
+    """
+    if len(token) <= 3:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "uses")):
+        return token[:-2]
+    if token.endswith(("xes", "zes", "ches", "shes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def analyze(text: str) -> list[str]:
+    """
+    Split text into index terms: lower-cased words without stop words, plurals folded.
+
+    Args:
+        text (str): The text to analyze.
+
+    Returns:
+        list[str]: The terms, in text order and with repeats.
+    """
+    return [_stem(token) for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = DEFAULT_RRF_K) -> list[tuple[str, float]]:
+    """
+    Fuse several rankings of ids with reciprocal rank fusion.
+
+    Each id scores the sum of 1 / (k + rank) over the rankings it appears in, with ranks
+    starting at 1.  Only ranks matter, so scores on different scales (BM25 and vector
+    distances) can be fused without calibration.
+
+    Args:
+        rankings (Sequence[Sequence[str]]): Rankings of ids, best first.
+        k (int): Dampens the advantage of the very top ranks. Defaults to 60.
+
+    Returns:
+        list[tuple[str, float]]: (id, fused score) pairs, best first.  Ties keep the order
+                                 in which the ids were first seen.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over document text.
+
+    Ids follow the same rules as the vector index: add() skips ids that are already
+    indexed, upsert() replaces them and delete() removes them.  The index is safe to use
+    from several threads.  Documents indexed with metadata can be filtered at query time
+    with Chroma's `where` syntax.
+
+    Attributes:
+        k1 (float): Term frequency saturation.
+        b (float): Strength of document length normalization.
+    """
+
+    def __init__(self, k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1 (float): Term frequency saturation. Defaults to 1.2.
+            b (float): Document length normalization, from 0 (none) to 1 (full).
+                       Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._terms: dict[str, int] = {}
+        self._ids: list[Optional[str]] = []
+        self._rows: dict[str, int] = {}
+        self._metadatas: list[Optional[dict]] = []
+        self._metadata_index = MetadataIndex()
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._posting_rows = np.zeros(0, dtype=np.int32)
+        self._posting_counts = np.zeros(0, dtype=np.uint16)
+        # Postings of documents added since the last merge: (term ids, row, counts)
+        self._pending: list[tuple[np.ndarray, int, np.ndarray]] = []
+        self._pending_lengths: list[int] = []
+        self._dirty = False
+        self._dead = 0
+        self._length_norms = np.zeros(0, dtype=np.float32)
+
+    def count(self) -> int:
+        """
+        Number of indexed documents.
+        """
+        return len(self._rows)
+
+    def add(self, ids: list[str], documents: list[str], metadatas: Optional[list[Optional[dict]]] = None):
+        """
+        Index documents, skipping ids that are already indexed.
+
+        Args:
+            ids (list[str]): Document ids.
+            documents (list[str]): Document texts, one per id.
+            metadatas (Optional[list[Optional[dict]]]): Document metadata, one per id, for
+                                                        where filters. Defaults to None.
+        """
+        with self._lock:
+            for id, text, metadata in zip(ids, documents, metadatas or [None] * len(ids)):
+                if id not in self._rows:
+                    self._append(id, text, metadata)
+
+    def upsert(self, ids: list[str], documents: list[str], metadatas: Optional[list[Optional[dict]]] = None):
+        """
+        Index documents, replacing any indexed documents with the same ids.
+
+        Args:
+            ids (list[str]): Document ids.
+            documents (list[str]): Document texts, one per id.
+            metadatas (Optional[list[Optional[dict]]]): Document metadata, one per id, for
+                                                        where filters. Defaults to None.
+        """
+        with self._lock:
+            for id, text, metadata in zip(ids, documents, metadatas or [None] * len(ids)):
+                self._remove(id)
+                self._append(id, text, metadata)
+
+    def delete(self, ids: list[str]):
+        """
+        Remove documents from the index.  Unknown ids are ignored.
+
+        Args:
+            ids (list[str]): Ids of the documents to remove.
+        """
+        with self._lock:
+            for id in ids:
+                self._remove(id)
+
+    def _append(self, id: str, text: str, metadata: Optional[dict]):
+        terms = analyze(text)
+        term_ids, counts = np.unique(np.fromiter((self._terms.setdefault(term, len(self._terms)) for term in terms),
+                                                 dtype=np.int32, count=len(terms)), return_counts=True)
+        row = len(self._ids)
+        self._ids.append(id)
+        self._rows[id] = row
+        self._metadatas.append(metadata)
+        if metadata:
+            self._metadata_index.add(row, [metadata])
+        self._pending.append((term_ids, row, np.minimum(counts, _MAX_TERM_COUNT).astype(np.uint16)))
+        self._pending_lengths.append(len(terms))
+        self._dirty = True
+
+    def _remove(self, id: str):
+        row = self._rows.pop(id, None)
+        if row is not None:
+            self._ids[row] = None
+            self._dead += 1
+            self._dirty = True
+
+    def _merge(self):
+        """
+        Fold pending documents into the posting arrays and drop deleted documents.
+
+        New rows come after every existing row, so a stable sort on term id alone keeps
+        each term's postings in row order.
+        """
+        if not self._dirty:
+            return
+        terms = np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int32), np.diff(self._offsets))
+        rows, counts = self._posting_rows, self._posting_counts
+        if self._pending:
+            terms = np.concatenate([terms] + [term_ids for term_ids, _, _ in self._pending])
+            rows = np.concatenate([rows] + [np.full(len(term_ids), row, dtype=np.int32)
+                                            for term_ids, row, _ in self._pending])
+            counts = np.concatenate([counts] + [term_counts for _, _, term_counts in self._pending])
+            self._lengths = np.concatenate([self._lengths, np.asarray(self._pending_lengths, dtype=np.int32)])
+            self._pending, self._pending_lengths = [], []
+        alive = np.array([id is not None for id in self._ids], dtype=bool)
+        keep = alive[rows]
+        terms, rows, counts = terms[keep], rows[keep], counts[keep]
+        if self._dead and self._dead >= COMPACTION_FRACTION * len(self._ids):
+            renumber = np.cumsum(alive, dtype=np.int32) - 1
+            rows = renumber[rows]
+            self._lengths = self._lengths[alive]
+            self._ids = [id for id in self._ids if id is not None]
+            self._rows = {id: row for row, id in enumerate(self._ids)}
+            self._metadatas = [metadata for metadata, keep_row in zip(self._metadatas, alive) if keep_row]
+            self._metadata_index.clear()
+            self._metadata_index.add(0, self._metadatas)
+            self._dead = 0
+            alive = np.ones(len(self._ids), dtype=bool)
+        order = np.argsort(terms, kind='stable')
+        self._posting_rows, self._posting_counts = rows[order], counts[order]
+        self._offsets = np.zeros(len(self._terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self._terms)), out=self._offsets[1:])
+        average_length = float(self._lengths[alive].mean()) if alive.any() else 0.0
+        average_length = average_length or 1.0
+        self._length_norms = (self.k1 * (1.0 - self.b + self.b * self._lengths / average_length)).astype(np.float32)
+        self._dirty = False
+
+    def query(self, text: str, n_results: int = 10, where: Optional[dict] = None) -> list[tuple[str, float]]:
+        """
+        Find the documents that best match the query's terms.
+
+        Args:
+            text (str): The query.
+            n_results (int): Documents to return. Defaults to 10.
+            where (Optional[dict]): Chroma-style metadata filter.  Postings of documents
+                                    that don't match are skipped. Defaults to None.
+
+        Returns:
+            list[tuple[str, float]]: (id, BM25 score) pairs, best first.  Only documents
+                                     sharing at least one term with the query are returned.
+        """
+        with self._lock:
+            self._merge()
+            term_ids = [self._terms[term] for term in dict.fromkeys(analyze(text)) if term in self._terms]
+            documents = len(self._rows)
+            if not term_ids or documents == 0 or n_results <= 0:
+                return []
+            allowed = self._metadata_index.mask(where, len(self._ids)) if where else None
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term_id in term_ids:
+                start, end = self._offsets[term_id], self._offsets[term_id + 1]
+                if start == end:
+                    continue
+                rows = self._posting_rows[start:end]
+                counts = self._posting_counts[start:end]
+                # Document frequency counts every document, so filtering doesn't change scores
+                idf = math.log(1.0 + (documents - (end - start) + 0.5) / ((end - start) + 0.5))
+                if allowed is not None:
+                    keep = allowed[rows]
+                    rows, counts = rows[keep], counts[keep]
+                counts = counts.astype(np.float32)
+                # Each row appears once per term, so plain fancy-index addition is safe
+                scores[rows] += idf * counts * (self.k1 + 1.0) / (counts + self._length_norms[rows])
+            matched = np.flatnonzero(scores)
+            if len(matched) > n_results:
+                matched = matched[np.argpartition(-scores[matched], n_results - 1)[:n_results]]
+            matched = matched[np.argsort(-scores[matched], kind='stable')]
+            return [(self._ids[row], float(scores[row])) for row in matched]
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes held by the posting and document arrays.
+        """
+        with self._lock:
+            self._merge()
+            return (self._offsets.nbytes + self._posting_rows.nbytes + self._posting_counts.nbytes
+                    + self._lengths.nbytes + self._length_norms.nbytes)
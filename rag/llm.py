@@ -1,18 +1,65 @@
 import abc
+import asyncio
 import logging
+import threading
+import time
+import weakref
 import openai
 from abc import abstractmethod
-from rag.config import OPENAI_API_KEY
-from typing import Optional
+from rag.completion_cache import CompletionCache, completion_key, get_default_completion_cache
+from rag.config import CONNECTIVITY_CHECK_TTL_SECONDS, OPENAI_API_KEY, OPENAI_BASE_URL
+from rag.rate_limit import EXPECTED_COMPLETION_TOKENS, acall_with_retry, call_with_retry, estimate_tokens
+from typing import Iterator, Optional
 
 logger = logging.getLogger(__name__)
 
+# OpenAI clients (and their HTTP connection pools) are shared per API key and base URL.
+# Async clients are additionally keyed by event loop, since their pools are bound to one.
+# The clients' own retries are disabled; rag.rate_limit retries and throttles instead.
+_clients: dict[tuple[str, Optional[str]], openai.OpenAI] = {}
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_connectivity_checked_at: dict[tuple[str, Optional[str]], float] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: str, base_url: Optional[str] = None) -> openai.OpenAI:
+    """
+    Return the process-wide OpenAI client for an API key and base URL.
+    """
+    key = (api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        return _clients[key]
+
+
+def get_async_openai_client(api_key: str, base_url: Optional[str] = None) -> openai.AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for an API key and base URL on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        if (api_key, base_url) not in loop_clients:
+            loop_clients[(api_key, base_url)] = openai.AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                                                   max_retries=0)
+        return loop_clients[(api_key, base_url)]
+
+
+def reset_connectivity_checks():
+    """
+    Forget every cached connectivity check, forcing the next call to re-validate.
+    """
+    with _clients_lock:
+        _connectivity_checked_at.clear()
+
 class LLM(abc.ABC):    
     def __init__(self):
         pass
 
     @abstractmethod
-    def generate_response(self, prompt: str, model_name: str) -> str:
+    def generate_response(self, prompt: str, model_name: str, temperature: Optional[float] = None,
+                          template_version: Optional[str] = None) -> str:
         ...
     
     def _log_prompt_and_response(self, prompt: str, response: str):
@@ -28,12 +75,17 @@ class LLM(abc.ABC):
         ...
 
 class OpenAI_LLM(LLM):
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 cache: Optional[CompletionCache] = None):
         super().__init__()
         self.api_key = api_key or OPENAI_API_KEY
+        self.base_url = base_url or OPENAI_BASE_URL
         self._validate_config()
-        self.client = openai.OpenAI(api_key=self.api_key)
-        self._validate_connectivity()
+        # The client is shared and connectivity is checked lazily (see _ensure_connectivity),
+        # so constructing an LLM costs no network round-trip.
+        self.client = get_openai_client(self.api_key, self.base_url)
+        # Completions are cached by prompt and model settings (see rag.completion_cache)
+        self.cache = cache if cache is not None else get_default_completion_cache()
 
     def _validate_config(self) -> None:
         if not self.api_key:
@@ -46,23 +98,113 @@ class OpenAI_LLM(LLM):
     
     def _validate_connectivity(self) -> None:
         try:
-            self.client.models.list()
+            call_with_retry(self.client.models.list, tokens=0)
+            self._mark_connected()
         except Exception as e:
             self.handle_openai_error(e)
 
-    def generate_response(self, prompt: str, model_name: str) -> str:
+    def _connectivity_is_fresh(self) -> bool:
+        checked_at = _connectivity_checked_at.get((self.api_key, self.base_url))
+        return checked_at is not None and time.monotonic() - checked_at < CONNECTIVITY_CHECK_TTL_SECONDS
+
+    def _mark_connected(self) -> None:
+        # Any successful request proves connectivity, so it refreshes the cached check
+        _connectivity_checked_at[(self.api_key, self.base_url)] = time.monotonic()
+
+    def _ensure_connectivity(self) -> None:
+        if not self._connectivity_is_fresh():
+            self._validate_connectivity()
+
+    def _cached_response(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        response = self.cache.get(key)
+        if response is not None:
+            logger.debug("Completion cache hit")
+        return response
+
+    def _cache_key(self, prompt: str, model_name: str, temperature: Optional[float],
+                   template_version: Optional[str], response_format: Optional[dict] = None) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return completion_key(prompt, model_name, temperature, template_version, base_url=self.base_url,
+                              response_format=response_format)
+
+    @staticmethod
+    def _request_options(temperature: Optional[float], response_format: Optional[dict] = None) -> dict:
+        options = {} if temperature is None else {"temperature": temperature}
+        if response_format is not None:
+            options["response_format"] = response_format
+        return options
+
+    def generate_response(self, prompt: str, model_name: str, temperature: Optional[float] = None,
+                          template_version: Optional[str] = None, response_format: Optional[dict] = None) -> str:
+        key = self._cache_key(prompt, model_name, temperature, template_version, response_format)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached
+        self._ensure_connectivity()
         try:
-            response = self.client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}]
+            response = call_with_retry(
+                lambda: self.client.chat.completions.create(
+                    model=model_name,
+                    messages=[{"role": "user", "content": prompt}],
+                    **self._request_options(temperature, response_format)
+                ),
+                tokens=estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
             )
+            self._mark_connected()
             if not response.choices or response.choices[0].message.content is None:
                 return "No response from OpenAI"
             self._log_prompt_and_response(prompt, response.choices[0].message.content)
+            if key is not None:
+                self.cache.put(key, response.choices[0].message.content)
             return response.choices[0].message.content
         except Exception as e:
             self.handle_openai_error(e)
 
+    def generate_stream(self, prompt: str, model_name: str, temperature: Optional[float] = None,
+                        template_version: Optional[str] = None) -> Iterator[str]:
+        """
+        Yield the completion in pieces as the server streams them.
+
+        A cached completion is yielded as a single piece.  The assembled completion is
+        cached once the stream finishes.  Only opening the stream is retried; an error
+        part way through is raised to the caller.
+        """
+        key = self._cache_key(prompt, model_name, temperature, template_version)
+        cached = self._cached_response(key)
+        if cached is not None:
+            yield cached
+            return
+        self._ensure_connectivity()
+        try:
+            stream = call_with_retry(
+                lambda: self.client.chat.completions.create(
+                    model=model_name,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True,
+                    **self._request_options(temperature)
+                ),
+                tokens=estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+            )
+            self._mark_connected()
+            pieces = []
+            with stream:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        pieces.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+        except Exception as e:
+            self.handle_openai_error(e)
+        response = "".join(pieces)
+        if not response:
+            yield "No response from OpenAI"
+            return
+        self._log_prompt_and_response(prompt, response)
+        if key is not None:
+            self.cache.put(key, response)
+
     def handle_openai_error(self, error: Exception) -> None:
         if isinstance(error, openai.AuthenticationError):
             logger.error("OpenAI authentication error - check API key")
@@ -72,4 +214,50 @@ class OpenAI_LLM(LLM):
             logger.error(f"OpenAI API error: {error}")
         else:
             logger.error(f"Unexpected error: {error}")
-        raise error
\ No newline at end of file
+        raise error
+
+
+class AsyncOpenAI_LLM(OpenAI_LLM):
+    """
+    OpenAI LLM with a non-blocking completion method for use on an asyncio event loop.
+
+    Configuration and connectivity are validated exactly like OpenAI_LLM, and the
+    blocking generate_response remains available.  agenerate_response uses an
+    openai.AsyncOpenAI client, shared per event loop, so a slow completion doesn't tie
+    up a thread.
+    """
+    async def _avalidate_connectivity(self) -> None:
+        try:
+            await acall_with_retry(get_async_openai_client(self.api_key, self.base_url).models.list, tokens=0)
+            self._mark_connected()
+        except Exception as e:
+            self.handle_openai_error(e)
+
+    async def agenerate_response(self, prompt: str, model_name: str, temperature: Optional[float] = None,
+                                 template_version: Optional[str] = None,
+                                 response_format: Optional[dict] = None) -> str:
+        key = self._cache_key(prompt, model_name, temperature, template_version, response_format)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached
+        if not self._connectivity_is_fresh():
+            await self._avalidate_connectivity()
+        try:
+            client = get_async_openai_client(self.api_key, self.base_url)
+            response = await acall_with_retry(
+                lambda: client.chat.completions.create(
+                    model=model_name,
+                    messages=[{"role": "user", "content": prompt}],
+                    **self._request_options(temperature, response_format)
+                ),
+                tokens=estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+            )
+            self._mark_connected()
+            if not response.choices or response.choices[0].message.content is None:
+                return "No response from OpenAI"
+            self._log_prompt_and_response(prompt, response.choices[0].message.content)
+            if key is not None:
+                self.cache.put(key, response.choices[0].message.content)
+            return response.choices[0].message.content
+        except Exception as e:
+            self.handle_openai_error(e)
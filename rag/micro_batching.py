@@ -0,0 +1,225 @@
+"""
+Micro-batching module for RAG (Retrieval-Augmented Generation) system.
+
+When many threads call Retriever.retrieve at once, each would run its own forward pass
+over a single query.  A MicroBatcher sits in front of a batch function, such as
+Embedder.embed_batch_array or CrossEncoder.predict, and merges concurrent calls: it
+collects submitted items for up to max_wait_ms after the first one arrives, or until
+max_batch_size items are waiting, runs the function once over all of them and hands each
+caller its own result through a Future.  Items that queued up while a batch was running
+are taken straight away, so under load batches fill without waiting.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Queue sentinel that tells the worker thread to finish
+_STOP = object()
+
+
+@dataclass
+class MicroBatchStats:
+    """
+    Counters for a MicroBatcher.
+
+    Attributes:
+        requests (int): Items submitted.
+        batches (int): Calls made to the batch function.
+        failed_batches (int): Calls that raised; their callers receive the exception.
+        max_queue_depth (int): Most items ever waiting in the queue.
+        wait_seconds (float): Total time items spent queued before their batch ran.
+        max_wait_seconds (float): Longest time any item spent queued.
+        batch_sizes (dict[int, int]): Histogram of batch sizes, batches per size.
+    """
+    requests: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    max_queue_depth: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    batch_sizes: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def mean_batch_size(self) -> float:
+        """
+        Mean items per batch, 0 when no batch has run.
+        """
+        return sum(size * count for size, count in self.batch_sizes.items()) / self.batches if self.batches else 0.0
+
+    @property
+    def mean_wait_seconds(self) -> float:
+        """
+        Mean time an item spent queued, 0 when no batch has run.
+        """
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        return self.wait_seconds / items if items else 0.0
+
+
+@dataclass
+class _Request:
+    item: object
+    future: Future
+    enqueued_at: float
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Thread-safe scheduler that merges concurrent calls into batched calls of fn.
+
+    The worker thread starts on the first submission and is a daemon, so an idle batcher
+    does not keep the process alive.  fn runs on the worker thread, one batch at a time.
+    Each worker drains its own queue: stop() hands the running worker its stop sentinel
+    on that queue and swaps in a fresh one, so a submission that arrives while the old
+    worker is finishing starts a new worker that can never take the old one's sentinel.
+
+    Attributes:
+        fn (Callable[[list[T]], Sequence[R]]): Batch function, returning one result per
+                                              item, in item order.
+        max_batch_size (int): Most items passed to one call of fn.
+        max_wait_ms (float): Longest the first item of a batch waits for more to arrive.
+        name (str): Name used in logs.
+        stats (MicroBatchStats): Counters, updated as batches run.
+    """
+
+    def __init__(self, fn: Callable[[list[T]], Sequence[R]], max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 name: str = "micro-batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must not be negative")
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+        self.stats = MicroBatchStats()
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Items currently waiting for a batch.
+        """
+        return self._queue.qsize()
+
+    def submit(self, item: T) -> "Future[R]":
+        """
+        Queue one item.
+
+        Args:
+            item (T): The item to pass to fn.
+
+        Returns:
+            Future[R]: Resolves to the item's result, or to the exception fn raised.
+        """
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items: Sequence[T]) -> list["Future[R]"]:
+        """
+        Queue several items, which are batched like separately submitted ones.
+
+        Args:
+            items (Sequence[T]): The items to pass to fn.
+
+        Returns:
+            list[Future[R]]: One future per item, in item order.
+        """
+        futures = [Future() for _ in items]
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name=self.name, daemon=True)
+                self._thread.start()
+            now = time.monotonic()
+            for item, future in zip(items, futures):
+                self._queue.put(_Request(item, future, now))
+            self.stats.requests += len(items)
+            self.stats.max_queue_depth = max(self.stats.max_queue_depth, self._queue.qsize())
+        return futures
+
+    def map(self, items: Sequence[T]) -> list[R]:
+        """
+        Submit items and wait for their results.
+
+        Args:
+            items (Sequence[T]): The items to pass to fn.
+
+        Returns:
+            list[R]: One result per item, in item order.
+
+        Raises:
+            Exception: Whatever fn raised for the batch an item was part of.
+        """
+        return [future.result() for future in self.submit_many(items)]
+
+    def stop(self):
+        """
+        Finish the queued items and stop the worker thread.  A later submission starts
+        a new one.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            self._queue = queue.Queue()
+        thread.join()
+
+    def _run(self, requests: queue.Queue):
+        """
+        Worker loop: collect a batch from this worker's queue, run it, repeat until stopped.
+        """
+        stopping = False
+        while not stopping:
+            first = requests.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    request = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    break
+                batch.append(request)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list[_Request]):
+        """
+        Call fn on a batch and resolve its futures.
+        """
+        started_at = time.monotonic()
+        waits = [started_at - request.enqueued_at for request in batch]
+        error = None
+        try:
+            results = self.fn([request.item for request in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+        except Exception as exception:
+            logger.warning(f"{self.name} batch of {len(batch)} failed: {exception}")
+            error = exception
+        with self._lock:
+            self.stats.batches += 1
+            self.stats.failed_batches += error is not None
+            self.stats.wait_seconds += sum(waits)
+            self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, max(waits))
+            self.stats.batch_sizes[len(batch)] = self.stats.batch_sizes.get(len(batch), 0) + 1
+        for i, request in enumerate(batch):
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(results[i])
@@ -0,0 +1,269 @@
+"""
+Model registry module for RAG (Retrieval-Augmented Generation) system.
+
+This module provides a process-wide registry for the transformer models used by the
+RAG components.  Loading a sentence transformer or cross-encoder is expensive in both
+time and resident memory, so every component that needs a model asks the registry for
+it instead of constructing its own copy.  Models are keyed by kind, name and device,
+loaded at most once per process and shared between all callers.  Either kind of model can
+run on eager PyTorch or on ONNX Runtime (see rag.inference_backend); the backend setup is
+part of the key, so both can be loaded side by side.
+
+The registry also owns the multi-process encoding pools used to spread large embedding
+jobs over several CPU worker processes; they are stopped when the interpreter exits.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import torch
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+from rag.inference_backend import load_onnx_model, onnx_model_bytes, variant_name
+
+logger = logging.getLogger(__name__)
+
+KIND_SENTENCE_TRANSFORMER = "sentence_transformer"
+KIND_CROSS_ENCODER = "cross_encoder"
+KIND_EMBEDDING_POOL = "embedding_pool"
+
+
+@dataclass
+class ModelStats:
+    """
+    Load statistics for a model held by the registry.
+
+    Attributes:
+        kind (str): The kind of model (sentence transformer or cross-encoder).
+        model_name (str): The name of the pre-trained model.
+        device (str): The device the model was loaded onto.
+        load_seconds (float): Wall clock time spent loading the model.
+        memory_bytes (int): Bytes held by the model's parameters and buffers.
+        requests (int): Number of times the model has been handed out.
+        backend (str): The inference backend setup, e.g. "torch" or "onnx qint8_avx2".
+    """
+    kind: str
+    model_name: str
+    device: str
+    load_seconds: float
+    memory_bytes: int
+    requests: int = 0
+    backend: str = "torch"
+
+
+def _model_memory_bytes(model: Any) -> int:
+    """
+    Estimate the resident memory held by a model's parameters and buffers.
+
+    Args:
+        model (Any): A torch module (or a wrapper exposing one through ``model``), or a
+                     model running on ONNX Runtime.
+
+    Returns:
+        int: The number of bytes, the size of the ONNX graph for ONNX models, or 0 if the
+             model exposes neither.
+    """
+    module = model if isinstance(model, torch.nn.Module) else getattr(model, "model", None)
+    if not isinstance(module, torch.nn.Module):
+        return onnx_model_bytes(model)
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors) or onnx_model_bytes(model)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models.
+
+    The registry hands out a single shared instance per (kind, model name, device).
+    Loading is thread-safe: concurrent requests for the same model block on a
+    per-model lock so the model is only ever loaded once, while requests for
+    different models load in parallel.  The shared instances are used for inference
+    only (eval mode, no gradient state), which is safe to call from multiple threads.
+
+    Attributes:
+        stats (dict[tuple, ModelStats]): Load statistics keyed like the models.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._models: dict[tuple, Any] = {}
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats: dict[tuple, ModelStats] = {}
+
+    def get(self, kind: str, model_name: str, device: Optional[str], loader: Callable[[], Any],
+            backend: str = "torch") -> Any:
+        """
+        Return the shared model for the key, loading it with ``loader`` on first use.
+
+        Args:
+            kind (str): The kind of model being requested.
+            model_name (str): The name of the pre-trained model.
+            device (Optional[str]): The device to load onto.  None lets the library pick.
+            loader (Callable[[], Any]): Zero argument callable that loads the model.
+            backend (str): The inference backend setup, recorded in the stats.
+                           Defaults to "torch".
+
+        Returns:
+            Any: The shared model instance.
+        """
+        key = (kind, model_name, device)
+        with self._lock:
+            if key in self._models:
+                self.stats[key].requests += 1
+                return self._models[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    self.stats[key].requests += 1
+                    return self._models[key]
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            stats = ModelStats(kind=kind,
+                               model_name=model_name,
+                               device=str(getattr(model, "device", device)),
+                               load_seconds=load_seconds,
+                               memory_bytes=_model_memory_bytes(model),
+                               requests=1,
+                               backend=backend)
+            with self._lock:
+                self._models[key] = model
+                self.stats[key] = stats
+            logger.info(f"Loaded {kind} {model_name} on {stats.device} ({backend}) in {load_seconds:.2f}s "
+                        f"({stats.memory_bytes / 2**20:.1f} MiB)")
+            return model
+
+    def sentence_transformer(self, model_name: str, device: Optional[str] = None, backend: str = "torch",
+                             quantization: Optional[str] = None, threads: Optional[int] = None) -> SentenceTransformer:
+        """
+        Return the shared sentence transformer for a model name, device and backend.
+
+        Args:
+            model_name (str): The name of the pre-trained sentence transformer model.
+            device (Optional[str]): The device to load onto.  Defaults to the library default.
+                                    ONNX models always run on the CPU.
+            backend (str): "torch" or "onnx". Defaults to "torch".
+            quantization (Optional[str]): Dynamic int8 quantization for the ONNX backend,
+                                          see rag.inference_backend. Defaults to None.
+            threads (Optional[int]): Intra-op threads for the ONNX backend. Defaults to
+                                     ONNX Runtime's default.
+
+        Returns:
+            SentenceTransformer: The shared model instance.
+        """
+        variant = variant_name(backend, quantization, threads)
+        if backend == "onnx":
+            return self.get(KIND_SENTENCE_TRANSFORMER, model_name, f"cpu {variant}",
+                            lambda: load_onnx_model(SentenceTransformer, model_name, quantization, threads), variant)
+        return self.get(KIND_SENTENCE_TRANSFORMER, model_name, device,
+                        lambda: SentenceTransformer(model_name, device=device))
+
+    def cross_encoder(self, model_name: str, device: Optional[str] = None, backend: str = "torch",
+                      quantization: Optional[str] = None, threads: Optional[int] = None) -> CrossEncoder:
+        """
+        Return the shared cross-encoder for a model name, device and backend.
+
+        Cross-encoders are always loaded with a sigmoid activation so that scores fall
+        in the 0-1 range the retriever thresholds are expressed in.
+
+        Args:
+            model_name (str): The name of the pre-trained cross-encoder model.
+            device (Optional[str]): The device to load onto.  Defaults to the library default.
+                                    ONNX models always run on the CPU.
+            backend (str): "torch" or "onnx". Defaults to "torch".
+            quantization (Optional[str]): Dynamic int8 quantization for the ONNX backend,
+                                          see rag.inference_backend. Defaults to None.
+            threads (Optional[int]): Intra-op threads for the ONNX backend. Defaults to
+                                     ONNX Runtime's default.
+
+        Returns:
+            CrossEncoder: The shared model instance.
+        """
+        variant = variant_name(backend, quantization, threads)
+        if backend == "onnx":
+            return self.get(KIND_CROSS_ENCODER, model_name, f"cpu {variant}",
+                            lambda: load_onnx_model(CrossEncoder, model_name, quantization, threads,
+                                                    activation_fn=torch.nn.Sigmoid()), variant)
+        return self.get(KIND_CROSS_ENCODER, model_name, device,
+                        lambda: CrossEncoder(model_name, device=device, activation_fn=torch.nn.Sigmoid()))
+
+    def embedding_pool(self, model_name: str, workers: int, device: Optional[str] = None) -> dict[str, Any]:
+        """
+        Return the shared multi-process encoding pool for a sentence transformer.
+
+        The pool starts on first use with one CPU worker process per worker, each holding
+        a copy of the model, and stays up until stop_pools() or interpreter exit.
+        sentence-transformers moves the model it starts a pool from to the CPU, so when the
+        shared model runs on an accelerator the pool is started from a separate CPU copy,
+        and the Embedders and Retrievers sharing the model stay where they are.
+
+        Args:
+            model_name (str): The name of the pre-trained sentence transformer model.
+            workers (int): Number of worker processes.
+            device (Optional[str]): The device the shared model was loaded onto.
+
+        Returns:
+            dict[str, Any]: The sentence-transformers pool (input and output queues and
+                            the worker processes).
+        """
+        def _start_pool() -> dict[str, Any]:
+            model = self.sentence_transformer(model_name, device)
+            if model.device.type != "cpu":
+                logger.info(f"Loading a CPU copy of {model_name} for the embedding pool, {model_name} "
+                            f"stays on {model.device}")
+                model = SentenceTransformer(model_name, device="cpu")
+            return model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+        return self.get(KIND_EMBEDDING_POOL, model_name, f"{workers}x cpu", _start_pool)
+
+    def stop_pools(self):
+        """
+        Stop every multi-process encoding pool and forget it.
+        """
+        with self._lock:
+            keys = [key for key in self._models if key[0] == KIND_EMBEDDING_POOL]
+            pools = [self._models.pop(key) for key in keys]
+            for key in keys:
+                self.stats.pop(key, None)
+                self._key_locks.pop(key, None)
+        for pool in pools:
+            SentenceTransformer.stop_multi_process_pool(pool)
+        if pools:
+            logger.info(f"Stopped {len(pools)} embedding pool(s)")
+
+    def report(self) -> list[ModelStats]:
+        """
+        Return the load statistics for every model loaded so far.
+
+        Returns:
+            list[ModelStats]: One entry per loaded model, in load order.
+        """
+        with self._lock:
+            return list(self.stats.values())
+
+    def clear(self):
+        """
+        Drop every cached model so the next request reloads it.
+
+        This is intended for tests and for releasing memory in long running processes.
+        Components that already hold a model keep their reference.  Encoding pools are
+        stopped.
+        """
+        self.stop_pools()
+        with self._lock:
+            self._models.clear()
+            self._key_locks.clear()
+            self.stats.clear()
+
+
+MODEL_REGISTRY = ModelRegistry()
+atexit.register(MODEL_REGISTRY.stop_pools)
@@ -4,8 +4,18 @@ Pipeline module for RAG (Retrieval-Augmented Generation) system.
 This module provides the main pipeline that orchestrates the retrieval and generation
 components of the RAG system. It provides a simple interface for running end-to-end
 RAG queries.
+
+Besides the synchronous run(), the pipeline has an asyncio path, arun(), for serving many
+queries from one event loop: retrieval is CPU-bound and runs on a thread pool, while the
+LLM call is awaited on a non-blocking client.
 """
 
+import asyncio
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Iterator, Optional
+
+from rag.config import PIPELINE_MAX_CONCURRENCY
 from rag.generator import Generator
 from rag.retriever import Retriever
 
@@ -21,18 +31,34 @@ class RagPipeline:
     Attributes:
         retriever (Retriever): The document retriever component.
         generator (Generator): The response generator component.
+        max_concurrency (int): Maximum number of arun() calls in flight at once.
+        executor (Executor): Thread pool that arun() offloads retrieval to.
     """
     
-    def __init__(self, retriever: Retriever, generator: Generator):
+    def __init__(self,
+                 retriever: Retriever,
+                 generator: Generator,
+                 max_concurrency: int = PIPELINE_MAX_CONCURRENCY,
+                 executor: Optional[Executor] = None):
         """
         Initialize the RAG pipeline with retriever and generator components.
         
         Args:
             retriever (Retriever): The document retriever to use for finding relevant documents.
             generator (Generator): The response generator to use for creating answers.
+            max_concurrency (int): Maximum number of arun() calls processed at once; further
+                                   calls wait their turn.  Defaults to PIPELINE_MAX_CONCURRENCY.
+            executor (Optional[Executor]): Executor for retrieval in arun().  Defaults to None,
+                                           which creates a thread pool sized to max_concurrency.
         """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
         self.generator = generator
         self.retriever = retriever
+        self.max_concurrency = max_concurrency
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_concurrency,
+                                                       thread_name_prefix="rag-retrieval")
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
     def run(self, query: str):
         """
@@ -50,7 +76,46 @@ class RagPipeline:
         documents = self.retriever.retrieve(query)
         return self.generator.generate(query, documents)
 
+    def run_stream(self, query: str) -> Iterator[str]:
+        """
+        Run the RAG pipeline on a query, yielding the response tokens as they are generated.
+
+        Retrieval completes before the first token is yielded.  Afterwards the assembled
+        response is available as generator.last_response and the timing as
+        generator.last_stream_stats.
+
+        Args:
+            query (str): The user's query to process.
 
+        Yields:
+            str: Pieces of the generated response, in order.
+        """
+        documents = self.retriever.retrieve(query)
+        yield from self.generator.generate_stream(query, documents)
 
+    async def arun(self, query: str) -> str:
+        """
+        Run the complete RAG pipeline on a given query without blocking the event loop.
 
+        Retrieval runs on the pipeline's executor and generation awaits a non-blocking
+        LLM call.  At most max_concurrency queries are processed at once per event loop.
 
+        Args:
+            query (str): The user's query to process.
+
+        Returns:
+            str: The generated response based on retrieved documents.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(loop):
+            documents = await loop.run_in_executor(self.executor, self.retriever.retrieve, query)
+            return await self.generator.agenerate(query, documents)
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        """
+        Return the concurrency limiting semaphore for an event loop.
+        """
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
@@ -0,0 +1,286 @@
+"""
+Rate limiting and retry module for RAG (Retrieval-Augmented Generation) system.
+
+This module keeps LLM traffic below the provider's quota instead of bouncing off it, and
+retries the calls that fail transiently:
+
+- TokenBucket / RateLimiter: client-side throttling of requests per minute and tokens
+  per minute.  A single LLM_RATE_LIMITER is shared by every Generator and Judge in the
+  process.
+- RetryPolicy: exponential backoff with full jitter that honours the server's
+  Retry-After header on 429 and 5xx responses.  A 429 for an exhausted quota
+  (insufficient_quota) fails at once.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import openai
+
+from rag.config import (
+    LLM_MAX_RETRIES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_RETRY_BASE_DELAY_SECONDS,
+    LLM_RETRY_MAX_DELAY_SECONDS,
+    LLM_TOKENS_PER_MINUTE,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = (openai.RateLimitError,
+                    openai.APIConnectionError,
+                    openai.APITimeoutError,
+                    openai.InternalServerError)
+# 429 codes that no amount of waiting fixes
+PERMANENT_ERROR_CODES = ('insufficient_quota',)
+# Rough size of a completion, used when throttling on tokens per minute
+EXPECTED_COMPLETION_TOKENS = 256
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimate the number of tokens in a text (about four characters per token).
+    """
+    return len(text) // 4 + 1
+
+
+@dataclass
+class LLMCallStats:
+    """
+    Counters for LLM calls made through call_with_retry.
+
+    Attributes:
+        calls (int): Logical calls made.
+        attempts (int): Requests sent, including retries.
+        retries (int): Requests retried after a transient error.
+        failures (int): Calls that failed after exhausting their retries.
+        throttled (int): Requests delayed by the client-side rate limiter.
+        throttle_seconds (float): Total time spent waiting on the rate limiter.
+        backoff_seconds (float): Total time spent waiting between retries.
+    """
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    failures: int = 0
+    throttled: int = 0
+    throttle_seconds: float = 0.0
+    backoff_seconds: float = 0.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    Reservations are granted immediately and may take the bucket below zero; the caller
+    is told how long to wait for its reservation to be covered.  This keeps waiting
+    outside the lock and works the same for threads and coroutines.
+
+    Attributes:
+        per_minute (float): Refill rate, and the bucket capacity.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.per_minute = per_minute
+        self._clock = clock
+        self._available = float(per_minute)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Take amount from the bucket.
+
+        Args:
+            amount (float): Tokens to take. Defaults to 1.
+
+        Returns:
+            float: Seconds the caller must wait before using the reservation.
+        """
+        with self._lock:
+            now = self._clock()
+            self._available = min(self.per_minute,
+                                  self._available + (now - self._updated_at) * self.per_minute / 60.0)
+            self._updated_at = now
+            self._available -= amount
+            if self._available >= 0:
+                return 0.0
+            return -self._available * 60.0 / self.per_minute
+
+
+class RateLimiter:
+    """
+    Client-side limiter on requests per minute and tokens per minute.
+
+    Attributes:
+        requests (Optional[TokenBucket]): Requests per minute bucket, None if unlimited.
+        tokens (Optional[TokenBucket]): Tokens per minute bucket, None if unlimited.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.requests = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve one request and the given number of tokens.
+
+        Returns:
+            float: Seconds to wait before sending the request.
+        """
+        wait = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient LLM errors.
+
+    Attributes:
+        max_retries (int): Retries after the first attempt.
+        base_delay (float): Backoff ceiling for the first retry, doubled on each retry.
+        max_delay (float): Upper bound on any single wait, including Retry-After.
+    """
+
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES, base_delay: float = LLM_RETRY_BASE_DELAY_SECONDS,
+                 max_delay: float = LLM_RETRY_MAX_DELAY_SECONDS):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Whether an error is transient.  A 429 for an exhausted quota is not.
+        """
+        return isinstance(error, RETRYABLE_ERRORS) and getattr(error, "code", None) not in PERMANENT_ERROR_CODES
+
+    def delay(self, retry: int, error: Exception) -> float:
+        """
+        Seconds to wait before a retry.
+
+        Args:
+            retry (int): Zero based retry number.
+            error (Exception): The error that triggered the retry.
+
+        Returns:
+            float: The server's Retry-After if it sent one, otherwise a random delay
+                   between 0 and base_delay * 2**retry, both capped at max_delay.
+        """
+        retry_after = self.retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """
+        Read the Retry-After (or retry-after-ms) header from an API error, if any.
+        """
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000.0
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+LLM_RATE_LIMITER = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+LLM_RETRY_POLICY = RetryPolicy()
+LLM_CALL_STATS = LLMCallStats()
+_stats_lock = threading.Lock()
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            setattr(LLM_CALL_STATS, name, getattr(LLM_CALL_STATS, name) + value)
+
+
+def call_with_retry(request: Callable[[], T], tokens: int,
+                    limiter: Optional[RateLimiter] = None, policy: Optional[RetryPolicy] = None) -> T:
+    """
+    Send a request through the rate limiter, retrying transient errors.
+
+    Args:
+        request (Callable[[], T]): Sends the request and returns its result.
+        tokens (int): Estimated tokens the request will consume.
+        limiter (Optional[RateLimiter]): The rate limiter. Defaults to the shared LLM_RATE_LIMITER.
+        policy (Optional[RetryPolicy]): The retry policy. Defaults to LLM_RETRY_POLICY.
+
+    Returns:
+        T: The request's result.
+
+    Raises:
+        Exception: The last error once retries are exhausted, or any non-retryable error.
+    """
+    limiter = limiter or LLM_RATE_LIMITER
+    policy = policy or LLM_RETRY_POLICY
+    _count(calls=1)
+    for retry in range(policy.max_retries + 1):
+        wait = limiter.reserve(tokens)
+        if wait:
+            _count(throttled=1, throttle_seconds=wait)
+            time.sleep(wait)
+        try:
+            _count(attempts=1)
+            return request()
+        except Exception as error:
+            if not policy.is_retryable(error) or retry == policy.max_retries:
+                _count(failures=1)
+                raise
+            delay = policy.delay(retry, error)
+            _count(retries=1, backoff_seconds=delay)
+            logger.warning(f"Retrying LLM call in {delay:.2f}s after {type(error).__name__}")
+            time.sleep(delay)
+
+
+async def acall_with_retry(request: Callable[[], Awaitable[T]], tokens: int,
+                           limiter: Optional[RateLimiter] = None, policy: Optional[RetryPolicy] = None) -> T:
+    """
+    Asynchronous version of call_with_retry that waits without blocking the event loop.
+    """
+    limiter = limiter or LLM_RATE_LIMITER
+    policy = policy or LLM_RETRY_POLICY
+    _count(calls=1)
+    for retry in range(policy.max_retries + 1):
+        wait = limiter.reserve(tokens)
+        if wait:
+            _count(throttled=1, throttle_seconds=wait)
+            await asyncio.sleep(wait)
+        try:
+            _count(attempts=1)
+            return await request()
+        except Exception as error:
+            if not policy.is_retryable(error) or retry == policy.max_retries:
+                _count(failures=1)
+                raise
+            delay = policy.delay(retry, error)
+            _count(retries=1, backoff_seconds=delay)
+            logger.warning(f"Retrying LLM call in {delay:.2f}s after {type(error).__name__}")
+            await asyncio.sleep(delay)
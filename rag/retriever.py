@@ -3,18 +3,35 @@ Retriever module for RAG (Retrieval-Augmented Generation) system.
 
 This module provides functionality for retrieving relevant documents based on user queries.
 It combines semantic search using embeddings with re-ranking using cross-encoders to
-improve retrieval quality.
+improve retrieval quality.  Re-ranking can run as a cascade, where a cheap scorer
+shortlists the candidates for the heavy cross-encoder and can settle clear-cut queries
+on its own.  With micro-batching, the query encodes and cross-encoder calls of threads
+retrieving concurrently are merged into shared forward passes.  When the vector store
+splits documents into chunks, the reranked chunk hits are collapsed back to one result
+per parent document.
 """
 
+import threading
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional
+
+import numpy as np
 from sentence_transformers import CrossEncoder
 
-from rag.embedding import Embedder
+from rag.cache import CacheStats, RerankScoreCache, content_hash
+from rag.chunking import collapse_chunks
+from rag.config import (INFERENCE_BACKEND, INFERENCE_THREADS, MICRO_BATCH_MAX_PAIRS, MICRO_BATCH_MAX_QUERIES,
+                        MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCHING, ONNX_QUANTIZATION, RERANK_CASCADE_RANKER,
+                        RERANK_CASCADE_TOP_M, RERANK_EARLY_EXIT, RERANK_MAX_BATCH_TOKENS, RETRIEVAL_MODE)
+from rag.deduplication import de_duplicate
+from rag.embedding import QUERY_EMBEDDING_CACHE, Embedder
+from rag.length_bucketing import predict_bucketed
+from rag.micro_batching import MicroBatcher, MicroBatchStats
+from rag.model_registry import MODEL_REGISTRY
 from rag.vectorstore import VectorStore
 from schema.document import Document, MetaData
 import logging
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import torch
 
 DEFAULT_DOCUMENT = Document(id='missing_document', 
                             metadata=MetaData(title="No documents retrieved for query", 
@@ -32,6 +49,28 @@ INSUFFICIENT_RELEVANCE_DOCUMENT = Document(id='insufficient_relevance',
 
 logger = logging.getLogger(__name__)
 
+# A top document that beats the runner-up by this much is accepted even below the threshold
+SCORE_DELTA = 0.1
+# Cascade ranker that scores candidates by the cosine similarity of their stored embeddings
+BI_ENCODER_RANKER = "bi-encoder"
+
+
+@dataclass
+class CascadeStats:
+    """
+    Counters for the re-ranking cascade.
+
+    Attributes:
+        queries (int): Queries re-ranked through the cascade.
+        early_exits (int): Queries settled by the cheap scorer alone.
+        cheap_pairs (int): (query, document) pairs scored by the cheap scorer.
+        heavy_pairs (int): (query, document) pairs passed to the heavy cross-encoder.
+    """
+    queries: int = 0
+    early_exits: int = 0
+    cheap_pairs: int = 0
+    heavy_pairs: int = 0
+
 
 
 class Retriever:
@@ -49,15 +88,61 @@ class Retriever:
     However, I am suspicious that the sigmoid function is not the best way to convert
     cross encoder scores for all models.  This is something to investigate as I proceed.
     
+    The embedder is shared with the vector store and both models come from the
+    process-wide model registry, so each model is only loaded once per process.
+    Query embeddings and cross-encoder scores are cached; cached scores are dropped
+    whenever the vector store adds, changes or deletes the document they belong to.
+
+    With a cascade ranker, every candidate is first scored by the cheap ranker (a smaller
+    cross-encoder, or the bi-encoder cosine similarity of the stored embeddings) and only
+    the best cascade_top_m go to the heavy ranker.  The rest follow the heavy-ranked
+    ones in cheap score order.  With early_exit, a query whose cheap top score clears the
+    threshold and beats the runner-up by early_exit_margin skips the heavy ranker and is
+    ranked by the cheap scores; this needs a cheap cross-encoder, since cosine
+    similarities are not on the threshold's scale.
+
+    With micro-batching, the query encodes and cross-encoder predict calls of concurrent
+    retrieve() calls go through MicroBatchers, which merge them into shared forward
+    passes.  Each caller waits at most about max_wait_ms longer for its batch to start.
+
+    Chunks of the same document are searched and reranked separately, then only the best
+    ranked chunk of each document is returned, under the document's id.
+
     Attributes:
         embedder (Embedder): The abstraction of the embedding model for semantic search.
         document_ranker (CrossEncoder): The cross-encoder model for re-ranking.
         vector_store (VectorStore): The vector database for document storage and retrieval.
+        rerank_cache (RerankScoreCache): Cache of cross-encoder scores.
+        cascade_ranker_name (Optional[str]): Cheap first-stage ranker, None for no cascade.
+        cascade_top_m (int): Candidates per query passed on to the heavy ranker.
+        early_exit (bool): Whether a decisive cheap score skips the heavy ranker.
+        early_exit_margin (float): Lead over the runner-up that makes a cheap score decisive.
+        cascade_stats (CascadeStats): Counters for the cascade, updated under a lock since
+                                      concurrent retrievals share them.
+        rerank_batchers (dict[str, MicroBatcher]): Micro-batchers of the cross-encoders,
+                                                   by model name; empty when
+                                                   micro-batching is off.
+        rerank_max_batch_tokens (Optional[int]): Padded tokens per length bucket of
+                                                 (query, document) pairs, None for the
+                                                 library's fixed batch size.
     """
     
     def __init__(self, 
                  embedder_model_name: str = 'all-MiniLM-L6-v2',
-                 ranker_model_name: str = 'cross-encoder/ms-marco-MiniLM-L-12-v2'):   
+                 ranker_model_name: str = 'cross-encoder/ms-marco-MiniLM-L-12-v2',
+                 cascade_ranker_name: Optional[str] = RERANK_CASCADE_RANKER,
+                 cascade_top_m: int = RERANK_CASCADE_TOP_M,
+                 early_exit: bool = RERANK_EARLY_EXIT,
+                 early_exit_margin: float = SCORE_DELTA,
+                 backend: str = INFERENCE_BACKEND,
+                 quantization: Optional[str] = ONNX_QUANTIZATION,
+                 threads: Optional[int] = INFERENCE_THREADS,
+                 micro_batching: bool = MICRO_BATCHING,
+                 rerank_max_batch_tokens: Optional[int] = RERANK_MAX_BATCH_TOKENS,
+                 embedder: Optional[Embedder] = None,
+                 vector_store: Optional[VectorStore] = None,
+                 document_ranker: Optional[CrossEncoder] = None,
+                 cascade_ranker: Optional[CrossEncoder] = None):
         """
         Initialize the Retriever with embedding and ranking models.
         
@@ -66,29 +151,107 @@ class Retriever:
                                       Defaults to 'all-MiniLM-L6-v2'.
             ranker_model_name (str): Name of the cross-encoder model for re-ranking.
                                     Defaults to 'cross-encoder/ms-marco-MiniLM-L-6-v2'.
+            cascade_ranker_name (Optional[str]): Cheap first-stage ranker: a cross-encoder
+                                                 name such as
+                                                 'cross-encoder/ms-marco-MiniLM-L-6-v2', or
+                                                 "bi-encoder" for embedding cosine
+                                                 similarity.  Defaults to the
+                                                 RERANK_CASCADE_RANKER environment
+                                                 variable, or None for no cascade.
+            cascade_top_m (int): Candidates per query passed on to the heavy ranker.
+                                 Defaults to RERANK_CASCADE_TOP_M, or 5.
+            early_exit (bool): Whether a decisive cheap score skips the heavy ranker.
+                               Defaults to RERANK_EARLY_EXIT, or False.
+            early_exit_margin (float): Lead over the runner-up that makes a cheap top score
+                                       decisive. Defaults to SCORE_DELTA, 0.1.
+            backend (str): Inference backend for the embedder and cross-encoders, "torch" or
+                           "onnx", see Embedder. Defaults to INFERENCE_BACKEND, or "torch".
+            quantization (Optional[str]): Dynamic int8 quantization of the ONNX models.
+                                          Defaults to ONNX_QUANTIZATION, or None.
+            threads (Optional[int]): ONNX Runtime intra-op threads. Defaults to
+                                     INFERENCE_THREADS, or one per physical core.
+            micro_batching (bool): Whether to merge the model calls of concurrent
+                                   retrievals, see start_micro_batching(). Defaults to
+                                   MICRO_BATCHING, or False.
+            rerank_max_batch_tokens (Optional[int]): Budget of padded tokens per batch for
+                                                     length bucketed scoring, see
+                                                     rag.length_bucketing. Defaults to
+                                                     RERANK_MAX_BATCH_TOKENS, or None.
+            embedder (Optional[Embedder]): An existing embedder to use. Defaults to None,
+                                           which builds one for embedder_model_name.
+            vector_store (Optional[VectorStore]): An existing vector store to search.
+                                                  Defaults to None, which builds one
+                                                  sharing the embedder.
+            document_ranker (Optional[CrossEncoder]): The heavy cross-encoder, e.g. a stand-in
+                                                      for tests.  ranker_model_name still
+                                                      names it in the rerank cache. Defaults
+                                                      to None, which loads ranker_model_name.
+            cascade_ranker (Optional[CrossEncoder]): The cheap cross-encoder, named by
+                                                     cascade_ranker_name. Defaults to None,
+                                                     which loads cascade_ranker_name.
+
+        Raises:
+            ValueError: If early_exit is combined with the "bi-encoder" cascade ranker,
+                        whose cosine similarities are not on the threshold's 0-1 scale.
         """
-        self.embedder = Embedder(embedder_model_name)
-        self.document_ranker = CrossEncoder(ranker_model_name, activation_fn=torch.nn.Sigmoid())
-        self.vector_store = VectorStore()
+        if early_exit and cascade_ranker_name == BI_ENCODER_RANKER:
+            raise ValueError("early_exit needs a cross-encoder cascade ranker: bi-encoder cosine similarities "
+                             "cannot be compared with the threshold")
+        self.embedder = embedder or Embedder(embedder_model_name, backend=backend, quantization=quantization,
+                                             threads=threads)
+        self.ranker_model_name = ranker_model_name
+        if document_ranker is None:
+            document_ranker = MODEL_REGISTRY.cross_encoder(ranker_model_name, backend=backend,
+                                                           quantization=quantization, threads=threads)
+        self.document_ranker = document_ranker
+        self.cascade_ranker_name = cascade_ranker_name
+        if cascade_ranker is None and cascade_ranker_name not in (None, BI_ENCODER_RANKER):
+            cascade_ranker = MODEL_REGISTRY.cross_encoder(cascade_ranker_name, backend=backend,
+                                                          quantization=quantization, threads=threads)
+        self.cascade_ranker = cascade_ranker
+        self.cascade_top_m = cascade_top_m
+        self.early_exit = early_exit
+        self.early_exit_margin = early_exit_margin
+        self.cascade_stats = CascadeStats()
+        self._cascade_stats_lock = threading.Lock()
+        self.vector_store = vector_store or VectorStore(embedder=self.embedder)
+        self.rerank_cache = RerankScoreCache()
+        self.vector_store.document_listeners.append(self.rerank_cache.invalidate_documents)
         self.last_documents = []
-        logger.info(f"Retriever initialized with embedder: {embedder_model_name} and ranker: {ranker_model_name}")
+        self.rerank_max_batch_tokens = rerank_max_batch_tokens
+        self.rerank_batchers = {}
+        if micro_batching:
+            self.start_micro_batching()
+        logger.info(f"Retriever initialized with embedder: {self.embedder.model_name} and ranker: {ranker_model_name}")
 
-    def retrieve(self, query: str, n_results: int = 10, threshold: float = 0.5) -> list[Document]:
+    def retrieve(self, query: str, n_results: int = 10, threshold: float = 0.5,
+                 mode: str = RETRIEVAL_MODE, where: Optional[dict] = None) -> list[Document]:
         """
         Retrieve and re-rank documents based on the query.
         
         This method performs a two-stage retrieval: first retrieving candidate
         documents using semantic search, then re-ranking them using a cross-encoder.
+        Chunk hits are collapsed to the best ranked chunk of each parent document, see
+        rag.chunking.collapse_chunks.
         
         Args:
             query (str): The search query.
-            n_results (int): Number of documents to retrieve. Defaults to 10.
+            n_results (int): Number of documents to retrieve. Defaults to 10.  With
+                             chunking this counts chunks, so fewer documents can come
+                             back once chunks of the same document are collapsed.
             threshold (float): Minimum cross-encoder score for accepting documents.
                               Defaults to -3.0. Lower values are more permissive.
+            mode (str): Candidate search: "dense", "lexical" or "hybrid" (dense and BM25
+                        fused by reciprocal rank), see VectorStore.query_batch. Defaults to
+                        the RETRIEVAL_MODE environment variable, or "dense".
+            where (Optional[dict]): Chroma-style metadata filter, e.g.
+                                    {"source_species": "avian"}.  It is applied inside the
+                                    candidate search, so only matching documents are
+                                    scored and reranked. Defaults to None.
         Returns:
             list[Document]: List of retrieved documents, sorted by relevance score.
         """
-        documents = self.vector_store.query(query, n_results)
+        documents = self.vector_store.query(query, n_results, include_embeddings=True, mode=mode, where=where)
         logger.debug(f"Retrieved {len(documents)} documents")
         # If no documents are retrieved, return the default document
         if len(documents) == 0:
@@ -96,12 +259,72 @@ class Retriever:
                            f"no documents retrieved for query: {query}")
             return [DEFAULT_DOCUMENT]
         de_duped_documents = self.de_duplicate_documents(documents)
-        reordered_documents = self.reorder_documents(de_duped_documents, query)
+        reordered_documents = collapse_chunks(self.rerank_batch([query], [de_duped_documents], threshold)[0])
+        fallback_document = self._fallback_document(query, reordered_documents, threshold)
+        if fallback_document is not None:
+            return [fallback_document]
+        self.last_documents = reordered_documents
+        return self.last_documents
+
+    def retrieve_batch(self, queries: list[str], n_results: int = 10, threshold: float = 0.5,
+                       mode: str = RETRIEVAL_MODE, where: Optional[dict] = None) -> list[list[Document]]:
+        """
+        Retrieve and re-rank documents for many queries at once.
+
+        The results for each query are the same as calling retrieve() for it, including
+        the fallback documents, but the work is batched: all queries are embedded in one
+        encode call and searched in one vector store query, and every (query, document)
+        pair is scored by each cross-encoder in a single predict call.
+
+        Unlike retrieve(), this does not update last_documents.
+
+        Args:
+            queries (list[str]): The search queries.
+            n_results (int): Number of documents to retrieve per query. Defaults to 10.
+            threshold (float): Minimum cross-encoder score for accepting documents.
+                              Defaults to 0.5.
+            mode (str): Candidate search: "dense", "lexical" or "hybrid". Defaults to the
+                        RETRIEVAL_MODE environment variable, or "dense".
+            where (Optional[dict]): Chroma-style metadata filter applied to every query's
+                                    candidate search. Defaults to None.
+        Returns:
+            list[list[Document]]: One list of retrieved documents per query, in query order.
+        """
+        if not queries:
+            return []
+        candidates = [self.de_duplicate_documents(documents) if documents else []
+                      for documents in self.vector_store.query_batch(queries, n_results, include_embeddings=True,
+                                                                     mode=mode, where=where)]
+        reranked = [collapse_chunks(documents) for documents in self.rerank_batch(queries, candidates, threshold)]
+        results = []
+        for query, documents, reordered_documents in zip(queries, candidates, reranked):
+            if len(documents) == 0:
+                logger.warning(f"Returning default document because "
+                               f"no documents retrieved for query: {query}")
+                results.append([DEFAULT_DOCUMENT])
+                continue
+            fallback_document = self._fallback_document(query, reordered_documents, threshold)
+            results.append([fallback_document] if fallback_document is not None else reordered_documents)
+        return results
+
+    def _fallback_document(self, query: str, reordered_documents: list[Document], threshold: float) -> Document | None:
+        """
+        Decide whether re-ranked documents should be replaced by a fallback document.
+
+        Args:
+            query (str): The search query, used for logging.
+            reordered_documents (list[Document]): Documents sorted by descending rank.
+            threshold (float): Minimum cross-encoder score for accepting documents.
+
+        Returns:
+            Document | None: The fallback document to return instead, or None if the
+                             re-ranked documents should be returned.
+        """
         # If the top document is not relevant, return the default doc
         if len(reordered_documents) == 0:
             logger.warning(f"Returning default document because "
                            f"no documents in list after de-duplication: {query}")
-            return [DEFAULT_DOCUMENT]
+            return DEFAULT_DOCUMENT
         top_score = reordered_documents[0].rank
         # Implementing delta score - if the top score is much higher than the second score
         # return it as the correct document even if the score is not high enough
@@ -110,12 +333,11 @@ class Retriever:
         else:
             second_score = 0.0
         logger.warning(f"Top score: {top_score}, second score: {second_score}, delta: {top_score-second_score}")
-        if top_score < threshold and top_score-second_score < 0.1:
+        if top_score < threshold and top_score-second_score < SCORE_DELTA:
             logger.warning(f"Returning default document due to low rank after reordering "
                            f"score:{reordered_documents[0].rank} < {threshold}: {query}")
-            return [INSUFFICIENT_RELEVANCE_DOCUMENT]
-        self.last_documents = reordered_documents
-        return self.last_documents
+            return INSUFFICIENT_RELEVANCE_DOCUMENT
+        return None
 
     def reorder_documents(self, documents: list[Document], query: str) -> list[Document]:
         """
@@ -132,32 +354,230 @@ class Retriever:
         Returns:
             list[Document]: List of documents sorted by relevance score (descending).
         """
-        corpus = [doc.data for doc in documents]
-        ranks = self.document_ranker.rank(query, corpus)
-        for rank in ranks:
-            documents[rank['corpus_id']].rank = rank['score']        
+        scores = self._score([(query, doc) for doc in documents])
+        return self._apply_scores(documents, scores)
+
+    def rerank_batch(self, queries: list[str], candidates: list[list[Document]],
+                     threshold: float = 0.5) -> list[list[Document]]:
+        """
+        Re-rank each query's candidates, through the cascade if one is configured.
+
+        Without a cascade ranker every candidate is scored by the heavy cross-encoder.
+        With one, all candidates are scored by the cheap ranker first and the best
+        cascade_top_m of each query are re-scored by the heavy cross-encoder.  The other
+        candidates follow them in cheap score order, so every candidate is returned.  With
+        early_exit, a query whose cheap top score is at least threshold and leads the
+        runner-up by early_exit_margin keeps its cheap ranking.  Each stage scores the
+        pairs of all queries in a single call.
+
+        Args:
+            queries (list[str]): The search queries.
+            candidates (list[list[Document]]): Candidate documents, one list per query.
+            threshold (float): Minimum score for accepting documents, used for early exit.
+                               Defaults to 0.5.
+
+        Returns:
+            list[list[Document]]: Each query's documents sorted by descending rank.
+        """
+        if self.cascade_ranker_name is None:
+            scores = self._score([(query, doc) for query, documents in zip(queries, candidates) for doc in documents])
+            return self._split_scores(candidates, scores)
+        screened = [documents if self.early_exit or len(documents) > self.cascade_top_m else []
+                    for documents in candidates]
+        pairs = [(query, doc) for query, documents in zip(queries, screened) for doc in documents]
+        cheap_ranked = self._split_scores(screened, self._cheap_score(pairs))
+        shortlists = []
+        for documents, ranked in zip(candidates, cheap_ranked):
+            if ranked and self.early_exit and self._is_decisive(ranked, threshold):
+                shortlists.append(None)
+            else:
+                shortlists.append((ranked or documents)[:self.cascade_top_m])
+        heavy = [documents or [] for documents in shortlists]
+        heavy_pairs = [(query, doc) for query, documents in zip(queries, heavy) for doc in documents]
+        with self._cascade_stats_lock:
+            self.cascade_stats.queries += len(queries)
+            self.cascade_stats.early_exits += sum(shortlist is None for shortlist in shortlists)
+            self.cascade_stats.cheap_pairs += len(pairs)
+            self.cascade_stats.heavy_pairs += len(heavy_pairs)
+        heavy_ranked = self._split_scores(heavy, self._score(heavy_pairs))
+        return [ranked if shortlist is None else self._append_unpromoted(reranked, ranked[len(shortlist):])
+                for ranked, shortlist, reranked in zip(cheap_ranked, shortlists, heavy_ranked)]
+
+    @staticmethod
+    def _append_unpromoted(reranked: list[Document], unpromoted: list[Document]) -> list[Document]:
+        """
+        Append the candidates the cheap ranker kept from the heavy ranker, in cheap order.
+
+        Their rank is their cheap score, capped at the lowest heavy score, so the list
+        stays sorted by rank and no cheap score outranks a heavy one.
+        """
+        if reranked:
+            for document in unpromoted:
+                document.rank = min(document.rank, reranked[-1].rank)
+        return reranked + unpromoted
+
+    def _is_decisive(self, ranked: list[Document], threshold: float) -> bool:
+        """
+        Whether a ranking's top document clears the threshold with a clear lead.
+        """
+        second_score = ranked[1].rank if len(ranked) > 1 else 0.0
+        return ranked[0].rank >= threshold and ranked[0].rank - second_score >= self.early_exit_margin
+
+    def _split_scores(self, candidates: list[list[Document]], scores: list[float]) -> list[list[Document]]:
+        """
+        Apply a flat list of scores to per-query candidate lists, in order.
+        """
+        ranked = []
+        offset = 0
+        for documents in candidates:
+            ranked.append(self._apply_scores(documents, scores[offset:offset + len(documents)]))
+            offset += len(documents)
+        return ranked
+
+    def _cheap_score(self, pairs: list[tuple[str, Document]]) -> list[float]:
+        """
+        Score (query, document) pairs with the cascade ranker.
+        """
+        if not pairs:
+            return []
+        if self.cascade_ranker is not None:
+            return self._score(pairs, self.cascade_ranker_name, self.cascade_ranker)
+        queries = self.embedder.embed_queries_array([query for query, _ in pairs])
+        if all(doc.embedding is not None for _, doc in pairs):
+            documents = np.stack([doc.embedding for _, doc in pairs]).astype(np.float32, copy=False)
+        else:
+            documents = self.embedder.embed_batch_array([doc.data for _, doc in pairs])
+        products = np.einsum('ij,ij->i', queries, documents)
+        norms = np.linalg.norm(queries, axis=1) * np.linalg.norm(documents, axis=1)
+        return (products / np.maximum(norms, 1e-12)).tolist()
+
+    def _score(self, pairs: list[tuple[str, Document]], ranker_model_name: Optional[str] = None,
+               ranker: Optional[CrossEncoder] = None) -> list[float]:
+        """
+        Score (query, document) pairs with a cross-encoder, reusing cached scores.
+
+        Only the pairs missing from the rerank cache are sent to the cross-encoder, in
+        a single predict call.
+
+        Args:
+            pairs (list[tuple[str, Document]]): The (query, document) pairs to score.
+            ranker_model_name (Optional[str]): Name of the cross-encoder, part of the cache
+                                               key. Defaults to the heavy ranker.
+            ranker (Optional[CrossEncoder]): The cross-encoder. Defaults to the heavy ranker.
+
+        Returns:
+            list[float]: One score per pair, in pair order.
+        """
+        if ranker is None:
+            ranker_model_name, ranker = self.ranker_model_name, self.document_ranker
+        keys = [self.rerank_cache.key(ranker_model_name, query, doc.id, content_hash(doc)) for query, doc in pairs]
+        scores = [self.rerank_cache.get(key) for key in keys]
+        misses = [i for i, score in enumerate(scores) if score is None]
+        if misses:
+            predicted = self._predict(ranker_model_name, ranker, [(pairs[i][0], pairs[i][1].data) for i in misses])
+            for i, score in zip(misses, predicted):
+                scores[i] = float(score)
+                self.rerank_cache.put(keys[i], scores[i])
+        return scores
+
+    def _predict(self, ranker_model_name: str, ranker: CrossEncoder, pairs: list[tuple[str, str]]) -> list[float]:
+        """
+        Score (query, text) pairs, through the ranker's micro-batcher if it has one.
+        """
+        batcher = self.rerank_batchers.get(ranker_model_name)
+        return batcher.map(pairs) if batcher is not None else self._predict_pairs(ranker, pairs)
+
+    def _predict_pairs(self, ranker: CrossEncoder, pairs: list[tuple[str, str]]) -> list[float]:
+        """
+        Score (query, text) pairs in one predict call, or per length bucket when
+        rerank_max_batch_tokens is set.
+        """
+        if self.rerank_max_batch_tokens and pairs:
+            return predict_bucketed(ranker, pairs, self.rerank_max_batch_tokens)
+        return ranker.predict(pairs)
+
+    def start_micro_batching(self, max_queries: int = MICRO_BATCH_MAX_QUERIES, max_pairs: int = MICRO_BATCH_MAX_PAIRS,
+                             max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS):
+        """
+        Merge the query encodes and cross-encoder calls of concurrent retrievals.
+
+        A query encode or predict call waits up to max_wait_ms for calls from other
+        threads, then all of them run as one batch.  Restarting replaces the batchers and
+        resets their statistics.
+
+        Args:
+            max_queries (int): Most queries per batched encode. Defaults to
+                               MICRO_BATCH_MAX_QUERIES, or 64.
+            max_pairs (int): Most (query, document) pairs per batched predict call.
+                             Defaults to MICRO_BATCH_MAX_PAIRS, or 512.
+            max_wait_ms (float): Longest a call waits for others to join its batch.
+                                 Defaults to MICRO_BATCH_MAX_WAIT_MS, or 5.
+        """
+        self.stop_micro_batching()
+        self.embedder.query_batcher = MicroBatcher(self.embedder.embed_batch_array, max_queries, max_wait_ms,
+                                                   name=f"embed {self.embedder.model_name}")
+        rankers = {self.ranker_model_name: self.document_ranker}
+        if self.cascade_ranker is not None:
+            rankers[self.cascade_ranker_name] = self.cascade_ranker
+        self.rerank_batchers = {name: MicroBatcher(partial(self._predict_pairs, ranker), max_pairs, max_wait_ms,
+                                                   name=f"rerank {name}")
+                                for name, ranker in rankers.items()}
+
+    def stop_micro_batching(self):
+        """
+        Finish the queued calls and go back to running each call on its own.
+        """
+        if self.embedder.query_batcher is not None:
+            self.embedder.query_batcher.stop()
+            self.embedder.query_batcher = None
+        for batcher in self.rerank_batchers.values():
+            batcher.stop()
+        self.rerank_batchers = {}
+
+    def micro_batch_stats(self) -> dict[str, MicroBatchStats]:
+        """
+        Return the statistics of each micro-batcher, keyed by batcher name.
+
+        Returns:
+            dict[str, MicroBatchStats]: Empty when micro-batching is off.
+        """
+        batchers = list(self.rerank_batchers.values())
+        if self.embedder.query_batcher is not None:
+            batchers.insert(0, self.embedder.query_batcher)
+        return {batcher.name: batcher.stats for batcher in batchers}
+
+    def cache_stats(self) -> dict[str, CacheStats]:
+        """
+        Return hit/miss statistics for the query embedding and rerank score caches.
+
+        Returns:
+            dict[str, CacheStats]: Statistics keyed by cache name.
+        """
+        return {'query_embedding': QUERY_EMBEDDING_CACHE.stats, 'rerank_score': self.rerank_cache.stats}
+
+    def _apply_scores(self, documents: list[Document], scores) -> list[Document]:
+        """
+        Store cross-encoder scores as document ranks and sort by them (descending).
+        """
+        for document, score in zip(documents, scores):
+            document.rank = float(score)
         return sorted(documents, key=lambda x: x.rank, reverse=True)
     
     def de_duplicate_documents(self, documents: list[Document], threshold:float = 0.95) -> list[Document]:
         """
         Remove duplicate documents from the list.  Documents are duplicates if they have
         data that is syntactically identical (approximate similarity is .95 by default)
-        """
-        texts = [doc.data for doc in documents]
-        logger.debug(f"De-duplicating {len(texts)} documents")
-        embeddings = self.embedder.embed_batch(texts)
-        np_embeddings = np.array(embeddings)
-        keep_indexes = []
-        keep_embeddings = []
-
-        for i, embed in enumerate(np_embeddings):
-            if keep_embeddings:
-                similarities = cosine_similarity([embed], keep_embeddings)[0]
-                if np.any(similarities > threshold):
-                    continue
-            keep_indexes.append(i)
-            keep_embeddings.append(embed)
 
+        Documents returned by VectorStore.query already carry their stored embedding, in
+        which case it is used directly.  Otherwise the document text is embedded here.
+        The first document of each group of duplicates is kept, see rag.deduplication.
+        """
+        logger.debug(f"De-duplicating {len(documents)} documents")
+        if all(doc.embedding is not None for doc in documents):
+            embeddings = np.stack([doc.embedding for doc in documents])
+        else:
+            embeddings = self.embedder.embed_batch_array([doc.data for doc in documents])
+        keep_indexes = de_duplicate(embeddings, threshold)
         logger.debug(f"Kept {len(keep_indexes)} documents after de-duplication")
         return [documents[i] for i in keep_indexes]
     
@@ -0,0 +1,132 @@
+"""
+Tokenizer module for RAG (Retrieval-Augmented Generation) system.
+
+This module counts and truncates text in LLM tokens.  When tiktoken is installed the
+model's own encoding is used.  Otherwise a regex tokenizer that splits words and
+punctuation gives a close, slightly pessimistic estimate.
+
+tiktoken downloads an encoding the first time it is used and caches it on disk (see its
+TIKTOKEN_CACHE_DIR variable).  When the encoding cannot be loaded, e.g. offline with an
+empty cache, the regex tokenizer is used instead.
+"""
+
+import functools
+import logging
+import re
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the environment
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "o200k_base"
+# The regex tokenizer counts words longer than this as one token per this many characters
+_MAX_TOKEN_CHARS = 6
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class RegexTokenizer:
+    """
+    Dependency-free tokenizer that treats each word and punctuation mark as a token.
+
+    Long words count as one token per six characters, which is roughly how BPE
+    encodings split rare words.
+    """
+    name = "regex"
+
+    def spans(self, text: str) -> list[tuple[int, int]]:
+        """
+        Return the (start, end) character offsets of each token in a text.
+        """
+        spans = []
+        for match in _TOKEN_PATTERN.finditer(text):
+            start, end = match.span()
+            for piece_start in range(start, end, _MAX_TOKEN_CHARS):
+                spans.append((piece_start, min(end, piece_start + _MAX_TOKEN_CHARS)))
+        return spans
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a text.
+        """
+        return len(self.spans(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut a text down to at most max_tokens tokens.
+        """
+        if max_tokens <= 0:
+            return ""
+        spans = self.spans(text)
+        if len(spans) <= max_tokens:
+            return text
+        return text[:spans[max_tokens - 1][1]]
+
+
+class TiktokenTokenizer:
+    """
+    Tokenizer backed by a tiktoken encoding.
+    """
+
+    def __init__(self, encoding: "tiktoken.Encoding"):
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a text.
+        """
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def spans(self, text: str) -> list[tuple[int, int]]:
+        """
+        Return the (start, end) character offsets of each token in a text.
+
+        tiktoken places a token that starts inside a multi-byte character at the start of
+        that character, so slicing the text at the offsets never splits a character.
+        """
+        tokens = self.encoding.encode(text, disallowed_special=())
+        _, starts = self.encoding.decode_with_offsets(tokens)
+        ends = starts[1:] + [len(text)]
+        return [(start, max(start, end)) for start, end in zip(starts, ends)]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut a text down to at most max_tokens tokens.
+        """
+        if max_tokens <= 0:
+            return ""
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(model_name: str = "gpt-4o-mini"):
+    """
+    Return the tokenizer for a model, shared across the process.
+
+    Args:
+        model_name (str): The LLM whose tokens should be counted. Defaults to "gpt-4o-mini".
+
+    Returns:
+        TiktokenTokenizer | RegexTokenizer: The model's tiktoken encoding if tiktoken is
+                                            installed and the encoding can be loaded,
+                                            otherwise a RegexTokenizer.
+    """
+    if tiktoken is None:
+        logger.info("tiktoken is not installed, estimating token counts with a regex tokenizer")
+        return RegexTokenizer()
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as error:
+        logger.warning(f"Could not load the tiktoken encoding for {model_name} ({error}), "
+                       f"estimating token counts with a regex tokenizer")
+        return RegexTokenizer()
+    return TiktokenTokenizer(encoding)
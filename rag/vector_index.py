@@ -0,0 +1,1024 @@
+"""
+Vector index module for RAG (Retrieval-Augmented Generation) system.
+
+This module defines the interface VectorStore needs from its index, which is the subset
+of the chromadb.Collection API it uses, and provides an in-process implementation:
+
+- NumpyIndex: float32 vectors in one contiguous NumPy array, searched exactly
+  (blocked matrix products), with an inverted file (IVF) of k-means clusters, or with a
+  hierarchical navigable small world (HNSW) graph.  The IVF and HNSW search breadth
+  (nprobe, ef) can be tuned per index or per query.  Metadata filters use Chroma's
+  `where` syntax, so switching backends doesn't change filtering.
+- MetadataIndex: an inverted index from metadata values to rows, which turns a `where`
+  filter into a bitmap of allowed rows before any vector is scored.
+
+NumpyIndex can also keep its vectors quantized to float16 or to 8-bit codes with a
+per-dimension scale and offset.  Searches run on the compact codes and the best candidates
+are rescored against the full-precision vectors, which then live in a memory-mapped file
+instead of RAM.
+"""
+
+import heapq
+import logging
+import math
+import os
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Protocol, Sequence, runtime_checkable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ("exact", "ivf", "hnsw")
+SPACES = ("l2", "ip", "cosine")
+QUANTIZATIONS = ("float16", "int8")
+# Quantized searches fetch this many times n_results candidates for full-precision rescoring
+DEFAULT_RESCORE_FACTOR = 4
+# Below this many allowed vectors an exact scan is as fast as an approximate search and
+# has perfect recall, so approximate modes fall back to it.
+EXACT_SEARCH_LIMIT = 2048
+# Deleted and replaced vectors are compacted away once they make up this share of the rows
+COMPACTION_FRACTION = 0.3
+# Scores at most this many query x vector distances at once in exact search
+_EXACT_BLOCK_ELEMENTS = 1 << 24
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLES_PER_CENTROID = 32
+# Quantized vectors are scored this many rows at a time, so the decoded block stays in cache
+_DECODE_BLOCK_ROWS = 1024
+# The int8 range is widened by this share on each side, so it rarely has to be re-fitted
+_INT8_RANGE_MARGIN = 0.1
+
+
+@runtime_checkable
+class VectorIndex(Protocol):
+    """
+    The index operations VectorStore relies on.
+
+    chromadb.Collection implements this interface, as does NumpyIndex.  Results use
+    Chroma's shapes: get() returns flat lists keyed by 'ids', 'documents', 'metadatas' and
+    'embeddings', and query() returns one such list per query embedding, plus 'distances'.
+    """
+    name: str
+    metadata: Optional[dict]
+
+    def add(self, ids: list[str], embeddings: Optional[Sequence] = None, metadatas: Optional[list[dict]] = None,
+            documents: Optional[list[str]] = None) -> None:
+        ...
+
+    def upsert(self, ids: list[str], embeddings: Optional[Sequence] = None, metadatas: Optional[list[dict]] = None,
+               documents: Optional[list[str]] = None) -> None:
+        ...
+
+    def delete(self, ids: Optional[list[str]] = None, where: Optional[dict] = None) -> None:
+        ...
+
+    def get(self, ids: Optional[list[str]] = None, where: Optional[dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Sequence[str] = ("metadatas", "documents")) -> dict:
+        ...
+
+    def query(self, query_embeddings: Sequence, n_results: int = 10, where: Optional[dict] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> dict:
+        ...
+
+    def count(self) -> int:
+        ...
+
+
+def _compare(operator: str, expected: Any) -> Callable[[Any], bool]:
+    """
+    Build the predicate for one Chroma comparison operator.
+    """
+    if operator == "$eq":
+        return lambda value: value == expected
+    if operator == "$ne":
+        return lambda value: value != expected
+    if operator == "$in":
+        return lambda value: value in expected
+    if operator == "$nin":
+        return lambda value: value not in expected
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        compare = {"$gt": lambda a, b: a > b, "$gte": lambda a, b: a >= b,
+                   "$lt": lambda a, b: a < b, "$lte": lambda a, b: a <= b}[operator]
+        return lambda value: value is not None and compare(value, expected)
+    raise ValueError(f"Unsupported where operator: {operator}")
+
+
+def _parse_condition(key: str, condition: Any) -> tuple[str, Any]:
+    """
+    Split one field condition into its operator and operand.
+    """
+    if isinstance(condition, dict):
+        if len(condition) != 1:
+            raise ValueError(f"Expected one operator for {key}, got {condition}")
+        (operator, expected), = condition.items()
+        return operator, expected
+    return "$eq", condition
+
+
+def compile_where(where: dict) -> Callable[[dict], bool]:
+    """
+    Compile a Chroma-style metadata filter into a predicate over a metadata dict.
+
+    Supports equality shorthand ({"key": value}), the comparison operators $eq, $ne, $gt,
+    $gte, $lt, $lte, $in and $nin, and the logical operators $and and $or.
+
+    Args:
+        where (dict): The filter.
+
+    Returns:
+        Callable[[dict], bool]: True for metadata that matches the filter.
+
+    Raises:
+        ValueError: If the filter uses an unsupported operator.
+    """
+    predicates = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            clauses = [compile_where(clause) for clause in condition]
+            combine = all if key == "$and" else any
+            predicates.append(lambda metadata, clauses=clauses, combine=combine:
+                              combine(clause(metadata) for clause in clauses))
+            continue
+        test = _compare(*_parse_condition(key, condition))
+        predicates.append(lambda metadata, key=key, test=test: test(metadata.get(key)))
+    return lambda metadata: all(predicate(metadata or {}) for predicate in predicates)
+
+
+class _RowList:
+    """
+    Growable int64 array of row numbers.
+    """
+    __slots__ = ("_rows", "_size")
+
+    def __init__(self):
+        self._rows = np.empty(4, dtype=np.int64)
+        self._size = 0
+
+    def append(self, row: int):
+        if self._size == len(self._rows):
+            self._rows = np.concatenate([self._rows, np.empty(len(self._rows), dtype=np.int64)])
+        self._rows[self._size] = row
+        self._size += 1
+
+    def view(self) -> np.ndarray:
+        return self._rows[:self._size]
+
+
+class MetadataIndex:
+    """
+    Inverted index from metadata values to the rows that carry them.
+
+    A where filter is evaluated into a boolean bitmap over the rows without reading any
+    document's metadata: equality and $in set the rows of the named values, $ne and $nin
+    clear them, and range operators visit the distinct values of the field rather than the
+    documents.  $and and $or combine the bitmaps of their clauses.  Each value keeps an
+    array of its rows rather than a bitmap of its own, so unique fields such as titles
+    cost one entry per document instead of one bit per document per value.
+
+    Rows are only ever added; the owning index tracks deleted rows and clears them from
+    the bitmaps it gets back, and calls clear() when it renumbers its rows.  Matches
+    compile_where: a missing field reads as None.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty index.
+        """
+        self._values: dict[str, dict[Any, _RowList]] = {}
+        # Rows with a non-None value, per field; every other row reads the field as None
+        self._present: dict[str, _RowList] = {}
+
+    def clear(self):
+        """
+        Forget every row.
+        """
+        self._values.clear()
+        self._present.clear()
+
+    def add(self, start: int, metadatas: Sequence[Optional[dict]]):
+        """
+        Index the metadata of consecutive rows.
+
+        Args:
+            start (int): Row of the first metadata dict.
+            metadatas (Sequence[Optional[dict]]): One metadata dict (or None) per row.
+        """
+        for row, metadata in enumerate(metadatas, start=start):
+            for key, value in (metadata or {}).items():
+                if value is None:
+                    continue
+                self._values.setdefault(key, {}).setdefault(value, _RowList()).append(row)
+                self._present.setdefault(key, _RowList()).append(row)
+
+    def mask(self, where: dict, size: int) -> np.ndarray:
+        """
+        Evaluate a Chroma-style filter into a bitmap over rows 0 to size - 1.
+
+        Args:
+            where (dict): The filter, in the syntax compile_where accepts.
+            size (int): Number of rows.
+
+        Returns:
+            np.ndarray: Boolean mask, True for rows whose metadata matches.
+
+        Raises:
+            ValueError: If the filter uses an unsupported operator.
+        """
+        mask = np.ones(size, dtype=bool)
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                clauses = [self.mask(clause, size) for clause in condition]
+                if key == "$and":
+                    combined = np.logical_and.reduce(clauses) if clauses else np.ones(size, dtype=bool)
+                else:
+                    combined = np.logical_or.reduce(clauses) if clauses else np.zeros(size, dtype=bool)
+                mask &= combined
+            else:
+                mask &= self._field_mask(key, *_parse_condition(key, condition), size)
+        return mask
+
+    def _field_mask(self, key: str, operator: str, expected: Any, size: int) -> np.ndarray:
+        if operator in ("$ne", "$nin"):
+            return ~self._field_mask(key, "$eq" if operator == "$ne" else "$in", expected, size)
+        test = _compare(operator, expected)
+        values = self._values.get(key, {})
+        mask = np.zeros(size, dtype=bool)
+        if operator in ("$eq", "$in"):
+            matching = [expected] if operator == "$eq" else list(expected)
+            rows = [values[value].view() for value in matching if value is not None and value in values]
+        else:
+            rows = [value_rows.view() for value, value_rows in values.items() if test(value)]
+        for value_rows in rows:
+            mask[value_rows] = True
+        if test(None):
+            present = np.zeros(size, dtype=bool)
+            if key in self._present:
+                present[self._present[key].view()] = True
+            mask |= ~present
+        return mask
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class IndexMemory:
+    """
+    Memory taken by the vectors of a NumpyIndex.
+
+    Attributes:
+        resident_bytes (int): Vectors or quantized codes, norms and quantization
+                              parameters held in RAM.
+        disk_bytes (int): Full-precision vectors kept in a memory-mapped file.
+        float32_bytes (int): What the vectors and norms take as in-memory float32 arrays.
+    """
+    resident_bytes: int = 0
+    disk_bytes: int = 0
+    float32_bytes: int = 0
+
+    @property
+    def saved_fraction(self) -> float:
+        """
+        Share of the float32 footprint no longer held in RAM.
+        """
+        return 1.0 - self.resident_bytes / self.float32_bytes if self.float32_bytes else 0.0
+
+
+class NumpyIndex:
+    """
+    In-process vector index backed by a contiguous float32 NumPy array.
+
+    Vectors are appended to a growable (capacity x dimensions) array.  Deleting or
+    replacing a document leaves a tombstone that is skipped by searches and compacted away
+    once tombstones make up COMPACTION_FRACTION of the rows.  Distances follow Chroma's
+    conventions: squared L2 for "l2", 1 - dot product for "ip" and 1 - cosine similarity
+    for "cosine".
+
+    Search modes:
+        exact: scores every allowed vector.  Perfect recall.
+        ivf:   clusters the vectors with k-means (trained lazily, and retrained when the
+               index doubles in size) and scans the nprobe clusters nearest the query.
+        hnsw:  greedy best-first search of a layered proximity graph that is built as
+               vectors are added, keeping the ef best candidates.
+
+    The approximate modes scan exactly when few vectors are allowed (a small index or a
+    selective where filter), where a scan is both faster and exact.
+
+    With quantization set, searches score float16 vectors or 8-bit codes (one scale and
+    offset per dimension, fitted to the data seen so far).  The rescore_factor * n_results
+    best candidates are then rescored against the full-precision vectors, which are kept
+    in a memory-mapped file so only the candidates' rows are read.
+
+    Attributes:
+        name (str): The index name.
+        metadata (Optional[dict]): Index-level metadata, e.g. the embedding model.
+        mode (str): The search mode.
+        space (str): The distance function.
+        nlist (Optional[int]): Number of IVF clusters, None to use 4 * sqrt(n).
+        nprobe (int): IVF clusters scanned per query.
+        M (int): HNSW links per node on the upper layers (2 * M on the bottom layer).
+        ef_construction (int): HNSW candidate list size while inserting.
+        ef_search (int): HNSW candidate list size while searching.
+        exact_search_limit (int): Scan exactly when at most this many vectors are allowed.
+        quantization (Optional[str]): "float16", "int8" or None for float32 vectors in RAM.
+        rescore_factor (int): Candidates per result rescored in full precision, 0 to
+                              return the quantized distances.
+    """
+
+    def __init__(self,
+                 name: str = "index",
+                 embedding_function: Optional[Callable[[list[str]], Sequence]] = None,
+                 metadata: Optional[dict] = None,
+                 mode: str = "exact",
+                 space: str = "l2",
+                 nlist: Optional[int] = None,
+                 nprobe: int = 8,
+                 M: int = 16,
+                 ef_construction: int = 100,
+                 ef_search: int = 64,
+                 exact_search_limit: int = EXACT_SEARCH_LIMIT,
+                 quantization: Optional[str] = None,
+                 rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+                 full_precision_dir: Optional[str] = None,
+                 seed: int = 0):
+        """
+        Initialize an empty index.
+
+        Args:
+            name (str): The index name. Defaults to "index".
+            embedding_function (Optional[Callable]): Embeds documents added without
+                                                     embeddings, like a Chroma embedding
+                                                     function. Defaults to None.
+            metadata (Optional[dict]): Index-level metadata. Defaults to None.
+            mode (str): "exact", "ivf" or "hnsw". Defaults to "exact".
+            space (str): "l2", "ip" or "cosine". Defaults to "l2", as in Chroma.
+            nlist (Optional[int]): IVF clusters. Defaults to None (4 * sqrt(n)).
+            nprobe (int): IVF clusters scanned per query. Defaults to 8.
+            M (int): HNSW links per node. Defaults to 16.
+            ef_construction (int): HNSW build breadth. Defaults to 100.
+            ef_search (int): HNSW search breadth. Defaults to 64.
+            exact_search_limit (int): Allowed vectors below which approximate modes scan
+                                      exactly. Defaults to EXACT_SEARCH_LIMIT.
+            quantization (Optional[str]): "float16" or "int8" to search compact vectors.
+                                          Defaults to None (float32).
+            rescore_factor (int): Candidates per result rescored in full precision when
+                                  quantized. Defaults to DEFAULT_RESCORE_FACTOR.
+            full_precision_dir (Optional[str]): Directory for the memory-mapped
+                                                full-precision vectors of a quantized index.
+                                                Defaults to None (the system temp directory).
+            seed (int): Seed for k-means and HNSW level sampling. Defaults to 0.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {SEARCH_MODES}, got {mode}")
+        if space not in SPACES:
+            raise ValueError(f"space must be one of {SPACES}, got {space}")
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS} or None, got {quantization}")
+        self.name = name
+        self.metadata = metadata
+        self.mode = mode
+        self.space = space
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.exact_search_limit = exact_search_limit
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.full_precision_dir = full_precision_dir
+        self._full_precision_path: Optional[str] = None
+        self._embedding_function = embedding_function
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._reset_storage(dimensions=0, capacity=0)
+
+    # Storage
+
+    def _reset_storage(self, dimensions: int, capacity: int):
+        # Full-precision vectors; a memory-mapped file once a quantized index has rows
+        self._vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self._codes: Optional[np.ndarray] = None
+        if self.quantization is not None:
+            self._codes = np.zeros((capacity, dimensions), dtype=np.float16 if self.quantization == "float16"
+                                   else np.uint8)
+            if self._full_precision_path is not None:
+                _remove_file(self._full_precision_path)
+                self._full_precision_path = None
+        self._offset: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+        self._squared_norms = np.zeros(capacity, dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._size = 0
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._documents: list[Optional[str]] = []
+        self._metadatas: list[Optional[dict]] = []
+        self._metadata_index = MetadataIndex()
+        self._reset_ivf()
+        self._reset_hnsw(capacity)
+
+    def _reserve(self, rows: int, dimensions: int):
+        """
+        Make room for rows more vectors, doubling the capacity as needed.
+        """
+        if self._vectors.shape[1] == 0 and self._size == 0:
+            self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+            if self._codes is not None:
+                self._codes = np.zeros((0, dimensions), dtype=self._codes.dtype)
+        if dimensions != self._vectors.shape[1]:
+            raise ValueError(f"Expected {self._vectors.shape[1]} dimensional embeddings, got {dimensions}")
+        needed = self._size + rows
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        if self._codes is None:
+            self._vectors = self._grow(self._vectors, capacity)
+        else:
+            self._vectors = self._grow_full_precision(capacity, dimensions)
+            self._codes = self._grow(self._codes, capacity)
+        self._squared_norms = self._grow(self._squared_norms, capacity)
+        self._alive = self._grow(self._alive, capacity)
+        if self.mode == "hnsw":
+            self._graph = self._grow(self._graph, capacity, fill=-1)
+            self._degrees = self._grow(self._degrees, capacity)
+            self._levels = self._grow(self._levels, capacity)
+            self._visited = self._grow(self._visited, capacity)
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int, fill=0) -> np.ndarray:
+        grown = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _grow_full_precision(self, capacity: int, dimensions: int) -> np.memmap:
+        """
+        Extend the memory-mapped file of full-precision vectors to capacity rows.
+        """
+        if self._full_precision_path is None:
+            descriptor, self._full_precision_path = tempfile.mkstemp(prefix=f"{self.name}-", suffix=".f32",
+                                                                     dir=self.full_precision_dir)
+            os.close(descriptor)
+            weakref.finalize(self, _remove_file, self._full_precision_path)
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+        os.truncate(self._full_precision_path, capacity * dimensions * np.dtype(np.float32).itemsize)
+        return np.memmap(self._full_precision_path, dtype=np.float32, mode='r+', shape=(capacity, dimensions))
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.quantization == "float16":
+            return vectors.astype(np.float16)
+        return np.clip(np.rint((vectors - self._offset) / self._scale), 0, 255).astype(np.uint8)
+
+    def _code_products(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Dot products of each query with quantized vectors.
+
+        For int8 the scale and offset are folded into the queries, so the codes are only
+        cast, never decoded.
+        """
+        if self.quantization == "float16":
+            return queries @ codes.astype(np.float32).T
+        return (queries * self._scale) @ codes.astype(np.float32).T + (queries @ self._offset)[:, None]
+
+    def _fit_int8_range(self, vectors: np.ndarray, existing_rows: int):
+        """
+        Widen the per-dimension int8 range to cover vectors, re-encoding existing rows if it changed.
+        """
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        if self._offset is not None:
+            current_high = self._offset + 255 * self._scale
+            if np.all(low >= self._offset) and np.all(high <= current_high):
+                return
+            low, high = np.minimum(low, self._offset), np.maximum(high, current_high)
+        margin = (high - low) * _INT8_RANGE_MARGIN
+        self._offset = (low - margin).astype(np.float32)
+        self._scale = np.maximum((high - low + 2 * margin) / 255, 1e-12).astype(np.float32)
+        if existing_rows:
+            logger.debug(f"Re-encoding {existing_rows} int8 vectors for a wider range")
+            for start in range(0, existing_rows, _DECODE_BLOCK_ROWS):
+                end = min(existing_rows, start + _DECODE_BLOCK_ROWS)
+                self._codes[start:end] = self._encode(self._vectors[start:end])
+
+    def memory_usage(self) -> IndexMemory:
+        """
+        Bytes taken by the stored vectors, in RAM and on disk.
+        """
+        rows, dimensions = self._size, self._vectors.shape[1]
+        float32_bytes = rows * dimensions * 4 + self._squared_norms.itemsize * rows
+        if self._codes is None:
+            return IndexMemory(resident_bytes=float32_bytes, float32_bytes=float32_bytes)
+        parameters = 0 if self._offset is None else self._offset.nbytes + self._scale.nbytes
+        return IndexMemory(resident_bytes=rows * dimensions * self._codes.itemsize
+                           + self._squared_norms.itemsize * rows + parameters,
+                           disk_bytes=rows * dimensions * 4,
+                           float32_bytes=float32_bytes)
+
+    def _as_matrix(self, embeddings: Sequence) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        return np.ascontiguousarray(matrix)
+
+    def _embed(self, documents: Optional[list[str]], embeddings: Optional[Sequence]) -> np.ndarray:
+        if embeddings is not None:
+            return self._as_matrix(embeddings)
+        if documents is None or self._embedding_function is None:
+            raise ValueError("Embeddings are required when the index has no embedding function")
+        return self._as_matrix(self._embedding_function(documents))
+
+    def add(self, ids: list[str], embeddings: Optional[Sequence] = None, metadatas: Optional[list[dict]] = None,
+            documents: Optional[list[str]] = None) -> None:
+        """
+        Add documents.  Ids that are already stored are skipped, as in Chroma.
+        """
+        self._check_ids(ids)
+        with self._lock:
+            new = [i for i, id in enumerate(ids) if id not in self._rows]
+            if len(new) < len(ids):
+                logger.warning(f"Skipping {len(ids) - len(new)} documents whose ids are already in the index")
+            if not new:
+                return
+            vectors = self._embed(self._pick(documents, new), None if embeddings is None
+                                  else self._as_matrix(embeddings)[new])
+            self._append([ids[i] for i in new], vectors, self._pick(metadatas, new), self._pick(documents, new))
+
+    def upsert(self, ids: list[str], embeddings: Optional[Sequence] = None, metadatas: Optional[list[dict]] = None,
+               documents: Optional[list[str]] = None) -> None:
+        """
+        Add documents, replacing any stored documents with the same ids.
+        """
+        self._check_ids(ids)
+        vectors = self._embed(documents, embeddings)
+        with self._lock:
+            self._tombstone([self._rows.pop(id) for id in ids if id in self._rows])
+            self._append(list(ids), vectors, metadatas, documents)
+            self._maybe_compact()
+
+    def delete(self, ids: Optional[list[str]] = None, where: Optional[dict] = None) -> None:
+        """
+        Delete documents by id and/or metadata filter.
+        """
+        if ids is None and where is None:
+            raise ValueError("Expected ids or where to select the documents to delete")
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            for row in rows:
+                del self._rows[self._ids[row]]
+            self._tombstone(rows)
+            self._maybe_compact()
+
+    def count(self) -> int:
+        """
+        Number of stored documents.
+        """
+        return len(self._rows)
+
+    @staticmethod
+    def _check_ids(ids: list[str]):
+        if len(set(ids)) != len(ids):
+            raise ValueError("Expected ids to be unique")
+
+    @staticmethod
+    def _pick(values: Optional[list], indexes: list[int]) -> Optional[list]:
+        return None if values is None else [values[i] for i in indexes]
+
+    def _append(self, ids: list[str], vectors: np.ndarray, metadatas: Optional[list[dict]],
+                documents: Optional[list[str]]):
+        if len(vectors) != len(ids):
+            raise ValueError(f"Got {len(vectors)} embeddings for {len(ids)} ids")
+        self._reserve(len(ids), vectors.shape[1])
+        start, end = self._size, self._size + len(ids)
+        self._vectors[start:end] = vectors
+        if self._codes is not None:
+            if self.quantization == "int8":
+                self._fit_int8_range(vectors, existing_rows=start)
+            self._codes[start:end] = self._encode(vectors)
+        self._squared_norms[start:end] = np.einsum('ij,ij->i', vectors, vectors)
+        self._alive[start:end] = True
+        self._size = end
+        for offset, id in enumerate(ids):
+            self._rows[id] = start + offset
+        self._ids.extend(ids)
+        self._documents.extend(documents if documents is not None else [None] * len(ids))
+        self._metadatas.extend(metadatas if metadatas is not None else [None] * len(ids))
+        if metadatas is not None:
+            self._metadata_index.add(start, metadatas)
+        if self.mode == "ivf":
+            self._ivf_add(start, end)
+        elif self.mode == "hnsw":
+            for row in range(start, end):
+                self._hnsw_insert(row)
+
+    def _tombstone(self, rows: list[int]):
+        self._alive[rows] = False
+
+    def _maybe_compact(self):
+        dead = self._size - len(self._rows)
+        if dead and dead >= COMPACTION_FRACTION * self._size:
+            self._compact()
+
+    def _compact(self):
+        """
+        Rebuild the index from its live rows, dropping tombstones.
+        """
+        rows = np.flatnonzero(self._alive[:self._size])
+        logger.info(f"Compacting {self.name}: keeping {len(rows)} of {self._size} rows")
+        vectors = self._vectors[rows].copy()
+        ids = [self._ids[row] for row in rows]
+        documents = [self._documents[row] for row in rows]
+        metadatas = [self._metadatas[row] for row in rows]
+        self._reset_storage(dimensions=vectors.shape[1], capacity=0)
+        if len(rows):
+            self._append(ids, vectors, metadatas, documents)
+
+    # Lookup
+
+    def _select_rows(self, ids: Optional[list[str]], where: Optional[dict]) -> list[int]:
+        """
+        Live rows matching the ids (in the given order) and the filter.
+        """
+        if ids is not None:
+            rows = [self._rows[id] for id in ids if id in self._rows]
+        else:
+            rows = np.flatnonzero(self._alive[:self._size]).tolist()
+        if where:
+            matches = self._metadata_index.mask(where, self._size)
+            rows = [row for row in rows if matches[row]]
+        return rows
+
+    def _allowed_mask(self, where: Optional[dict]) -> np.ndarray:
+        """
+        Boolean mask over the rows of live vectors that match the filter, built from the
+        metadata index so no document's metadata is read.
+        """
+        mask = self._alive[:self._size].copy()
+        if where:
+            mask &= self._metadata_index.mask(where, self._size)
+        return mask
+
+    def _results(self, rows: list[int], include: Sequence[str]) -> dict:
+        return {
+            'ids': [self._ids[row] for row in rows],
+            'embeddings': self._vectors[rows].copy() if 'embeddings' in include else None,
+            'documents': [self._documents[row] for row in rows] if 'documents' in include else None,
+            'metadatas': [self._metadatas[row] for row in rows] if 'metadatas' in include else None,
+            'included': list(include),
+        }
+
+    def get(self, ids: Optional[list[str]] = None, where: Optional[dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Sequence[str] = ("metadatas", "documents")) -> dict:
+        """
+        Fetch documents by id and/or metadata filter, in insertion order when no ids are given.
+        """
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            start = offset or 0
+            rows = rows[start:start + limit if limit is not None else None]
+            return self._results(rows, include)
+
+    # Search
+
+    def _distances_to(self, queries: np.ndarray, products: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        """
+        Distances from each query to each vector, given their dot products and the vectors'
+        squared norms.
+        """
+        if self.space == "ip":
+            return 1.0 - products
+        query_norms = np.einsum('ij,ij->i', queries, queries)[:, None]
+        if self.space == "cosine":
+            return 1.0 - products / np.sqrt(np.maximum(query_norms * norms, 1e-12))
+        return np.maximum(query_norms - 2.0 * products + norms, 0.0)
+
+    def _distances(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Distances from each query to the given rows (all rows when None).
+
+        A quantized index decodes its codes a block of rows at a time.  Norms are those of
+        the full-precision vectors.
+        """
+        if self._codes is None:
+            vectors = self._vectors[:self._size] if rows is None else self._vectors[rows]
+            norms = self._squared_norms[:self._size] if rows is None else self._squared_norms[rows]
+            return self._distances_to(queries, queries @ vectors.T, norms)
+        count = self._size if rows is None else len(rows)
+        distances = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, _DECODE_BLOCK_ROWS):
+            end = min(count, start + _DECODE_BLOCK_ROWS)
+            block = slice(start, end) if rows is None else rows[start:end]
+            distances[:, start:end] = self._distances_to(queries, self._code_products(queries, self._codes[block]),
+                                                         self._squared_norms[block])
+        return distances
+
+    def _point_distances(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Distances from a single query to the given rows; the hot path of HNSW.
+        """
+        if self._codes is None:
+            products = self._vectors[rows] @ query
+        else:
+            products = self._code_products(query[None, :], self._codes[rows])[0]
+        if self.space == "ip":
+            return 1.0 - products
+        query_norm = float(query @ query)
+        norms = self._squared_norms[rows]
+        if self.space == "cosine":
+            return 1.0 - products / np.sqrt(np.maximum(query_norm * norms, 1e-12))
+        return np.maximum(query_norm - 2.0 * products + norms, 0.0)
+
+    def query(self, query_embeddings: Sequence, n_results: int = 10, where: Optional[dict] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances"),
+              ef: Optional[int] = None, nprobe: Optional[int] = None) -> dict:
+        """
+        Find the nearest documents to each query embedding.
+
+        Args:
+            query_embeddings (Sequence): One embedding per query.
+            n_results (int): Documents to return per query. Defaults to 10.
+            where (Optional[dict]): Chroma-style metadata filter. Defaults to None.
+            include (Sequence[str]): Fields to return. Defaults to metadatas, documents
+                                     and distances.
+            ef (Optional[int]): HNSW search breadth for this query. Defaults to ef_search.
+            nprobe (Optional[int]): IVF clusters to scan for this query. Defaults to nprobe.
+
+        Returns:
+            dict: Chroma-shaped results with one list per query embedding.
+        """
+        queries = self._as_matrix(query_embeddings)
+        with self._lock:
+            mask = self._allowed_mask(where)
+            allowed = int(mask.sum())
+            k = min(n_results, allowed)
+            rescore = self._codes is not None and self.rescore_factor > 0
+            candidates = min(allowed, k * self.rescore_factor) if rescore else k
+            if k == 0:
+                hits = [([], np.zeros(0, dtype=np.float32)) for _ in queries]
+            elif self.mode == "exact" or allowed <= max(self.exact_search_limit, k):
+                hits = self._exact_search(queries, candidates, mask)
+            elif self.mode == "ivf":
+                hits = [self._ivf_search(query, candidates, mask, nprobe or self.nprobe) for query in queries]
+            else:
+                hits = [self._hnsw_search(query, candidates, mask, max(ef or self.ef_search, candidates))
+                        for query in queries]
+            if rescore and k:
+                hits = [self._rescore(query, rows, k) for query, (rows, _) in zip(queries, hits)]
+            results = {key: [] for key in ('ids', 'embeddings', 'documents', 'metadatas', 'distances')}
+            for rows, distances in hits:
+                found = self._results(list(rows), include)
+                for key in ('ids', 'embeddings', 'documents', 'metadatas'):
+                    results[key].append(found[key])
+                results['distances'].append(distances.tolist())
+            for key in ('embeddings', 'documents', 'metadatas', 'distances'):
+                if key not in include:
+                    results[key] = None
+            results['included'] = list(include)
+            return results
+
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Rank candidate rows by their full-precision distance and keep the best k.
+        """
+        rows = np.sort(np.asarray(rows, dtype=np.int64))  # read the memory-mapped rows in file order
+        vectors = self._vectors[rows]
+        distances = self._distances_to(query[None, :], (vectors @ query)[None, :], self._squared_norms[rows])[0]
+        top = self._top_k(distances, k)
+        return rows[top], distances[top]
+
+    @staticmethod
+    def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indexes of the k smallest distances, nearest first.
+        """
+        if k < len(distances):
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(len(distances))
+        return candidates[np.argsort(distances[candidates], kind='stable')]
+
+    def _exact_search(self, queries: np.ndarray, k: int, mask: np.ndarray) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Score every allowed vector, a block of queries at a time.
+        """
+        all_allowed = bool(mask.all())
+        rows = None if all_allowed else np.flatnonzero(mask)
+        width = self._size if all_allowed else len(rows)
+        block = max(1, _EXACT_BLOCK_ELEMENTS // max(width, 1))
+        hits = []
+        for start in range(0, len(queries), block):
+            distances = self._distances(queries[start:start + block], rows)
+            for row_distances in distances:
+                top = self._top_k(row_distances, k)
+                hits.append((top if all_allowed else rows[top], row_distances[top]))
+        return hits
+
+    # IVF
+
+    def _reset_ivf(self):
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._list_rows: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+
+    def _ivf_add(self, start: int, end: int):
+        """
+        Assign new rows to their nearest cluster, retraining when the index has doubled.
+        """
+        if self._centroids is None or self._size >= 2 * self._trained_size:
+            self._centroids = None  # retrained lazily by the next search
+            return
+        self._assignments = np.concatenate([self._assignments, self._nearest_centroid(self._vectors[start:end])])
+        self._list_rows = None
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        block = max(1, _EXACT_BLOCK_ELEMENTS // len(self._centroids))
+        centroid_norms = np.einsum('ij,ij->i', self._centroids, self._centroids)
+        for start in range(0, len(vectors), block):
+            products = vectors[start:start + block] @ self._centroids.T
+            assignments[start:start + block] = np.argmin(centroid_norms - 2.0 * products, axis=1)
+        return assignments
+
+    def _ivf_train(self):
+        """
+        Cluster the vectors with k-means on a sample and assign every row to a cluster.
+        """
+        vectors = self._vectors[:self._size]
+        nlist = min(self.nlist or max(1, int(4 * math.sqrt(self._size))), self._size)
+        sample_size = min(self._size, nlist * _KMEANS_SAMPLES_PER_CENTROID)
+        sample = vectors[self._rng.choice(self._size, size=sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            self._centroids = centroids
+            labels = self._nearest_centroid(sample)
+            order = np.argsort(labels, kind='stable')
+            counts = np.bincount(labels, minlength=nlist)
+            filled = counts > 0
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+            centroids[filled] = np.add.reduceat(sample[order], starts, axis=0) / counts[filled, None]
+        self._centroids = centroids
+        self._assignments = self._nearest_centroid(vectors)
+        self._trained_size = self._size
+        self._list_rows = None
+        logger.info(f"Trained {nlist} IVF clusters on {sample_size} of {self._size} vectors")
+
+    def _ivf_lists(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The rows of each cluster, as a CSR-style (rows, offsets) pair.
+        """
+        if self._centroids is None:
+            self._ivf_train()
+        if self._list_rows is None:
+            self._list_rows = np.argsort(self._assignments, kind='stable')
+            counts = np.bincount(self._assignments, minlength=len(self._centroids))
+            self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._list_rows, self._list_offsets
+
+    def _ivf_search(self, query: np.ndarray, k: int, mask: np.ndarray, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        list_rows, offsets = self._ivf_lists()
+        centroid_distances = np.einsum('ij,ij->i', self._centroids, self._centroids) - 2.0 * (self._centroids @ query)
+        probes = self._top_k(centroid_distances, min(nprobe, len(self._centroids)))
+        rows = np.concatenate([list_rows[offsets[probe]:offsets[probe + 1]] for probe in probes])
+        rows = rows[mask[rows]]
+        if len(rows) == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+        distances = self._point_distances(query, rows)
+        top = self._top_k(distances, k)
+        return rows[top], distances[top]
+
+    # HNSW
+
+    def _reset_hnsw(self, capacity: int):
+        self._graph = np.full((capacity, 2 * self.M), -1, dtype=np.int32)
+        self._degrees = np.zeros(capacity, dtype=np.int32)
+        self._levels = np.zeros(capacity, dtype=np.int8)
+        self._upper: list[dict[int, list[int]]] = []
+        self._entry_point: Optional[int] = None
+        self._visited = np.zeros(capacity, dtype=np.int64)
+        self._visit_mark = 0
+
+    def _neighbors(self, node: int, level: int) -> np.ndarray:
+        if level == 0:
+            return self._graph[node, :self._degrees[node]]
+        return np.asarray(self._upper[level - 1].get(node, ()), dtype=np.int32)
+
+    def _set_neighbors(self, node: int, level: int, neighbors: np.ndarray):
+        if level == 0:
+            self._graph[node, :len(neighbors)] = neighbors
+            self._graph[node, len(neighbors):] = -1
+            self._degrees[node] = len(neighbors)
+        else:
+            self._upper[level - 1][node] = neighbors.tolist()
+
+    def _search_layer(self, query: np.ndarray, entry_points: list[tuple[float, int]], ef: int, level: int,
+                      mask: Optional[np.ndarray] = None) -> list[tuple[float, int]]:
+        """
+        Best-first search of one layer, returning up to ef (distance, row) pairs nearest first.
+
+        Every node is traversed, but only rows allowed by mask are returned, so deleted
+        or filtered-out vectors still act as stepping stones.
+        """
+        self._visit_mark += 1
+        mark = self._visit_mark
+        candidates = list(entry_points)
+        heapq.heapify(candidates)
+        results = [(-distance, row) for distance, row in entry_points if mask is None or mask[row]]
+        heapq.heapify(results)
+        for _, row in entry_points:
+            self._visited[row] = mark
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if len(results) >= ef and distance > -results[0][0]:
+                break
+            neighbors = self._neighbors(node, level)
+            neighbors = neighbors[self._visited[neighbors] != mark]
+            if len(neighbors) == 0:
+                continue
+            self._visited[neighbors] = mark
+            neighbor_distances = self._point_distances(query, neighbors)
+            if len(results) >= ef:
+                closer = neighbor_distances < -results[0][0]
+                neighbors, neighbor_distances = neighbors[closer], neighbor_distances[closer]
+            for neighbor_distance, neighbor in zip(neighbor_distances.tolist(), neighbors.tolist()):
+                if len(results) < ef or neighbor_distance < -results[0][0]:
+                    heapq.heappush(candidates, (neighbor_distance, neighbor))
+                    if mask is None or mask[neighbor]:
+                        heapq.heappush(results, (-neighbor_distance, neighbor))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+        return sorted((-distance, row) for distance, row in results)
+
+    def _descend(self, query: np.ndarray, to_level: int) -> list[tuple[float, int]]:
+        """
+        Greedy search from the entry point down to to_level.
+        """
+        entry = self._entry_point
+        nearest = [(float(self._point_distances(query, np.array([entry]))[0]), entry)]
+        for level in range(len(self._upper), to_level, -1):
+            nearest = self._search_layer(query, nearest, 1, level)
+        return nearest
+
+    def _hnsw_insert(self, row: int):
+        level = min(int(-math.log(1.0 - self._rng.random()) / math.log(self.M)), 127)
+        self._levels[row] = level
+        if self._entry_point is None:
+            self._entry_point = row
+            self._upper = [{row: []} for _ in range(level)]
+            return
+        query = self._vectors[row]
+        top_level = len(self._upper)
+        nearest = self._descend(query, level)
+        for layer in range(min(level, top_level), -1, -1):
+            nearest = self._search_layer(query, nearest, self.ef_construction, layer)
+            max_links = 2 * self.M if layer == 0 else self.M
+            candidates = np.array([node for _, node in nearest], dtype=np.int32)
+            neighbors = self._select_neighbors(candidates, np.array([distance for distance, _ in nearest]), self.M)
+            self._set_neighbors(row, layer, neighbors)
+            for neighbor in neighbors.tolist():
+                links = np.append(self._neighbors(neighbor, layer), row)
+                if len(links) > max_links:
+                    distances = self._point_distances(self._vectors[neighbor], links)
+                    links = links[self._top_k(distances, max_links)]
+                self._set_neighbors(neighbor, layer, links)
+        for _ in range(top_level, level):
+            self._upper.append({row: []})
+        if level > top_level:
+            self._entry_point = row
+
+    def _select_neighbors(self, candidates: np.ndarray, distances: np.ndarray, count: int) -> np.ndarray:
+        """
+        Pick up to count links from candidates sorted nearest first, with the HNSW heuristic.
+
+        A candidate is kept only if it is nearer to the new node than to every link kept so
+        far, which spreads links across clusters instead of spending them all on one; the
+        remaining slots are filled with the nearest candidates that were passed over.
+        """
+        if len(candidates) <= count:
+            return candidates
+        between = self._distances(self._vectors[candidates], candidates)
+        kept: list[int] = []
+        for i in range(len(candidates)):
+            if not kept or distances[i] < between[i, kept].min():
+                kept.append(i)
+                if len(kept) == count:
+                    break
+        if len(kept) < count:
+            passed_over = np.setdiff1d(np.arange(len(candidates)), kept, assume_unique=True)
+            kept.extend(passed_over[:count - len(kept)].tolist())
+        return candidates[kept]
+
+    def _hnsw_search(self, query: np.ndarray, k: int, mask: np.ndarray, ef: int) -> tuple[np.ndarray, np.ndarray]:
+        nearest = self._descend(query, 0)
+        found = self._search_layer(query, nearest, ef, 0, mask)[:k]
+        rows = np.array([row for _, row in found], dtype=np.int64)
+        distances = np.array([distance for distance, _ in found], dtype=np.float32)
+        return rows, distances
@@ -4,19 +4,50 @@ VectorStore module for RAG (Retrieval-Augmented Generation) system.
 This module provides functionality for storing and querying document embeddings
 using ChromaDB. It handles document ingestion, vector storage, and semantic search
 operations.
+
+The store is in-memory by default.  When given a path it persists the index on disk and
+records a content hash for every document, so re-seeding an existing index only embeds
+documents that are new or changed and deletes documents that were removed.
+
+The index behind the store is pluggable (see rag.vector_index): the default "chroma"
+backend uses a ChromaDB collection, and the "numpy" backend keeps the vectors in process
+with exact, IVF or HNSW search.
+
+Every write also updates an in-process BM25 index of the document text (see
+rag.lexical_index).  Queries can be dense (the default), lexical, or hybrid: dense and
+lexical candidates fused with reciprocal rank fusion.
+
+With a chunking strategy (see rag.chunking) long documents are split into overlapping
+chunks as they are written, and each chunk is stored as its own entry with the id of its
+parent document in its metadata.
 """
 
-import json
+import logging
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Union
 
 import chromadb
+import numpy as np
 
+from rag.chunking import Chunker
+from rag.config import RETRIEVAL_MODE, RRF_K, VECTOR_INDEX_MODE, VECTOR_STORE_BACKEND, VECTOR_STORE_PATH
 from rag.embedding import ChromaEmbedder, Embedder
+from rag.cache import content_hash
+from rag.ingestion import DEFAULT_BATCH_SIZE, IngestionPipeline, IngestionStats
+from rag.lexical_index import BM25Index, reciprocal_rank_fusion
+from rag.vector_index import NumpyIndex, VectorIndex
 from schema.document import Document
 
 SEED_DATA_PATH = Path('data/seed_data.jsonl')
 COLLECTION_NAME = 'seed_data'
+CONTENT_HASH_KEY = 'content_hash'
+EMBEDDER_MODEL_KEY = 'embedder_model'
+STORED_ID_PAGE_SIZE = 10000
+BACKENDS = ('chroma', 'numpy')
+QUERY_MODES = ('dense', 'lexical', 'hybrid')
+
+logger = logging.getLogger(__name__)
 
 
 class VectorStore:
@@ -29,71 +60,380 @@ class VectorStore:
     
     Attributes:
         embedder (Embedder): The embedding model for generating document vectors.
-        client (chromadb.EphemeralClient): The ChromaDB client instance.
-        collection (chromadb.Collection): The document collection in ChromaDB.
+        persist_path (Optional[Path]): Where the index is persisted, None when in-memory.
+        backend (str): "chroma" or "numpy".
+        client (Optional[chromadb.ClientAPI]): The ChromaDB client instance, None for the
+                                               numpy backend.
+        collection (VectorIndex): The document index: a ChromaDB collection or a NumpyIndex.
+        lexical_index (BM25Index): BM25 index over the same documents.
+        chunker (Chunker): Splits documents into chunks as they are written.
+        document_listeners (list[Callable[[list[str]], None]]): Callbacks invoked with the
+                                                                ids of documents that were
+                                                                added, changed or deleted.
     """
     
-    def __init__(self, embedder_model_name: str = 'all-MiniLM-L6-v2'):        
+    def __init__(self,
+                 embedder_model_name: str = 'all-MiniLM-L6-v2',
+                 embedder: Optional[Embedder] = None,
+                 persist_path: Optional[Union[str, Path]] = VECTOR_STORE_PATH,
+                 backend: str = VECTOR_STORE_BACKEND,
+                 index_params: Optional[dict[str, Any]] = None,
+                 chunker: Optional[Chunker] = None):
         """
         Initialize the VectorStore with an embedding model and ChromaDB collection.
         
         Args:
             embedder_model_name (str): Name of the sentence transformer model for embeddings.
-                                      Defaults to 'all-MiniLM-L6-v2'.
+                                      Defaults to 'all-MiniLM-L6-v2'.  Ignored when an
+                                      embedder is passed in.
+            embedder (Optional[Embedder]): An existing embedder to share with the caller.
+                                           Defaults to None, which builds one for
+                                           embedder_model_name.
+            persist_path (Optional[Union[str, Path]]): Directory to persist the index in.
+                                                       Defaults to the VECTOR_STORE_PATH
+                                                       environment variable; when unset the
+                                                       index lives in memory only.  Only the
+                                                       chroma backend can persist.
+            backend (str): "chroma" for a ChromaDB collection or "numpy" for an in-process
+                           NumpyIndex. Defaults to the VECTOR_STORE_BACKEND environment
+                           variable, or "chroma".
+            index_params (Optional[dict[str, Any]]): Options for the NumpyIndex, e.g.
+                                                     {'mode': 'hnsw', 'ef_search': 128}.
+                                                     The mode defaults to VECTOR_INDEX_MODE.
+            chunker (Optional[Chunker]): Splits documents into chunks as they are
+                                         written. Defaults to None, which builds one from
+                                         the CHUNK_STRATEGY, CHUNK_SIZE and CHUNK_OVERLAP
+                                         environment variables; the "none" strategy
+                                         stores documents whole.
         """
-        self.embedder = Embedder(embedder_model_name)
-        self.client = chromadb.EphemeralClient()
-        self.collection = self.client.create_collection(name=COLLECTION_NAME,
-                                                        embedding_function=ChromaEmbedder(self.embedder),
-                                                        metadata={'source': 'test',
-                                                                  'created_at': datetime.now().isoformat()})
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}, got {backend}")
+        self.embedder = embedder or Embedder(embedder_model_name)
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.backend = backend
+        self.chunker = chunker or Chunker()
+        if backend == 'numpy':
+            if self.persist_path:
+                raise ValueError("The numpy backend keeps its index in memory and cannot persist it")
+            self.client = None
+            self.collection: VectorIndex = NumpyIndex(name=COLLECTION_NAME,
+                                                      embedding_function=ChromaEmbedder(self.embedder),
+                                                      metadata={EMBEDDER_MODEL_KEY: self.embedder.model_name},
+                                                      **{'mode': VECTOR_INDEX_MODE, **(index_params or {})})
+        else:
+            if self.persist_path:
+                self.client = chromadb.PersistentClient(path=str(self.persist_path))
+            else:
+                self.client = chromadb.EphemeralClient()
+            self.collection = self._open_collection()
+        self.lexical_index = BM25Index()
+        self._load_lexical_index()
+        self.document_listeners: list[Callable[[list[str]], None]] = []
 
-    def seed_documents(self):
+    def _open_collection(self) -> chromadb.Collection:
+        """
+        Open the document collection, creating it if it doesn't exist.
+
+        A persisted collection that was embedded with a different model is dropped and
+        recreated, since its vectors are not comparable with the current embedder.
+
+        Returns:
+            chromadb.Collection: The document collection.
+        """
+        embedding_function = ChromaEmbedder(self.embedder)
+        if self.persist_path and COLLECTION_NAME in [c.name for c in self.client.list_collections()]:
+            collection = self.client.get_collection(name=COLLECTION_NAME, embedding_function=embedding_function)
+            stored_model = (collection.metadata or {}).get(EMBEDDER_MODEL_KEY)
+            if stored_model == self.embedder.model_name:
+                logger.info(f"Opened persisted collection with {collection.count()} documents at {self.persist_path}")
+                return collection
+            logger.warning(f"Persisted collection was embedded with {stored_model}, "
+                           f"rebuilding it for {self.embedder.model_name}")
+            self.client.delete_collection(name=COLLECTION_NAME)
+        return self.client.create_collection(name=COLLECTION_NAME,
+                                             embedding_function=embedding_function,
+                                             metadata={'source': 'test',
+                                                       EMBEDDER_MODEL_KEY: self.embedder.model_name,
+                                                       'created_at': datetime.now().isoformat()})
+
+    def _load_lexical_index(self):
+        """
+        Index the text of documents already in a persisted collection.
+        """
+        offset = 0
+        while True:
+            page = self.collection.get(include=['documents', 'metadatas'], limit=STORED_ID_PAGE_SIZE, offset=offset)
+            self.lexical_index.add(page['ids'], page['documents'], page['metadatas'])
+            if len(page['ids']) < STORED_ID_PAGE_SIZE:
+                break
+            offset += STORED_ID_PAGE_SIZE
+        if self.lexical_index.count():
+            logger.info(f"Built the lexical index for {self.lexical_index.count()} stored documents")
+
+    def seed_documents(self,
+                       seed_path: Union[str, Path] = SEED_DATA_PATH,
+                       batch_size: int = DEFAULT_BATCH_SIZE,
+                       checkpoint_path: Optional[Union[str, Path]] = None) -> IngestionStats:
         """
         Load and add documents from the seed data file.
         
-        This method reads documents from the configured seed data JSONL file
-        and adds them to the vector store for indexing.
+        This method streams documents from the configured seed data JSONL file through
+        the ingestion pipeline in bounded batches and synchronises the vector store with
+        them.  Only documents that are new or whose content hash changed are embedded,
+        documents missing from the seed data are deleted and invalid lines are skipped,
+        so re-seeding an unchanged persisted index embeds nothing.  Documents are split by
+        the store's chunker as they are read.
 
         Note:  The seed data path is hardcoded in this module, but in a real production
         application, this would be a configuration parameter.
+
+        Args:
+            seed_path (Union[str, Path]): The JSONL file to seed from.
+                                          Defaults to SEED_DATA_PATH.
+            batch_size (int): Number of lines embedded and written per batch.
+                              Defaults to DEFAULT_BATCH_SIZE.
+            checkpoint_path (Optional[Union[str, Path]]): File to record progress in so an
+                                                          interrupted run can resume.
+                                                          Defaults to None.
+
+        Returns:
+            IngestionStats: Counts of added, updated, unchanged, removed and skipped
+                            documents, and the throughput of the run.
         
         Raises:
             FileNotFoundError: If the seed data file doesn't exist.
         """
-        if not SEED_DATA_PATH.exists():
-            raise FileNotFoundError(f"Seed data file not found at {SEED_DATA_PATH}")
-        documents = []
-        with open(SEED_DATA_PATH, 'r') as f:
-            for line in f:
-                data = json.loads(line)
-                documents.append(Document(**data))
-        self.add_documents(documents=documents)
+        seed_path = Path(seed_path)
+        if not seed_path.exists():
+            raise FileNotFoundError(f"Seed data file not found at {seed_path}")
+        pipeline = IngestionPipeline(self, batch_size=batch_size, checkpoint_path=checkpoint_path,
+                                     chunker=self.chunker if self.chunker.enabled else None)
+        return pipeline.run(seed_path)
 
-    def query(self, query: str, n_results: int = 10) -> list[Document]:
+    def stored_hashes(self, ids: list[str]) -> dict[str, Optional[str]]:
         """
-        Perform a semantic search query on the vector store.
+        Return the content hash recorded for the given documents.
+
+        Args:
+            ids (list[str]): Ids of the documents to look up.
+
+        Returns:
+            dict[str, Optional[str]]: Document id to content hash for the ids that are
+                                      stored.  Documents added without a hash map to None.
+        """
+        results = self.collection.get(ids=ids, include=['metadatas'])
+        return {id: (metadata or {}).get(CONTENT_HASH_KEY)
+                for id, metadata in zip(results['ids'], results['metadatas'])}
+
+    def stored_ids(self) -> Iterator[str]:
+        """
+        Yield the id of every stored document, one page at a time.
+
+        Returns:
+            Iterator[str]: The stored document ids.
+        """
+        offset = 0
+        while True:
+            page = self.collection.get(include=[], limit=STORED_ID_PAGE_SIZE, offset=offset)
+            yield from page['ids']
+            if len(page['ids']) < STORED_ID_PAGE_SIZE:
+                return
+            offset += STORED_ID_PAGE_SIZE
+
+    def query(self, query: str, n_results: int = 10, include_embeddings: bool = False,
+              mode: str = RETRIEVAL_MODE, where: Optional[dict] = None) -> list[Document]:
+        """
+        Perform a search query on the vector store.
         
         Args:
             query (str): The search query.
             n_results (int): Number of results to return. Defaults to 10.
+            include_embeddings (bool): Whether to attach the stored embedding and the
+                                       query distance to each returned document.
+                                       Defaults to False.
+            mode (str): "dense", "lexical" or "hybrid", see query_batch(). Defaults to the
+                        RETRIEVAL_MODE environment variable, or "dense".
+            where (Optional[dict]): Chroma-style metadata filter, e.g.
+                                    {"source_species": "avian"}, see query_batch().
+                                    Defaults to None.
         
         Returns:
             list[Document]: List of retrieved documents with their metadata.
         """
-        results = self.collection.query(query_texts=[query], n_results=n_results)
-        doc_results = zip(results['ids'][0], results['documents'][0], results['metadatas'][0])
-        return [Document(id=id, data=data, metadata=metadata) for id, data, metadata in doc_results]
+        return self.query_batch([query], n_results, include_embeddings, mode, where)[0]
+
+    def query_batch(self, queries: list[str], n_results: int = 10,
+                    include_embeddings: bool = False, mode: str = RETRIEVAL_MODE,
+                    where: Optional[dict] = None) -> list[list[Document]]:
+        """
+        Perform search queries for several queries at once.
+
+        Dense search embeds all queries in a single encode call and searches them in a
+        single index query.  Query embeddings are served from the query embedding cache
+        where possible.  Lexical search ranks documents by BM25 over their text.  Hybrid
+        search runs both, each for n_results candidates, fuses the two rankings with
+        reciprocal rank fusion and keeps the best n_results.
+
+        A where filter is applied inside each search rather than to its results, so
+        n_results matching documents come back whenever that many exist.  The in-process
+        indexes turn it into a bitmap of allowed rows with their metadata index and never
+        score the other documents; Chroma filters on its own metadata index.
+
+        Args:
+            queries (list[str]): The search queries.
+            n_results (int): Number of results to return per query. Defaults to 10.
+            include_embeddings (bool): Whether to attach the stored embedding and the
+                                       query distance to each returned document.  Documents
+                                       found only by lexical search have no distance.
+                                       Defaults to False.
+            mode (str): "dense", "lexical" or "hybrid". Defaults to the RETRIEVAL_MODE
+                        environment variable, or "dense".
+            where (Optional[dict]): Chroma-style metadata filter over the document
+                                    metadata: equality ({"source_species": "avian"}),
+                                    $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $and and
+                                    $or. Defaults to None.
+
+        Returns:
+            list[list[Document]]: One list of retrieved documents per query, in query order.
+        """
+        if mode not in QUERY_MODES:
+            raise ValueError(f"mode must be one of {QUERY_MODES}, got {mode}")
+        where = where or None
+        dense = self._dense_query_batch(queries, n_results, include_embeddings, where) if mode != 'lexical' else None
+        if mode == 'dense':
+            return dense
+        batch = []
+        for i, query in enumerate(queries):
+            lexical_ids = [id for id, _ in self.lexical_index.query(query, n_results, where)]
+            if mode == 'lexical':
+                batch.append(self._documents_by_id(lexical_ids, include_embeddings))
+                continue
+            found = {doc.id: doc for doc in dense[i]}
+            fused = [id for id, _ in reciprocal_rank_fusion([list(found), lexical_ids], RRF_K)[:n_results]]
+            fetched = {doc.id: doc for doc in self._documents_by_id([id for id in fused if id not in found],
+                                                                    include_embeddings)}
+            batch.append([found.get(id) or fetched[id] for id in fused])
+        return batch
+
+    def _dense_query_batch(self, queries: list[str], n_results: int, include_embeddings: bool,
+                           where: Optional[dict] = None) -> list[list[Document]]:
+        """
+        Nearest neighbour search on the query embeddings.
+        """
+        include = ['documents', 'metadatas']
+        if include_embeddings:
+            include += ['embeddings', 'distances']
+        results = self.collection.query(query_embeddings=self.embedder.embed_queries_array(queries),
+                                        n_results=n_results,
+                                        where=where,
+                                        include=include)
+        batch = []
+        for i in range(len(queries)):
+            doc_results = zip(results['ids'][i], results['documents'][i], results['metadatas'][i])
+            documents = [Document(id=id, data=data, metadata=metadata) for id, data, metadata in doc_results]
+            if include_embeddings:
+                for document, embedding, distance in zip(documents, results['embeddings'][i], results['distances'][i]):
+                    document.embedding = embedding
+                    document.distance = distance
+            batch.append(documents)
+        return batch
+
+    def _documents_by_id(self, ids: list[str], include_embeddings: bool) -> list[Document]:
+        """
+        Fetch stored documents in the order of ids, with their embeddings if requested.
+        """
+        if not ids:
+            return []
+        include = ['documents', 'metadatas'] + (['embeddings'] if include_embeddings else [])
+        results = self.collection.get(ids=ids, include=include)
+        documents = {}
+        for i, id in enumerate(results['ids']):
+            documents[id] = Document(id=id, data=results['documents'][i], metadata=results['metadatas'][i])
+            if include_embeddings:
+                documents[id].embedding = results['embeddings'][i]
+        return [documents[id] for id in ids if id in documents]
     
     def add_documents(self, documents: list[Document]):
         """
         Add documents to the vector store for indexing.
+
+        Documents are split by the store's chunker first.
         
         Args:
             documents (list[Document]): List of documents to add to the vector store.
         """
+        documents = list(self.chunker.chunk_stream(documents))
+        metadatas = self._metadatas(documents)
         self.collection.add(
             documents=[doc.data for doc in documents],
             ids=[doc.id for doc in documents],
-            metadatas=[doc.metadata.model_dump() for doc in documents]
-        )       
+            metadatas=metadatas
+        )
+        self.lexical_index.add([doc.id for doc in documents], [doc.data for doc in documents], metadatas)
+        self._notify_document_listeners([doc.id for doc in documents])
+
+    def upsert_documents(self, documents: list[Document], embeddings: Optional[np.ndarray] = None):
+        """
+        Add documents to the vector store, replacing any stored documents with the same id.
+
+        Without precomputed embeddings the documents are split by the store's chunker
+        first, and the stored chunks of a replaced document that its new version no
+        longer has are deleted, as is the whole stored document once it is chunked.
+        Documents with precomputed embeddings are stored as they are, since the
+        embeddings belong to them; the ingestion pipeline chunks before it embeds.
+
+        Args:
+            documents (list[Document]): List of documents to add or replace.
+            embeddings (Optional[np.ndarray]): Precomputed embeddings for the documents,
+                                               one row each.  Defaults to None, which
+                                               embeds them with the store's embedder.
+        """
+        if embeddings is None and self.chunker.enabled:
+            chunks = list(self.chunker.chunk_stream(documents))
+            stale = self._stale_chunk_ids([doc.id for doc in documents], {chunk.id for chunk in chunks})
+            if stale:
+                self.delete_documents(stale)
+            documents = chunks
+        metadatas = self._metadatas(documents)
+        self.collection.upsert(
+            documents=[doc.data for doc in documents],
+            ids=[doc.id for doc in documents],
+            metadatas=metadatas,
+            embeddings=embeddings
+        )
+        self.lexical_index.upsert([doc.id for doc in documents], [doc.data for doc in documents],
+                                  metadatas)
+        self._notify_document_listeners([doc.id for doc in documents])
+
+    def _stale_chunk_ids(self, parent_ids: list[str], kept_ids: set[str]) -> list[str]:
+        """
+        Ids stored for the given documents, whole or as chunks, that are not being kept.
+        """
+        stored = self.collection.get(where={'parent_id': {'$in': parent_ids}}, include=[])['ids']
+        stored += self.collection.get(ids=parent_ids, include=[])['ids']
+        return [id for id in stored if id not in kept_ids]
+
+    def delete_documents(self, ids: list[str]):
+        """
+        Delete documents from the vector store.
+
+        Args:
+            ids (list[str]): Ids of the documents to delete.
+        """
+        self.collection.delete(ids=ids)
+        self.lexical_index.delete(ids)
+        self._notify_document_listeners(ids)
+
+    def _notify_document_listeners(self, ids: list[str]):
+        """
+        Tell every registered listener which documents changed.
+        """
+        for listener in self.document_listeners:
+            listener(ids)
+
+    def _metadatas(self, documents: list[Document]) -> list[dict]:
+        """
+        Build the stored metadata for documents, including their content hash.
+        """
+        return [{**doc.metadata.model_dump(exclude_none=True), CONTENT_HASH_KEY: content_hash(doc)}
+                for doc in documents]
@@ -1,16 +1,29 @@
-from pydantic import BaseModel
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class MetaData(BaseModel):
     title: str
     source_species: str
     data_source: str
+    # Set on the chunks of a document split by rag.chunking: the id of the document the
+    # chunk was cut from and its position in it.  None for documents stored whole.
+    parent_id: Optional[str] = None
+    chunk_index: Optional[int] = None
 
 class Document(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str
     metadata: MetaData
     data: str
     rank: float = 0.0
+    # Populated by VectorStore.query when the stored vectors are requested.  They are
+    # excluded from serialisation so documents round-trip through JSONL unchanged.
+    embedding: Optional[np.ndarray] = Field(default=None, exclude=True, repr=False)
+    distance: Optional[float] = Field(default=None, exclude=True)
 
 
 
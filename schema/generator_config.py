@@ -1,9 +1,11 @@
 from typing import Literal, Optional
 
-from pydantic import UUID4, BaseModel
+from pydantic import UUID4, BaseModel, Field
 
 
 class GeneratorConfig(BaseModel):
     mode: Literal["loose", "strict"]
     model_name: str = "gpt-4o-mini"
     temperature: float = 0.0
+    # Maximum tokens of retrieved documents packed into the prompt; None for no limit
+    context_token_budget: Optional[int] = Field(default=None, gt=0)
@@ -1,10 +1,76 @@
+from pathlib import Path
+
 import pytest
 
+from rag.completion_cache import SQLiteCompletionCache, set_default_completion_cache
 from rag.generator import Generator
+from rag.llm import reset_connectivity_checks
 from rag.pipeline import RagPipeline
 from rag.retriever import Retriever
 from schema.generator_config import GeneratorConfig
+from tests.utilities.fake_openai_server import FakeOpenAIServer
+from tests.utilities.fake_vector_store import FakeEmbedder, FakeVectorStore
+
+
+def pytest_addoption(parser):
+    parser.addoption("--cache-completions", action="store_true", default=False,
+                     help="Reuse LLM completions from earlier runs, stored in the pytest cache directory")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def completion_cache(request, tmp_path_factory):
+    """
+    With --cache-completions, cache LLM completions on disk across runs, so repeating the
+    suite makes no network calls.  Off by default, since cached answers would hide prompt
+    or model regressions.  Without the cacheprovider plugin the cache only lasts for the
+    session.
+    """
+    if not request.config.getoption("--cache-completions"):
+        yield None
+        return
+    if hasattr(request.config, "cache"):
+        directory = Path(request.config.cache.mkdir("completions"))
+    else:
+        directory = tmp_path_factory.mktemp("completions")
+    cache = SQLiteCompletionCache(directory / "completions.sqlite")
+    previous = set_default_completion_cache(cache)
+    yield cache
+    set_default_completion_cache(previous)
 
+@pytest.fixture
+def no_completion_cache():
+    """
+    Disable the completion cache, for tests that count requests to a fake server.
+    """
+    previous = set_default_completion_cache(None)
+    yield
+    set_default_completion_cache(previous)
+
+@pytest.fixture
+def fake_openai(request, no_completion_cache):
+    """
+    A FakeOpenAIServer replying "True", with fresh connectivity checks.  Tests pass other
+    server options (reply, delay, token_delay) by parametrizing the fixture indirectly:
+
+        @pytest.mark.parametrize("fake_openai", [{"reply": "hello", "delay": 0.1}], indirect=True)
+    """
+    reset_connectivity_checks()
+    with FakeOpenAIServer(**getattr(request, "param", {})) as server:
+        yield server
+    reset_connectivity_checks()
+
+@pytest.fixture
+def fake_retriever():
+    """
+    Build Retrievers around the given rankers with a stand-in embedder and vector store,
+    so no model is loaded.  Keyword arguments go to Retriever.
+    """
+    def _factory(document_ranker, **kwargs):
+        options = {"ranker_model_name": "fake", "cascade_ranker_name": None, "early_exit": False,
+                   "micro_batching": False, "rerank_max_batch_tokens": None, **kwargs}
+        return Retriever(document_ranker=document_ranker, embedder=FakeEmbedder(),
+                         vector_store=FakeVectorStore(), **options)
+    return _factory
 
 @pytest.fixture(scope="session")
 def create_retriever():
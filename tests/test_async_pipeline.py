@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+
+from rag.generator import Generator
+from rag.llm import AsyncOpenAI_LLM
+from rag.pipeline import RagPipeline
+from schema.generator_config import GeneratorConfig
+from tests.utilities.documents import StubRetriever
+from tests.utilities.fake_openai_server import FakeOpenAIServer
+
+
+def _reply(body):
+    return "Answer: " + body["messages"][0]["content"].rsplit("Query: ", 1)[-1]
+
+
+@pytest.mark.async_pipeline
+def test_arun_returns_same_answer_as_run():
+    with FakeOpenAIServer(reply=_reply) as server:
+        llm = AsyncOpenAI_LLM(api_key="sk-test", base_url=server.url)
+        pipeline = RagPipeline(StubRetriever(delay=0.01), Generator(GeneratorConfig(mode="strict"), llm=llm))
+        answer = asyncio.run(pipeline.arun("Do platypuses lay eggs?"))
+        assert answer == pipeline.run("Do platypuses lay eggs?") == "Answer: Do platypuses lay eggs?"
+        assert "Platypus are mammals" in pipeline.generator.last_prompt
+
+
+@pytest.mark.async_pipeline
+def test_arun_overlaps_slow_completions_within_concurrency_limit():
+    with FakeOpenAIServer(reply=_reply, delay=0.3) as server:
+        llm = AsyncOpenAI_LLM(api_key="sk-test", base_url=server.url)
+        pipeline = RagPipeline(StubRetriever(delay=0.01), Generator(GeneratorConfig(mode="loose"), llm=llm),
+                               max_concurrency=4)
+        queries = [f"Question {i}" for i in range(8)]
+
+        async def _run_all():
+            return await asyncio.gather(*(pipeline.arun(query) for query in queries))
+
+        start = time.perf_counter()
+        answers = asyncio.run(_run_all())
+        elapsed = time.perf_counter() - start
+        assert answers == [f"Answer: {query}" for query in queries]
+        # 8 calls of 0.3s with 4 in flight take two rounds rather than eight
+        assert elapsed < 8 * 0.3 / 2
+        assert server.max_in_flight <= 4
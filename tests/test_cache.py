@@ -0,0 +1,44 @@
+import pytest
+
+from rag.cache import LRUCache, RerankScoreCache
+from tests.utilities.fake_clock import FakeClock
+
+
+@pytest.mark.cache
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    assert cache.put("c", 3) == ["b"]
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats.evictions == 1
+    assert cache.stats.hit_rate == pytest.approx(2 / 3)
+
+
+@pytest.mark.cache
+def test_lru_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(max_size=10, ttl_seconds=5, clock=clock)
+    cache.put("a", 1)
+    clock.now = 4
+    assert cache.get("a") == 1
+    clock.now = 6
+    assert cache.get("a") is None
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+@pytest.mark.cache
+def test_rerank_cache_invalidates_by_document():
+    cache = RerankScoreCache(max_size=10, ttl_seconds=None)
+    first = cache.key("ranker", "Do  platypuses lay eggs?", "3", "hash-a")
+    second = cache.key("ranker", "Tell me about bats", "3", "hash-a")
+    other = cache.key("ranker", "Tell me about bats", "4", "hash-b")
+    for key, score in [(first, 0.9), (second, 0.2), (other, 0.5)]:
+        cache.put(key, score)
+    assert cache.get(cache.key("ranker", "Do platypuses lay eggs?", "3", "hash-a")) == 0.9
+    assert cache.invalidate_documents(["3"]) == 2
+    assert cache.get(first) is None
+    assert cache.get(other) == 0.5
@@ -0,0 +1,196 @@
+import hashlib
+import json
+
+import pytest
+
+from rag.cache import RerankScoreCache, content_hash
+from rag.chunking import CHUNK_ID_SEPARATOR, Chunker, collapse_chunks, sentence_spans
+from rag.ingestion import IngestionPipeline
+from rag.tokenizer import RegexTokenizer
+from rag.vectorstore import VectorStore
+from schema.document import Document, MetaData
+from tests.utilities.fake_vector_store import FakeVectorStore
+
+SENTENCES = ["The platypus lays eggs.", "It hunts for shrimp along muddy river banks!", "Does it sting?",
+             "Yes, males have venomous spurs on their hind legs.", "Penguins dive for fish in cold seas.",
+             "Crocodiles bask in the sun for hours."]
+LONG_TEXT = " ".join(SENTENCES * 3)
+
+
+def _document(id="doc", data=LONG_TEXT):
+    return Document(id=id, data=data, metadata=MetaData(title="Platypus", source_species="mammal",
+                                                        data_source="test"))
+
+
+@pytest.mark.chunking
+def test_sentence_spans_strip_whitespace_and_keep_closing_quotes():
+    text = 'First one.  "Second!" third\n\nfourth'
+    assert [text[start:end] for start, end in sentence_spans(text)] == ["First one.", '"Second!"', "third",
+                                                                        "fourth"]
+    assert sentence_spans("   ") == []
+
+
+@pytest.mark.chunking
+def test_token_windows_overlap_and_cover_every_token():
+    tokenizer = RegexTokenizer()
+    chunks = Chunker("token", chunk_size=12, overlap=4, tokenizer=tokenizer).chunk(_document())
+    spans = tokenizer.spans(LONG_TEXT)
+
+    assert len(chunks) == -(-(len(spans) - 4) // 8)
+    assert all(tokenizer.count(chunk.data) <= 12 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        shared = tokenizer.spans(previous.data)[-4:]
+        assert previous.data[shared[0][0]:] == chunk.data[:len(previous.data) - shared[0][0]]
+    assert chunks[0].data == LONG_TEXT[:spans[11][1]]
+    assert LONG_TEXT.endswith(chunks[-1].data)
+
+
+@pytest.mark.chunking
+def test_sentence_chunks_hold_whole_sentences_and_repeat_the_last_ones():
+    tokenizer = RegexTokenizer()
+    chunks = Chunker("sentence", chunk_size=25, overlap=10, tokenizer=tokenizer).chunk(_document())
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert tokenizer.count(chunk.data) <= 25
+        assert chunk.data[0].isupper() and chunk.data[-1] in ".!?"
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = previous.data[sentence_spans(previous.data)[-1][0]:]
+        if tokenizer.count(last_sentence) <= 10:
+            assert chunk.data.startswith(last_sentence)
+    assert LONG_TEXT.startswith(chunks[0].data) and LONG_TEXT.endswith(chunks[-1].data)
+
+
+@pytest.mark.chunking
+def test_oversized_sentences_are_cut_into_token_windows():
+    tokenizer = RegexTokenizer()
+    sentence = " ".join(f"word{i}" for i in range(30)) + "."
+    chunks = Chunker("sentence", chunk_size=8, overlap=2, tokenizer=tokenizer).chunk(_document(data=sentence))
+    assert all(tokenizer.count(chunk.data) <= 8 for chunk in chunks)
+    assert chunks[0].data.startswith("word0 ") and chunks[-1].data.endswith("word29.")
+
+
+@pytest.mark.chunking
+def test_chunks_map_back_to_their_parent():
+    document = _document()
+    chunks = Chunker("sentence", chunk_size=25, overlap=5, tokenizer=RegexTokenizer()).chunk(document)
+    assert [chunk.id for chunk in chunks] == [f"doc{CHUNK_ID_SEPARATOR}{i}" for i in range(len(chunks))]
+    assert [chunk.metadata.chunk_index for chunk in chunks] == list(range(len(chunks)))
+    assert {chunk.metadata.parent_id for chunk in chunks} == {"doc"}
+    assert {chunk.metadata.title for chunk in chunks} == {"Platypus"}
+    assert document.metadata.parent_id is None
+
+
+@pytest.mark.chunking
+def test_short_documents_and_the_none_strategy_store_documents_whole():
+    short = _document(data="The platypus lays eggs.")
+    assert Chunker("token", chunk_size=20, overlap=5, tokenizer=RegexTokenizer()).chunk(short) == [short]
+    assert Chunker("sentence", chunk_size=20, overlap=5, tokenizer=RegexTokenizer()).chunk(short) == [short]
+    assert Chunker("none", chunk_size=4, overlap=0).chunk(_document())[0].data == LONG_TEXT
+
+
+@pytest.mark.chunking
+@pytest.mark.parametrize("arguments", [{"strategy": "paragraph"}, {"chunk_size": 0}, {"chunk_size": 8, "overlap": 8},
+                                       {"overlap": -1}])
+def test_invalid_settings_are_rejected(arguments):
+    with pytest.raises(ValueError):
+        Chunker(**{"strategy": "token", "chunk_size": 20, "overlap": 5, **arguments})
+
+
+@pytest.mark.chunking
+def test_tokenizer_is_only_loaded_when_a_document_is_split(monkeypatch):
+    loaded = []
+    monkeypatch.setattr("rag.chunking.get_tokenizer", lambda: loaded.append(1) or RegexTokenizer())
+    assert Chunker("none").chunk(_document())[0].data == LONG_TEXT
+    chunker = Chunker("token", chunk_size=20, overlap=5)
+    assert loaded == []
+    assert len(chunker.chunk(_document())) > 1 and loaded == [1]
+
+
+@pytest.mark.chunking
+def test_chunk_stream_splits_one_document_at_a_time():
+    read = []
+
+    def _documents():
+        for i in range(3):
+            read.append(i)
+            yield _document(id=str(i))
+
+    stream = Chunker("token", chunk_size=20, overlap=5, tokenizer=RegexTokenizer()).chunk_stream(_documents())
+    first = next(stream)
+    assert first.metadata.parent_id == "0" and read == [0]
+    assert {chunk.metadata.parent_id for chunk in [first, *stream]} == {"0", "1", "2"}
+
+
+@pytest.mark.chunking
+def test_unchunked_documents_keep_their_content_hash():
+    document = _document(data="The platypus lays eggs.")
+    payload = json.dumps({"data": document.data, "metadata": {"title": "Platypus", "source_species": "mammal",
+                                                              "data_source": "test"}}, sort_keys=True)
+    assert content_hash(document) == hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@pytest.mark.chunking
+def test_collapse_keeps_the_best_chunk_of_each_parent():
+    chunks = Chunker("token", chunk_size=20, overlap=5, tokenizer=RegexTokenizer()).chunk(_document())
+    whole = _document(id="other", data="Short.")
+    ranked = [chunks[2], whole, chunks[0], chunks[1]]
+    for rank, document in zip((0.9, 0.8, 0.7, 0.6), ranked):
+        document.rank = rank
+
+    collapsed = collapse_chunks(ranked)
+    assert [(doc.id, doc.rank) for doc in collapsed] == [("doc", 0.9), ("other", 0.8)]
+    assert collapsed[0].data == chunks[2].data and collapsed[0].metadata.chunk_index == 2
+    assert chunks[2].id == f"doc{CHUNK_ID_SEPARATOR}2"
+
+
+@pytest.mark.chunking
+def test_ingestion_stores_chunks_and_removes_stale_ones(tmp_path):
+    path = tmp_path / "seed.jsonl"
+    path.write_text(_document(id="long").model_dump_json() + "\n"
+                    + _document(id="short", data="Tiny.").model_dump_json() + "\n")
+    store = FakeVectorStore()
+    chunker = Chunker("sentence", chunk_size=25, overlap=5, tokenizer=RegexTokenizer())
+
+    stats = IngestionPipeline(store, batch_size=1, chunker=chunker).run(path)
+    chunk_ids = {id for id in store.documents if id.startswith(f"long{CHUNK_ID_SEPARATOR}")}
+    assert stats.chunked == 1 and stats.added == len(chunk_ids) + 1
+    assert set(store.documents) == chunk_ids | {"short"}
+
+    path.write_text(_document(id="long", data=" ".join(SENTENCES)).model_dump_json() + "\n")
+    stats = IngestionPipeline(store, batch_size=1, chunker=chunker).run(path)
+    expected = {chunk.id for chunk in chunker.chunk(_document(id="long", data=" ".join(SENTENCES)))}
+    assert set(store.documents) == expected
+    assert stats.removed == len(chunk_ids - expected) + 1
+
+
+@pytest.mark.chunking
+def test_upserting_a_shorter_version_deletes_its_stale_chunks(create_retriever):
+    chunker = Chunker("sentence", chunk_size=25, overlap=5, tokenizer=RegexTokenizer())
+    store = VectorStore(embedder=create_retriever.embedder, persist_path=None, backend="numpy", chunker=chunker)
+    store.upsert_documents([_document(data="The platypus lays eggs.")])
+    assert list(store.stored_ids()) == ["doc"]
+
+    store.upsert_documents([_document()])
+    long_ids = set(store.stored_ids())
+    assert "doc" not in long_ids and len(long_ids) > 2
+
+    store.upsert_documents([_document(data=" ".join(SENTENCES))])
+    assert set(store.stored_ids()) < long_ids
+    assert store.query("venomous spurs", n_results=1, mode="lexical")[0].metadata.parent_id == "doc"
+
+
+@pytest.mark.chunking
+def test_retriever_collapses_chunk_hits_to_parents(create_retriever, monkeypatch):
+    chunker = Chunker("sentence", chunk_size=25, overlap=5, tokenizer=RegexTokenizer())
+    store = VectorStore(embedder=create_retriever.embedder, persist_path=None, backend="numpy", chunker=chunker)
+    store.add_documents([_document(), _document(id="other", data="Owls hunt mice at night.")])
+    monkeypatch.setattr(create_retriever, "vector_store", store)
+    monkeypatch.setattr(create_retriever, "rerank_cache", RerankScoreCache())
+    # Keep every chunk hit, so the collapse rather than de-duplication merges them
+    monkeypatch.setattr(create_retriever, "de_duplicate_documents", lambda documents: documents)
+
+    documents = create_retriever.retrieve("Do platypuses lay eggs?", n_results=10, threshold=-1)
+    assert sorted(doc.id for doc in documents) == ["doc", "other"]
+    batch = create_retriever.retrieve_batch(["Do platypuses lay eggs?"], n_results=10, threshold=-1)
+    assert [doc.id for doc in batch[0]] == [doc.id for doc in documents]
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from rag.completion_cache import InMemoryCompletionCache, SQLiteCompletionCache, completion_key
+from rag.generator import Generator
+from rag.judge import Judge, JudgeResult
+from rag.llm import AsyncOpenAI_LLM, OpenAI_LLM, reset_connectivity_checks
+from schema.generator_config import GeneratorConfig
+from tests.utilities.documents import PLATYPUS
+
+
+@pytest.mark.completion_cache
+def test_key_depends_on_every_setting():
+    base = completion_key("prompt", "gpt-4o-mini", 0.0, "1")
+    assert base == completion_key("prompt", "gpt-4o-mini", 0.0, "1")
+    assert len({base,
+                completion_key("other prompt", "gpt-4o-mini", 0.0, "1"),
+                completion_key("prompt", "gpt-4o", 0.0, "1"),
+                completion_key("prompt", "gpt-4o-mini", 0.7, "1"),
+                completion_key("prompt", "gpt-4o-mini", 0.0, "2")}) == 5
+
+
+@pytest.mark.completion_cache
+def test_sqlite_cache_persists_and_expires(tmp_path):
+    path = tmp_path / "completions.sqlite"
+    SQLiteCompletionCache(path).put("key", "value")
+    cache = SQLiteCompletionCache(path, ttl_seconds=60)
+    assert cache.get("key") == "value"
+    assert cache.get("missing") is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+    cache.ttl_seconds = 0.01
+    time.sleep(0.02)
+    assert cache.get("key") is None
+    assert cache.stats.expirations == 1
+
+
+@pytest.mark.completion_cache
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    cache = SQLiteCompletionCache(tmp_path / "completions.sqlite", max_size=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+
+    reopened = SQLiteCompletionCache(tmp_path / "completions.sqlite", max_size=1)
+    reopened.put("d", "4")
+    assert len(reopened) == 1 and reopened.get("d") == "4"
+
+
+@pytest.mark.completion_cache
+def test_repeated_generation_hits_cache(fake_openai):
+    cache = InMemoryCompletionCache()
+    llm = OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url, cache=cache)
+    generator = Generator(GeneratorConfig(mode="strict"), llm=llm)
+    for _ in range(3):
+        assert generator.generate("Do platypuses lay eggs?", [PLATYPUS]) == "True"
+    assert fake_openai.count("/v1/chat/completions") == 1
+    assert fake_openai.requests[-1][2]["temperature"] == 0.0
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+    # Another temperature is another completion
+    Generator(GeneratorConfig(mode="strict", temperature=0.5), llm=llm).generate("Do platypuses lay eggs?", [PLATYPUS])
+    assert fake_openai.count("/v1/chat/completions") == 2
+
+
+@pytest.mark.completion_cache
+def test_second_run_makes_no_requests(fake_openai, tmp_path):
+    def _run():
+        llm = AsyncOpenAI_LLM(api_key="sk-test", base_url=fake_openai.url,
+                              cache=SQLiteCompletionCache(tmp_path / "completions.sqlite"))
+        judge = Judge(llm=llm)
+        answer = Generator(GeneratorConfig(mode="loose"), llm=llm).generate("Do platypuses lay eggs?", [PLATYPUS])
+        assert asyncio.run(Generator(GeneratorConfig(mode="loose"), llm=llm)
+                           .agenerate("Do platypuses lay eggs?", [PLATYPUS])) == answer
+        return judge.judge(answer, [PLATYPUS])
+
+    assert _run() == JudgeResult.TRUE
+    requests = len(fake_openai.requests)
+    reset_connectivity_checks()
+    assert _run() == JudgeResult.TRUE
+    assert len(fake_openai.requests) == requests
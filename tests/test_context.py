@@ -0,0 +1,93 @@
+import pytest
+
+from rag.context import pack_documents
+from rag.generator import Generator
+import rag.tokenizer as tokenizer_module
+from rag.tokenizer import RegexTokenizer, get_tokenizer
+from schema.document import Document, MetaData
+from schema.generator_config import GeneratorConfig
+
+TOKENIZER = RegexTokenizer()
+
+
+class _EchoLLM:
+    def generate_response(self, prompt, model_name, **options):
+        return prompt
+
+
+def _document(id, words, rank):
+    return Document(id=id, metadata=MetaData(title=id, source_species="mammal", data_source="test"),
+                    data=" ".join(f"w{id}{i}" for i in range(words)), rank=rank)
+
+
+@pytest.mark.context_packing
+def test_packs_by_rank_and_truncates_the_first_document_that_does_not_fit():
+    documents = [_document("low", 10, 0.2), _document("top", 50, 0.9), _document("mid", 80, 0.5)]
+    packed = pack_documents(documents, budget=100, tokenizer=TOKENIZER, min_truncated_tokens=20)
+
+    assert [doc.id for doc in packed.documents] == ["top", "mid"]
+    assert packed.truncated == ["mid"]
+    assert packed.dropped == ["low"]
+    assert packed.tokens == TOKENIZER.count(packed.text) == 100
+    assert documents[2].data.startswith(packed.documents[1].data)
+    assert len(documents[2].data) > len(packed.documents[1].data)
+
+
+@pytest.mark.context_packing
+def test_skips_documents_too_big_to_truncate_usefully():
+    documents = [_document("top", 50, 0.9), _document("big", 500, 0.8), _document("mid", 30, 0.5),
+                 _document("low", 10, 0.2)]
+    packed = pack_documents(documents, budget=100, tokenizer=TOKENIZER, min_truncated_tokens=60)
+
+    assert [doc.id for doc in packed.documents] == ["top", "mid", "low"]
+    assert packed.dropped == ["big"]
+    assert not packed.truncated
+    assert packed.tokens == 90
+
+
+@pytest.mark.context_packing
+def test_unlimited_budget_keeps_everything():
+    documents = [_document(str(i), 200, 0.1 * i) for i in range(5)]
+    packed = pack_documents(documents, budget=None, tokenizer=TOKENIZER)
+    assert packed.documents == documents and not packed.truncated and not packed.dropped
+
+
+@pytest.mark.context_packing
+def test_default_config_places_every_document_in_the_prompt():
+    generator = Generator(GeneratorConfig(mode="loose"), llm=_EchoLLM())
+    documents = [_document(str(i), 2000, 0.1 * i) for i in range(5)]
+    prompt = generator.generate("Which words?", documents)
+    assert "\n".join(doc.data for doc in documents) in prompt
+    assert generator.last_context.budget is None and not generator.last_context.dropped
+
+
+@pytest.mark.context_packing
+def test_generator_prompt_respects_budget():
+    generator = Generator(GeneratorConfig(mode="loose", context_token_budget=75), llm=_EchoLLM())
+    documents = [_document(str(i), 40, 1.0 - 0.1 * i) for i in range(10)]
+    prompt = generator.generate("Which words?", documents)
+
+    assert prompt == generator.last_prompt
+    assert [doc.id for doc in generator.last_context.documents] == ["0", "1"]
+    assert generator.last_context.truncated == ["1"]
+    assert generator.last_context.dropped == [str(i) for i in range(2, 10)]
+    assert documents[2].data not in prompt and documents[1].data not in prompt
+
+
+@pytest.mark.context_packing
+def test_tokenizer_falls_back_to_regex_when_the_encoding_cannot_be_loaded(monkeypatch):
+    class _OfflineTiktoken:
+        @staticmethod
+        def encoding_for_model(model_name):
+            raise ConnectionError("offline")
+
+        get_encoding = encoding_for_model
+
+    monkeypatch.setattr(tokenizer_module, "tiktoken", _OfflineTiktoken())
+    get_tokenizer.cache_clear()
+    try:
+        assert isinstance(get_tokenizer("gpt-4o-mini"), RegexTokenizer)
+        generator = Generator(GeneratorConfig(mode="loose", context_token_budget=75), llm=_EchoLLM())
+        assert generator.generate("Which words?", [_document("0", 40, 1.0)])
+    finally:
+        get_tokenizer.cache_clear()
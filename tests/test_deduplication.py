@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from benchmarks._data import legacy_deduplicate, synthetic_embeddings
+from rag.deduplication import de_duplicate, greedy_deduplicate, simhash_deduplicate
+from rag.vectorstore import VectorStore
+from schema.document import Document, MetaData
+
+
+class _LetterEmbedder:
+    """Embedder stand-in that counts the letters a to z in each text"""
+    model_name = "letters"
+
+    def embed_batch_array(self, texts):
+        return np.array([[text.lower().count(chr(ord("a") + i)) + 0.1 for i in range(26)] for text in texts],
+                        dtype=np.float32)
+
+    def embed_queries_array(self, queries):
+        return self.embed_batch_array(queries)
+
+
+def _document(id, data):
+    return Document(id=id, data=data, metadata=MetaData(title=data, source_species="mammal", data_source="test"))
+
+
+@pytest.mark.de_duplication
+@pytest.mark.parametrize("n,block_size", [(1, 256), (50, 256), (300, 256), (300, 7)])
+def test_exact_engine_matches_original_loop(n, block_size):
+    embeddings = synthetic_embeddings(n, dimensions=32, seed=n)
+    assert greedy_deduplicate(embeddings, 0.95, block_size=block_size) == legacy_deduplicate(embeddings, 0.95)
+
+
+@pytest.mark.de_duplication
+def test_exact_engine_keeps_first_of_each_duplicate_group():
+    embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.01], [0.0, 0.0], [0.01, 1.0]])
+    assert greedy_deduplicate(embeddings, 0.95) == [0, 1, 3]
+
+
+@pytest.mark.de_duplication
+def test_simhash_engine_finds_planted_duplicates():
+    embeddings = synthetic_embeddings(2000, dimensions=64)
+    exact = greedy_deduplicate(embeddings, 0.95)
+    approximate = simhash_deduplicate(embeddings, 0.95)
+    assert approximate == exact
+
+
+@pytest.mark.de_duplication
+def test_de_duplicate_handles_empty_input():
+    assert de_duplicate([], 0.95) == []
+    with pytest.raises(ValueError):
+        de_duplicate([[1.0, 0.0]], 0.95, method="unknown")
+
+
+@pytest.mark.de_duplication
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_query_attaches_stored_embeddings_and_distances(backend, tmp_path):
+    embedder = _LetterEmbedder()
+    # A persisted chroma index gets a client of its own, apart from the in-memory one other tests share
+    store = VectorStore(embedder=embedder, persist_path=tmp_path if backend == "chroma" else None, backend=backend)
+    texts = ["Platypus lay eggs", "Penguins dive for fish", "Owls hunt mice"]
+    store.add_documents([_document(str(i), text) for i, text in enumerate(texts)])
+
+    documents = store.query("Platypus eggs", n_results=3, include_embeddings=True)
+    assert len(documents) == 3
+    for document in documents:
+        np.testing.assert_allclose(document.embedding, embedder.embed_batch_array([document.data])[0], rtol=1e-5)
+    distances = [document.distance for document in documents]
+    assert None not in distances and distances == sorted(distances)
+    assert all(document.embedding is None for document in store.query("Platypus eggs", n_results=3))
+
+
+@pytest.mark.de_duplication
+def test_de_duplication_reuses_attached_embeddings(fake_retriever, monkeypatch):
+    retriever = fake_retriever(document_ranker=object())
+    monkeypatch.setattr(retriever.embedder, "embed_batch_array",
+                        lambda texts: pytest.fail("documents were embedded again"))
+    documents = [_document("0", "Platypus"), _document("1", "Platypus!"), _document("2", "Penguin")]
+    for document, embedding in zip(documents, ([1.0, 0.0], [1.0, 0.01], [0.0, 1.0])):
+        document.embedding = np.array(embedding)
+
+    assert [document.id for document in retriever.de_duplicate_documents(documents)] == ["0", "2"]
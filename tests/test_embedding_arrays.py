@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from rag.embedding import QUERY_EMBEDDING_CACHE, ChromaEmbedder, Embedder
+from rag.model_registry import MODEL_REGISTRY
+
+TEXTS = ["Platypus are mammals that lay eggs.", "Penguins are flightless birds.", "Bats can fly."]
+
+
+@pytest.mark.embedding_arrays
+def test_embed_batch_array_matches_list_embeddings(create_retriever):
+    embedder = create_retriever.embedder
+    embeddings = embedder.embed_batch_array(TEXTS)
+
+    assert embeddings.dtype == np.float32
+    assert embeddings.flags["C_CONTIGUOUS"]
+    assert embeddings.shape[0] == len(TEXTS)
+    np.testing.assert_allclose(embeddings, np.array(embedder.embed_batch(TEXTS)), rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(embedder.embed_array(TEXTS[0]), embeddings[0], rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(np.stack(ChromaEmbedder(embedder)(TEXTS)), embeddings, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.embedding_arrays
+def test_normalized_embeddings_have_unit_length(create_retriever):
+    embeddings = create_retriever.embedder.embed_batch_array(TEXTS, normalize=True)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-5)
+
+
+@pytest.mark.embedding_arrays
+def test_cached_query_embeddings_are_read_only_arrays(create_retriever):
+    embedder = create_retriever.embedder
+    first = embedder.embed_queries_array(["Do bats   fly?", "Do penguins fly?"])
+    second = embedder.embed_queries_array(["Do bats fly?"])
+
+    assert first.shape[0] == 2
+    np.testing.assert_array_equal(second[0], first[0])
+    assert embedder.embed_queries(["Do bats fly?"]) == [second[0].tolist()]
+    cached = QUERY_EMBEDDING_CACHE.get(embedder.query_cache_key("Do bats fly?"))
+    with pytest.raises(ValueError):
+        cached[0] = 0.0
+
+@pytest.mark.embedding_arrays
+def test_retrieved_documents_carry_array_embeddings(create_retriever):
+    documents = create_retriever.vector_store.query("Do platypuses lay eggs?", n_results=3, include_embeddings=True)
+    assert all(isinstance(doc.embedding, np.ndarray) for doc in documents)
+    assert "embedding" not in documents[0].model_dump()
+
+
+@pytest.mark.embedding_arrays
+def test_cached_query_embeddings_do_not_keep_their_batch_alive(monkeypatch):
+    class _FakeModel:
+        def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False):
+            return np.arange(len(texts) * 4, dtype=np.float32).reshape(len(texts), 4)
+
+    monkeypatch.setattr(MODEL_REGISTRY, "sentence_transformer", lambda *args: _FakeModel())
+    embedder = Embedder("batch-copy-test")
+    queries = ["Do bats fly?", "Do owls hunt?"]
+    embeddings = embedder.embed_queries_array(queries)
+
+    for query, embedding in zip(queries, embeddings):
+        cached = QUERY_EMBEDDING_CACHE.get(embedder.query_cache_key(query))
+        np.testing.assert_array_equal(cached, embedding)
+        assert cached.base is None and not cached.flags.writeable
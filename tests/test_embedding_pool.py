@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from rag.embedding import Embedder
+from rag.model_registry import KIND_EMBEDDING_POOL, MODEL_REGISTRY
+from rag.vectorstore import VectorStore
+from schema.document import Document, MetaData
+
+TEXTS = [f"Animal number {i} is a {['mammal', 'bird', 'reptile'][i % 3]} that lives near water." for i in range(24)]
+
+
+@pytest.fixture
+def pooled_embedder(create_retriever):
+    yield Embedder(create_retriever.embedder.model_name, pool_workers=2, pool_threshold=8, pool_chunk_size=5)
+    MODEL_REGISTRY.stop_pools()
+
+
+@pytest.mark.embedding_pool
+def test_only_large_batches_use_the_pool(create_retriever):
+    embedder = Embedder(create_retriever.embedder.model_name, pool_workers=4, pool_threshold=10)
+    assert not embedder.uses_pool(TEXTS[:9])
+    assert embedder.uses_pool(TEXTS[:10])
+    assert not embedder.uses_pool(TEXTS[0])
+    assert not Embedder(create_retriever.embedder.model_name, pool_workers=1, pool_threshold=1).uses_pool(TEXTS)
+
+
+@pytest.mark.embedding_pool
+def test_pool_returns_embeddings_in_input_order(create_retriever, pooled_embedder):
+    expected = create_retriever.embedder.embed_batch_array(TEXTS)
+    embeddings = pooled_embedder.embed_batch_array(TEXTS)
+
+    assert embeddings.dtype == np.float32
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-4, atol=1e-5)
+    assert any(stats.kind == KIND_EMBEDDING_POOL for stats in MODEL_REGISTRY.report())
+
+
+@pytest.mark.embedding_pool
+def test_vector_store_writes_use_the_pool(create_retriever, pooled_embedder):
+    store = VectorStore(embedder=pooled_embedder, persist_path=None, backend="numpy")
+    store.add_documents([Document(id=str(i), data=text, metadata=MetaData(title=str(i), source_species="mammal",
+                                                                          data_source="test"))
+                         for i, text in enumerate(TEXTS)])
+
+    assert store.collection.count() == len(TEXTS)
+    stored = store.collection.get(ids=["7"], include=["embeddings"])["embeddings"][0]
+    np.testing.assert_allclose(stored, create_retriever.embedder.embed_array(TEXTS[7]), rtol=1e-4, atol=1e-5)
+    assert any(stats.kind == KIND_EMBEDDING_POOL for stats in MODEL_REGISTRY.report())
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from rag.lexical_index import BM25Index
+from rag.vector_index import MetadataIndex, NumpyIndex, compile_where
+from rag.vectorstore import VectorStore
+
+SPECIES = ["avian", "mammal", "reptile", "fish"]
+FILTERS = [
+    {"species": "avian"},
+    {"species": {"$ne": "avian"}},
+    {"species": {"$in": ["mammal", "fish"]}},
+    {"species": {"$nin": ["mammal", "fish"]}},
+    {"year": {"$gte": 2010}},
+    {"year": {"$lt": 2005}},
+    {"year": None},
+    {"$and": [{"species": "reptile"}, {"year": {"$gt": 2000}}]},
+    {"$or": [{"species": "fish"}, {"title": "Doc 3"}]},
+    {"species": "avian", "year": {"$lte": 2015}},
+    {"title": {"$ne": "Doc 7"}},
+]
+
+
+def _metadata(i: int) -> dict:
+    metadata = {"species": SPECIES[i % len(SPECIES)], "title": f"Doc {i}"}
+    if i % 3:
+        metadata["year"] = 1995 + i % 25
+    return metadata
+
+
+@pytest.mark.filtered_retrieval
+@pytest.mark.parametrize("where", FILTERS)
+def test_metadata_index_matches_compile_where(where):
+    metadatas = [_metadata(i) for i in range(200)] + [None]
+    index = MetadataIndex()
+    index.add(0, metadatas[:120])
+    index.add(120, metadatas[120:])
+
+    expected = np.array([compile_where(where)(metadata) for metadata in metadatas])
+    np.testing.assert_array_equal(index.mask(where, len(metadatas)), expected)
+
+
+@pytest.mark.filtered_retrieval
+def test_metadata_index_rejects_unsupported_operators():
+    index = MetadataIndex()
+    index.add(0, [_metadata(0)])
+    with pytest.raises(ValueError):
+        index.mask({"year": {"$regex": "20.*"}}, 1)
+
+
+@pytest.mark.filtered_retrieval
+@pytest.mark.parametrize("mode", ["exact", "ivf", "hnsw"])
+def test_filtered_query_only_scores_matching_rows(mode, monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((400, 16)).astype(np.float32)
+    index = NumpyIndex(mode=mode, exact_search_limit=1000)
+    index.add([str(i) for i in range(400)], vectors, [_metadata(i) for i in range(400)])
+    index.delete(["0", "4"])
+    index.upsert(["8"], vectors[8:9], [{"species": "fish", "title": "Doc 8"}])
+    scored = []
+    distances = NumpyIndex._distances
+
+    def spy(self, queries, rows=None):
+        scored.append(rows)
+        return distances(self, queries, rows)
+
+    monkeypatch.setattr(NumpyIndex, "_distances", spy)
+    results = index.query(vectors[:2], n_results=5, where={"species": "avian"}, include=["metadatas"])
+
+    matching = [row for row in range(index._size) if index._alive[row]
+                and index._metadatas[row]["species"] == "avian"]
+    assert [list(rows) for rows in scored] == [matching]
+    assert all(len(ids) == 5 for ids in results['ids'])
+    assert all(metadata["species"] == "avian" for metadatas in results['metadatas'] for metadata in metadatas)
+    assert not {"0", "4", "8"} & set(results['ids'][0] + results['ids'][1])
+
+
+@pytest.mark.filtered_retrieval
+def test_filtered_get_and_delete_survive_compaction():
+    index = NumpyIndex()
+    index.add([str(i) for i in range(20)], np.eye(20, dtype=np.float32), [_metadata(i) for i in range(20)])
+    index.delete(where={"species": "mammal"})
+    index.delete(["0", "2", "3"])  # past the compaction threshold, so rows are renumbered
+    assert index.count() == 12
+    assert index.get(where={"species": "avian"})['ids'] == ["4", "8", "12", "16"]
+    assert index.get(ids=["6", "7", "8"], where={"species": {"$ne": "reptile"}})['ids'] == ["7", "8"]
+
+
+@pytest.mark.filtered_retrieval
+def test_bm25_where_filters_before_scoring():
+    index = BM25Index()
+    texts = ["Crocodiles lay eggs.", "Platypus lay eggs.", "Penguins lay eggs.", "Horses do not lay eggs."]
+    metadatas = [{"species": "reptile"}, {"species": "mammal"}, {"species": "avian"}, {"species": "mammal"}]
+    index.add(["croc", "platypus", "penguin", "horse"], texts, metadatas)
+
+    assert [id for id, _ in index.query("lay eggs", 10, where={"species": "mammal"})] == ["platypus", "horse"]
+    assert index.query("crocodiles", 10, where={"species": "avian"}) == []
+    unfiltered = dict(index.query("lay eggs", 10))
+    assert dict(index.query("lay eggs", 10, where={"species": "mammal"}))["horse"] == unfiltered["horse"]
+
+    index.upsert(["croc"], ["Crocodiles lay eggs."], [{"species": "avian"}])
+    index.delete(["penguin", "platypus"])  # triggers compaction on the next query
+    assert [id for id, _ in index.query("lay eggs", 10, where={"species": "avian"})] == ["croc"]
+    assert [id for id, _ in index.query("lay eggs", 10, where={"species": "mammal"})] == ["horse"]
+
+
+@pytest.mark.filtered_retrieval
+@pytest.mark.parametrize("mode", ["dense", "lexical", "hybrid"])
+def test_vector_store_where_returns_only_matching_documents(create_retriever, mode):
+    store = VectorStore(embedder=create_retriever.embedder, persist_path=None, backend="numpy")
+    store.seed_documents()
+    documents = store.query("How many bird species do you know about?", n_results=10, mode=mode,
+                            where={"source_species": "avian"})
+    assert documents and all(doc.metadata.source_species == "avian" for doc in documents)
+
+
+@pytest.mark.filtered_retrieval
+def test_retriever_where_reranks_only_matching_documents(create_retriever):
+    documents = create_retriever.retrieve("How many bird species do you know about?", n_results=10, threshold=-1,
+                                          where={"source_species": "avian"})
+    assert 0 < len(documents) <= 5  # the test data has five avian documents
+    assert all(doc.metadata.source_species == "avian" for doc in documents)
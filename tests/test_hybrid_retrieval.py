@@ -0,0 +1,74 @@
+import pytest
+
+from rag.lexical_index import BM25Index, analyze, reciprocal_rank_fusion
+from rag.vectorstore import VectorStore
+
+DOCUMENTS = {
+    "croc": "Crocodiles are reptiles that lay eggs in nests near water.",
+    "platypus": "Platypus are mammals that lay eggs.  They are very strange mammals.",
+    "horse": "A horse is a mammal.  Mammals have fur or hair and give birth to live young.",
+    "bat": "Bats are the only mammals capable of sustained flight.",
+}
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add(list(DOCUMENTS), list(DOCUMENTS.values()))
+    return index
+
+
+@pytest.mark.hybrid_retrieval
+def test_analyze_drops_stop_words_and_folds_plurals():
+    assert analyze("Do platypuses lay eggs?") == ["platypus", "lay", "egg"]
+    assert analyze("Tell me about the crocodiles and bats") == ["tell", "crocodile", "bat"]
+
+
+@pytest.mark.hybrid_retrieval
+def test_bm25_ranks_exact_terms_first(index):
+    assert [id for id, _ in index.query("Tell me about crocodiles")] == ["croc"]
+    ranked = index.query("mammals that lay eggs", n_results=2)
+    assert [id for id, _ in ranked] == ["platypus", "croc"]
+    assert ranked[0][1] > ranked[1][1] > 0
+    assert index.query("the and of") == []
+
+
+@pytest.mark.hybrid_retrieval
+def test_bm25_follows_vector_index_id_semantics(index):
+    index.add(["croc"], ["Bats bats bats"])  # existing ids are skipped
+    assert [id for id, _ in index.query("crocodile")] == ["croc"]
+    index.upsert(["croc"], ["Bats bats bats"])
+    assert index.query("crocodile") == []
+    assert index.query("bats")[0][0] == "croc"
+    index.delete(["croc", "horse", "missing"])
+    assert index.count() == 2
+    assert [id for id, _ in index.query("bats flight fur")] == ["bat"]
+
+
+@pytest.mark.hybrid_retrieval
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+    assert [id for id, _ in fused] == ["c", "a", "b", "d"]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+
+
+@pytest.mark.hybrid_retrieval
+def test_hybrid_query_adds_lexical_candidates(create_retriever):
+    store = VectorStore(embedder=create_retriever.embedder, persist_path=None, backend="numpy")
+    store.seed_documents()
+    lexical = store.query("Tell me about crocodiles", n_results=3, mode="lexical")
+    hybrid = store.query("Tell me about crocodiles", n_results=3, include_embeddings=True, mode="hybrid")
+
+    assert lexical[0].metadata.title == "Crocodile"
+    assert "Crocodile" in [doc.metadata.title for doc in hybrid]
+    assert len(hybrid) == 3 and all(doc.embedding is not None for doc in hybrid)
+    store.delete_documents([lexical[0].id])
+    assert store.query("crocodiles", n_results=3, mode="lexical") == []
+    with pytest.raises(ValueError):
+        store.query("crocodiles", mode="sparse")
+
+
+@pytest.mark.hybrid_retrieval
+def test_retriever_accepts_hybrid_mode(create_retriever):
+    documents = create_retriever.retrieve("Tell me about crocodiles", n_results=3, mode="hybrid")
+    assert documents[0].metadata.source_species == "reptile"
@@ -0,0 +1,109 @@
+import importlib.util
+
+import numpy as np
+import pytest
+from sentence_transformers import CrossEncoder
+
+from rag import inference_backend
+from rag.embedding import Embedder
+from rag.inference_backend import (QUANTIZATIONS, Parity, compare_outputs, onnx_model_dir, resolve_quantization,
+                                   session_options, variant_name)
+from rag.model_registry import MODEL_REGISTRY, ModelRegistry
+
+# The ONNX backend is optional, see rag/inference_backend.py
+requires_optimum = pytest.mark.skipif(importlib.util.find_spec("optimum") is None, reason="optimum is not installed")
+
+TEXTS = ["Platypuses lay eggs.", "Crocodiles are reptiles that live in rivers.", "Penguins cannot fly."]
+
+
+@pytest.mark.inference_backend
+def test_resolve_quantization():
+    assert resolve_quantization(None) is None
+    assert resolve_quantization("avx2") == "avx2"
+    assert resolve_quantization("int8") in QUANTIZATIONS
+    with pytest.raises(ValueError):
+        resolve_quantization("int4")
+
+
+@pytest.mark.inference_backend
+def test_variant_name():
+    assert variant_name("torch", "avx2", 4) == "torch"
+    assert variant_name("onnx") == "onnx"
+    assert variant_name("onnx", "avx2", 4) == "onnx qint8_avx2 4 threads"
+    with pytest.raises(ValueError):
+        variant_name("tensorrt")
+
+
+@pytest.mark.inference_backend
+def test_registry_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        ModelRegistry().sentence_transformer("all-MiniLM-L6-v2", backend="tensorrt")
+
+
+@pytest.mark.inference_backend
+def test_session_options_pin_intra_op_threads():
+    pytest.importorskip("onnxruntime")
+    options = session_options(3)
+    assert options.intra_op_num_threads == 3
+    assert options.inter_op_num_threads == 1
+
+
+@pytest.mark.inference_backend
+def test_onnx_model_dir_is_one_directory_per_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(inference_backend, "ONNX_MODEL_DIR", str(tmp_path))
+    directory = onnx_model_dir(CrossEncoder, "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    assert directory.parent == tmp_path / "CrossEncoder"
+    assert "/" not in directory.name
+
+
+@pytest.mark.inference_backend
+def test_compare_outputs():
+    reference = np.array([[1.0, 0.0], [0.0, 1.0]])
+    assert compare_outputs(reference, reference) == Parity(max_abs_diff=0.0, min_cosine=1.0)
+    parity = compare_outputs(reference, np.array([[1.0, 0.0], [1.0, 1.0]]))
+    assert parity.max_abs_diff == pytest.approx(1.0)
+    assert parity.min_cosine == pytest.approx(np.sqrt(0.5))
+    assert compare_outputs(np.array([0.2, 0.8]), np.array([0.25, 0.8])).max_abs_diff == pytest.approx(0.05)
+    with pytest.raises(ValueError):
+        compare_outputs(reference, reference[:1])
+
+
+@pytest.mark.inference_backend
+@requires_optimum
+@pytest.mark.parametrize("quantization,min_cosine", [(None, 0.999), ("int8", 0.98)])
+def test_onnx_embeddings_match_torch(create_retriever, quantization, min_cosine):
+    reference = create_retriever.embedder.embed_batch_array(TEXTS)
+    onnx = Embedder(create_retriever.embedder.model_name, backend="onnx", quantization=quantization)
+    assert compare_outputs(reference, onnx.embed_batch_array(TEXTS)).min_cosine > min_cosine
+
+
+@pytest.mark.inference_backend
+@requires_optimum
+@pytest.mark.parametrize("quantization,max_abs_diff", [(None, 1e-3), ("int8", 0.05)])
+def test_onnx_cross_encoder_matches_torch(create_retriever, quantization, max_abs_diff):
+    pairs = [("Do platypuses lay eggs?", text) for text in TEXTS]
+    reference = create_retriever.document_ranker.predict(pairs)
+    onnx = MODEL_REGISTRY.cross_encoder(create_retriever.ranker_model_name, backend="onnx", quantization=quantization)
+    assert compare_outputs(reference, onnx.predict(pairs)).max_abs_diff < max_abs_diff
+
+
+@pytest.mark.inference_backend
+def test_query_embedding_cache_keeps_backends_apart(monkeypatch):
+    class _FakeModel:
+        def __init__(self, value):
+            self.value = value
+
+        def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False):
+            return np.full((len(texts), 4), self.value, dtype=np.float32)
+
+    values = {("torch", None): 1.0, ("onnx", None): 2.0, ("onnx", "int8"): 3.0}
+    monkeypatch.setattr(MODEL_REGISTRY, "sentence_transformer",
+                        lambda model_name, device, backend, quantization, threads:
+                        _FakeModel(values[backend, quantization if backend == "onnx" else None]))
+    embedders = [Embedder("cache-key-test", backend="torch", quantization="int8"),
+                 Embedder("cache-key-test", backend="onnx"),
+                 Embedder("cache-key-test", backend="onnx", quantization="int8")]
+
+    for embedder, expected in zip(embedders, (1.0, 2.0, 3.0)):
+        assert embedder.embed_queries_array(["Do bats fly?"])[0, 0] == expected
+    assert Embedder("cache-key-test", backend="torch").embed_queries_array(["Do bats fly?"])[0, 0] == 1.0
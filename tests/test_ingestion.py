@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from rag.ingestion import IngestionPipeline
+from tests.utilities.documents import seed_record
+from tests.utilities.fake_vector_store import FakeVectorStore
+
+
+@pytest.fixture
+def seed_file(tmp_path):
+    path = tmp_path / "seed.jsonl"
+    lines = [seed_record(i) for i in range(10)]
+    lines.insert(3, "{not json")
+    lines.insert(7, '{"id": "missing fields"}')
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+@pytest.mark.ingestion
+def test_ingestion_skips_bad_lines_and_batches(seed_file):
+    store = FakeVectorStore()
+    stats = IngestionPipeline(store, batch_size=4).run(seed_file)
+    assert stats.lines == 12
+    assert stats.skipped == 2
+    assert stats.added == 10
+    assert sorted(store.documents, key=int) == [str(i) for i in range(10)]
+    assert store.embedder.batches == [3, 3, 4]
+
+
+@pytest.mark.ingestion
+def test_ingestion_only_embeds_changed_documents(seed_file, tmp_path):
+    store = FakeVectorStore()
+    IngestionPipeline(store, batch_size=4).run(seed_file)
+    changed = tmp_path / "changed.jsonl"
+    changed.write_text("\n".join([seed_record(0, "New text")] + [seed_record(i) for i in range(1, 9)]) + "\n")
+    stats = IngestionPipeline(store, batch_size=4).run(changed)
+    assert (stats.added, stats.updated, stats.unchanged, stats.removed) == (0, 1, 8, 1)
+    assert store.documents["0"].data == "New text"
+    assert "9" not in store.documents
+
+
+@pytest.mark.ingestion
+def test_ingestion_resumes_from_checkpoint(seed_file, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    store = FakeVectorStore(fail_on_batch=2)
+    with pytest.raises(RuntimeError):
+        IngestionPipeline(store, batch_size=4, checkpoint_path=checkpoint).run(seed_file)
+    assert json.loads(checkpoint.read_text())["line"] == 4
+
+    store.fail_on_batch = None
+    stats = IngestionPipeline(store, batch_size=4, checkpoint_path=checkpoint).run(seed_file)
+    assert stats.resumed_from_line == 4
+    assert len(store.documents) == 10
+    assert not checkpoint.exists()
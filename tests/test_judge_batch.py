@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from rag.judge import Judge, JudgeResult
+from rag.llm import OpenAI_LLM
+from tests.utilities.documents import PLATYPUS
+
+
+def _answer(body):
+    return body["messages"][0]["content"].rsplit("* ", 1)[-1]
+
+
+def _verdict(body):
+    supported = "eggs" in _answer(body)
+    if body.get("response_format", {}).get("type") == "json_object":
+        return json.dumps({"verdict": supported, "explanation": f"Checked: {_answer(body)}"})
+    return str(supported)
+
+
+VERDICT_SERVER = pytest.mark.parametrize("fake_openai", [{"reply": _verdict, "delay": 0.1}], indirect=True)
+
+
+def _items(count):
+    return [(f"Platypus lay eggs {i}" if i % 2 == 0 else f"Platypus fly {i}", [PLATYPUS]) for i in range(count)]
+
+
+@pytest.mark.judge_batch
+@VERDICT_SERVER
+def test_judge_batch_keeps_order_and_bounds_concurrency(fake_openai):
+    judge = Judge(llm=OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url))
+    verdicts = judge.judge_batch(_items(12), max_concurrency=4)
+
+    assert [verdict.index for verdict in verdicts] == list(range(12))
+    assert [verdict.result for verdict in verdicts] == [JudgeResult.TRUE, JudgeResult.FALSE] * 6
+    assert all(verdict.seconds >= 0.1 and verdict.explanation is None for verdict in verdicts)
+    assert 1 < fake_openai.max_in_flight <= 4
+    assert judge.last_prompt == ""
+
+
+@pytest.mark.judge_batch
+@VERDICT_SERVER
+def test_structured_judging_makes_one_call_per_item(fake_openai):
+    judge = Judge(llm=OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url))
+    verdicts = judge.judge_batch(_items(4), structured=True)
+
+    assert [verdict.result for verdict in verdicts] == [JudgeResult.TRUE, JudgeResult.FALSE] * 2
+    assert verdicts[1].explanation == "Checked: Platypus fly 1"
+    assert fake_openai.count("/v1/chat/completions") == 4
+
+
+@pytest.mark.judge_batch
+@VERDICT_SERVER
+def test_judge_iter_streams_verdicts_and_reports_failures(fake_openai):
+    fake_openai.enqueue(400, {"error": {"message": "bad request"}})
+    judge = Judge(llm=OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url))
+    verdicts = list(judge.judge_iter(_items(3), max_concurrency=1))
+
+    assert sorted(verdict.index for verdict in verdicts) == [0, 1, 2]
+    failed = [verdict for verdict in verdicts if verdict.error is not None]
+    assert len(failed) == 1 and failed[0].result is None
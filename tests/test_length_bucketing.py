@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from rag.embedding import Embedder
+from rag.length_bucketing import (encode_bucketed, fixed_batches, length_buckets, padding_efficiency,
+                                  predict_bucketed, token_lengths)
+
+LENGTHS = np.array([3, 40, 5, 38, 4, 20, 3, 39])
+
+
+class FakeTokenizer:
+    """Tokenizer stand-in with one token per word, plus two special tokens"""
+
+    def __call__(self, texts, text_pairs=None, truncation=False, max_length=None, **kwargs):
+        pairs = text_pairs if text_pairs is not None else [""] * len(texts)
+        ids = [[0] * (len(text.split()) + len(pair.split()) + 2) for text, pair in zip(texts, pairs)]
+        return {"input_ids": [row[:max_length] if truncation else row for row in ids]}
+
+
+class FakeModel:
+    """SentenceTransformer and CrossEncoder stand-in that records its batch sizes"""
+    tokenizer = FakeTokenizer()
+    max_seq_length = 16
+    max_length = 16
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.batch_sizes.append(batch_size)
+        return np.array([[len(text.split()), 1.0] for text in texts], dtype=np.float32)
+
+    def predict(self, pairs, batch_size=32):
+        self.batch_sizes.append(batch_size)
+        return np.array([len(text.split()) for _, text in pairs], dtype=np.float32)
+
+
+def _texts(lengths) -> list[str]:
+    return [" ".join(["word"] * length) for length in lengths]
+
+
+@pytest.mark.length_bucketing
+def test_token_lengths_truncate_like_the_model():
+    assert token_lengths(FakeTokenizer(), _texts([1, 30]), max_length=16).tolist() == [3, 16]
+    assert token_lengths(FakeTokenizer(), ["a b"], text_pairs=["c d e"]).tolist() == [7]
+
+
+@pytest.mark.length_bucketing
+def test_length_buckets_cover_every_input_once_within_the_budget():
+    buckets = length_buckets(LENGTHS, max_tokens=80)
+    assert sorted(np.concatenate(buckets).tolist()) == list(range(len(LENGTHS)))
+    for bucket in buckets:
+        assert len(bucket) == 1 or len(bucket) * LENGTHS[bucket].max() <= 80
+    assert [LENGTHS[bucket].tolist() for bucket in buckets] == [[40, 39], [38, 20], [5, 4, 3, 3]]
+
+
+@pytest.mark.length_bucketing
+def test_length_buckets_split_when_lengths_halve():
+    buckets = length_buckets(LENGTHS, max_tokens=10_000)
+    assert [LENGTHS[bucket].tolist() for bucket in buckets] == [[40, 39, 38, 20], [5, 4, 3, 3]]
+    assert padding_efficiency(LENGTHS, buckets) > padding_efficiency(LENGTHS, fixed_batches(len(LENGTHS), 4))
+
+
+@pytest.mark.length_bucketing
+def test_length_buckets_respect_max_batch_size_and_oversized_inputs():
+    assert [len(bucket) for bucket in length_buckets(LENGTHS, max_tokens=10_000, max_batch_size=2)] == [2, 2, 2, 2]
+    assert [len(bucket) for bucket in length_buckets(np.array([50, 60]), max_tokens=10)] == [1, 1]
+    with pytest.raises(ValueError):
+        length_buckets(LENGTHS, max_tokens=0)
+
+
+@pytest.mark.length_bucketing
+def test_padding_efficiency():
+    assert padding_efficiency(np.array([2, 4]), [np.array([0, 1])]) == pytest.approx(0.75)
+    assert padding_efficiency(np.array([2, 4]), [np.array([0]), np.array([1])]) == 1.0
+    assert [batch.tolist() for batch in fixed_batches(5, 2)] == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.length_bucketing
+def test_encode_bucketed_restores_input_order():
+    model = FakeModel()
+    lengths = [1, 12, 2, 11, 1]
+    embeddings = encode_bucketed(model, _texts(lengths), max_tokens=32)
+    assert embeddings[:, 0].tolist() == lengths
+    assert model.batch_sizes == [2, 3]
+
+
+@pytest.mark.length_bucketing
+def test_predict_bucketed_restores_input_order():
+    model = FakeModel()
+    pairs = [("q", text) for text in _texts([1, 12, 2, 11, 1])]
+    assert predict_bucketed(model, pairs, max_tokens=32).tolist() == [1, 12, 2, 11, 1]
+    assert model.batch_sizes == [2, 3]
+    assert predict_bucketed(model, [], max_tokens=32).tolist() == []
+
+
+@pytest.mark.length_bucketing
+def test_bucketed_embeddings_match_plain_ones(create_retriever):
+    texts = ["Platypus.", "The platypus is a semiaquatic, egg-laying mammal endemic to eastern Australia, "
+             "including Tasmania. Together with the four species of echidna, it is one of the five extant "
+             "species of monotremes.", "Crocodiles.", "Penguins are a group of aquatic flightless birds."]
+    bucketed = Embedder(create_retriever.embedder.model_name, max_batch_tokens=64)
+    np.testing.assert_allclose(bucketed.embed_batch_array(texts), create_retriever.embedder.embed_batch_array(texts),
+                               atol=1e-5)
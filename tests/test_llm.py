@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from rag.llm import AsyncOpenAI_LLM, OpenAI_LLM
+
+
+@pytest.mark.llm
+def test_construction_makes_no_requests_and_shares_client(fake_openai):
+    llms = [OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url) for _ in range(5)]
+    assert fake_openai.requests == []
+    assert all(llm.client is llms[0].client for llm in llms)
+    assert OpenAI_LLM(api_key="sk-other", base_url=fake_openai.url).client is not llms[0].client
+
+
+@pytest.mark.llm
+def test_connectivity_is_checked_once_and_cached(fake_openai):
+    for _ in range(3):
+        assert OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url).generate_response("Hi", "gpt-4o-mini") == "True"
+    assert fake_openai.count("/v1/models") == 1
+    assert fake_openai.count("/v1/chat/completions") == 3
+
+
+@pytest.mark.llm
+def test_async_llm_shares_connectivity_check(fake_openai):
+    OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url).generate_response("Hi", "gpt-4o-mini")
+    llm = AsyncOpenAI_LLM(api_key="sk-test", base_url=fake_openai.url)
+    assert asyncio.run(llm.agenerate_response("Hi", "gpt-4o-mini")) == "True"
+    assert asyncio.run(llm.agenerate_response("Hi", "gpt-4o-mini")) == "True"
+    assert fake_openai.count("/v1/models") == 1
@@ -0,0 +1,179 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from rag.cache import RerankScoreCache
+from rag.micro_batching import MicroBatcher
+from schema.document import Document, MetaData
+
+
+class RecordingFunction:
+    """Batch function that doubles its items and records the batches it was called with"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        time.sleep(self.delay)
+        return [item * 2 for item in items]
+
+
+class FakeRanker:
+    """Cross-encoder stand-in that scores a document by its length, and counts its calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs):
+        self.calls.append(len(pairs))
+        return np.array([len(text) / 100 for _, text in pairs])
+
+
+def _concurrently(function, arguments: list) -> list:
+    barrier = threading.Barrier(len(arguments))
+
+    def _call(argument):
+        barrier.wait()
+        return function(argument)
+
+    with ThreadPoolExecutor(len(arguments)) as executor:
+        return list(executor.map(_call, arguments))
+
+
+@pytest.mark.micro_batching
+def test_concurrent_submissions_share_one_batch():
+    function = RecordingFunction()
+    batcher = MicroBatcher(function, max_batch_size=8, max_wait_ms=500)
+    results = _concurrently(lambda item: batcher.submit(item).result(), list(range(8)))
+    batcher.stop()
+    assert results == [item * 2 for item in range(8)]
+    assert len(function.batches) == 1
+    assert batcher.stats.batch_sizes == {8: 1}
+    assert batcher.stats.requests == 8
+
+
+@pytest.mark.micro_batching
+def test_batches_are_capped_at_max_batch_size():
+    function = RecordingFunction()
+    batcher = MicroBatcher(function, max_batch_size=4, max_wait_ms=50)
+    assert batcher.map(list(range(10))) == [item * 2 for item in range(10)]
+    batcher.stop()
+    assert [len(batch) for batch in function.batches] == [4, 4, 2]
+    assert batcher.stats.mean_batch_size == pytest.approx(10 / 3)
+
+
+@pytest.mark.micro_batching
+def test_a_lone_request_waits_at_most_max_wait():
+    batcher = MicroBatcher(RecordingFunction(), max_batch_size=64, max_wait_ms=20)
+    start = time.monotonic()
+    assert batcher.submit(3).result(timeout=5) == 6
+    batcher.stop()
+    assert time.monotonic() - start < 1.0
+    assert 0.015 <= batcher.stats.max_wait_seconds < 1.0
+
+
+@pytest.mark.micro_batching
+def test_requests_queued_during_a_batch_form_the_next_batch():
+    function = RecordingFunction(delay=0.2)
+    batcher = MicroBatcher(function, max_batch_size=16, max_wait_ms=0)
+    first = batcher.submit(0)
+    time.sleep(0.05)
+    rest = batcher.submit_many([1, 2, 3])
+    assert batcher.queue_depth == 3
+    assert batcher.stats.max_queue_depth == 3
+    assert [future.result() for future in [first] + rest] == [0, 2, 4, 6]
+    batcher.stop()
+    assert function.batches == [[0], [1, 2, 3]]
+
+
+@pytest.mark.micro_batching
+def test_batch_errors_reach_every_caller():
+    def _fail(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(_fail, max_batch_size=4, max_wait_ms=10)
+    futures = batcher.submit_many([1, 2])
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result()
+    assert batcher.map([]) == []
+    batcher.stop()
+    assert batcher.stats.failed_batches == 1
+
+
+@pytest.mark.micro_batching
+def test_wrong_number_of_results_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=4, max_wait_ms=50)
+    with pytest.raises(ValueError):
+        batcher.map([1, 2])
+    batcher.stop()
+
+
+@pytest.mark.micro_batching
+def test_stopped_batcher_restarts_on_submit():
+    batcher = MicroBatcher(RecordingFunction(), max_batch_size=4, max_wait_ms=0)
+    assert batcher.map([1]) == [2]
+    batcher.stop()
+    assert batcher.map([2]) == [4]
+    batcher.stop()
+    assert (batcher.stats.requests, batcher.stats.batches, batcher.stats.batch_sizes) == (2, 2, {1: 2})
+
+
+@pytest.mark.micro_batching
+def test_submission_during_stop_starts_a_new_worker():
+    function = RecordingFunction(delay=0.2)
+    batcher = MicroBatcher(function, max_batch_size=4, max_wait_ms=0)
+    first = batcher.submit(1)
+    time.sleep(0.05)
+    stopper = threading.Thread(target=batcher.stop)
+    stopper.start()
+    time.sleep(0.05)
+    # The old worker is still running its batch, with its stop sentinel queued behind it
+    second = batcher.submit(2)
+    stopper.join(timeout=5)
+    assert not stopper.is_alive()
+    assert (first.result(timeout=5), second.result(timeout=5)) == (2, 4)
+    batcher.stop()
+    assert function.batches == [[1], [2]]
+
+
+@pytest.mark.micro_batching
+def test_concurrent_reranks_share_predict_calls(fake_retriever):
+    retriever = fake_retriever(FakeRanker())
+    retriever.start_micro_batching(max_queries=8, max_pairs=64, max_wait_ms=500)
+
+    def _rerank(i):
+        documents = [Document(id=f"{i}-{j}", data="x" * (j + 1),
+                              metadata=MetaData(title="", source_species="", data_source="test"))
+                     for j in range(4)]
+        return [doc.id for doc in retriever.rerank_batch([f"query {i}"], [documents])[0]]
+
+    results = _concurrently(_rerank, list(range(8)))
+    retriever.stop_micro_batching()
+    assert results == [[f"{i}-{j}" for j in (3, 2, 1, 0)] for i in range(8)]
+    assert retriever.document_ranker.calls == [32]
+    assert retriever.rerank_batchers == {}
+    assert retriever.micro_batch_stats() == {}
+
+
+@pytest.mark.micro_batching
+def test_concurrent_retrievals_match_sequential_ones(create_retriever, monkeypatch):
+    queries = ["Do platypuses lay eggs?", "Tell me about crocodiles", "Are penguins flightless?",
+               "Which birds cannot fly?"]
+    expected = [[doc.id for doc in create_retriever.retrieve(query, threshold=-1)] for query in queries]
+    monkeypatch.setattr(create_retriever, "rerank_cache", RerankScoreCache())
+    create_retriever.start_micro_batching(max_wait_ms=200)
+    try:
+        found = _concurrently(lambda query: [doc.id for doc in create_retriever.retrieve(query, threshold=-1)],
+                              queries)
+        stats = create_retriever.micro_batch_stats()
+    finally:
+        create_retriever.stop_micro_batching()
+    assert found == expected
+    rerank_stats = stats[f"rerank {create_retriever.ranker_model_name}"]
+    assert rerank_stats.batches < len(queries)
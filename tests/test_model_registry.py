@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+import torch
+
+from rag import model_registry
+from rag.model_registry import ModelRegistry
+
+
+class _FakeModel:
+    device = "cpu"
+
+
+@pytest.mark.model_registry
+def test_registry_loads_each_model_once():
+    registry = ModelRegistry()
+    loads = []
+
+    def _loader():
+        loads.append(1)
+        return _FakeModel()
+
+    first = registry.get("fake", "model-a", None, _loader)
+    second = registry.get("fake", "model-a", None, _loader)
+    assert first is second
+    assert len(loads) == 1
+    stats = registry.report()
+    assert len(stats) == 1
+    assert stats[0].requests == 2
+    assert stats[0].load_seconds >= 0
+
+
+@pytest.mark.model_registry
+def test_registry_keys_on_device():
+    registry = ModelRegistry()
+    cpu = registry.get("fake", "model-a", "cpu", _FakeModel)
+    other = registry.get("fake", "model-a", "cuda", _FakeModel)
+    assert cpu is not other
+    assert len(registry.report()) == 2
+
+
+@pytest.mark.model_registry
+def test_registry_concurrent_requests_share_one_load():
+    registry = ModelRegistry()
+    loads = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def _loader():
+        loads.append(1)
+        return _FakeModel()
+
+    def _worker():
+        barrier.wait()
+        results.append(registry.get("fake", "model-a", None, _loader))
+
+    threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert all(result is results[0] for result in results)
+
+
+class _FakeSentenceTransformer:
+    def __init__(self, model_name, device):
+        self.device = torch.device(device)
+        self.pool_devices = []
+
+    def start_multi_process_pool(self, target_devices):
+        self.pool_devices.append(self.device.type)
+        self.device = torch.device("cpu")
+        return {"processes": target_devices, "model": self}
+
+
+@pytest.mark.model_registry
+# The meta device stands in for a GPU
+@pytest.mark.parametrize("device", ["cpu", "meta"])
+def test_embedding_pool_leaves_the_shared_model_on_its_device(monkeypatch, device):
+    monkeypatch.setattr(model_registry, "SentenceTransformer", _FakeSentenceTransformer)
+    registry = ModelRegistry()
+    shared = registry.sentence_transformer("model-a", device)
+
+    pool = registry.embedding_pool("model-a", workers=2, device=device)
+    assert pool["processes"] == ["cpu", "cpu"]
+    assert shared.device == torch.device(device)
+    assert (pool["model"] is shared) == (device == "cpu")
+    assert pool["model"].pool_devices == ["cpu"]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from rag.vectorstore import COLLECTION_NAME, EMBEDDER_MODEL_KEY, VectorStore
+from tests.utilities.documents import seed_record
+
+
+class _CountingEmbedder:
+    """Embedder stand-in that records every text it embeds"""
+
+    def __init__(self, model_name="fake"):
+        self.model_name = model_name
+        self.embedded = []
+
+    def embed_batch_array(self, texts):
+        self.embedded.extend(texts)
+        return np.array([[float(len(text)), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+    def embed_queries_array(self, queries):
+        return self.embed_batch_array(queries)
+
+
+@pytest.fixture
+def seed_file(tmp_path):
+    path = tmp_path / "seed.jsonl"
+    path.write_text("\n".join(seed_record(i) for i in range(6)) + "\n")
+    return path
+
+
+@pytest.mark.persistence
+def test_reopened_store_keeps_its_documents(seed_file, tmp_path):
+    VectorStore(embedder=_CountingEmbedder(), persist_path=tmp_path / "index").seed_documents(seed_file)
+
+    store = VectorStore(embedder=_CountingEmbedder(), persist_path=tmp_path / "index")
+    assert sorted(store.stored_ids(), key=int) == [str(i) for i in range(6)]
+    assert store.query("number 4", n_results=1, mode="lexical")[0].id == "4"
+
+
+@pytest.mark.persistence
+def test_reseeding_unchanged_data_embeds_nothing(seed_file, tmp_path):
+    VectorStore(embedder=_CountingEmbedder(), persist_path=tmp_path / "index").seed_documents(seed_file)
+
+    embedder = _CountingEmbedder()
+    stats = VectorStore(embedder=embedder, persist_path=tmp_path / "index").seed_documents(seed_file)
+    assert (stats.added, stats.updated, stats.unchanged, stats.removed) == (0, 0, 6, 0)
+    assert embedder.embedded == []
+
+
+@pytest.mark.persistence
+def test_another_embedder_model_rebuilds_the_collection(seed_file, tmp_path):
+    VectorStore(embedder=_CountingEmbedder(), persist_path=tmp_path / "index").seed_documents(seed_file)
+
+    embedder = _CountingEmbedder(model_name="other")
+    store = VectorStore(embedder=embedder, persist_path=tmp_path / "index")
+    assert list(store.stored_ids()) == []
+    assert store.client.get_collection(COLLECTION_NAME).metadata[EMBEDDER_MODEL_KEY] == "other"
+
+    stats = store.seed_documents(seed_file)
+    assert stats.added == 6
+    assert len(embedder.embedded) == 6
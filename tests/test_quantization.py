@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks._data import clustered_embeddings, recall
+from rag.vector_index import NumpyIndex
+
+N = 2000
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    embeddings = clustered_embeddings(N + 50, dimensions=48, clusters=40)
+    ids = [str(i) for i in range(N)]
+    exact = NumpyIndex(mode="exact")
+    exact.add(ids=ids, embeddings=embeddings[:N])
+    expected = exact.query(embeddings[N:], n_results=10, include=[])["ids"]
+    return ids, embeddings[:N], embeddings[N:], expected
+
+
+@pytest.mark.quantization
+@pytest.mark.parametrize("quantization, max_resident", [("float16", 0.52), ("int8", 0.27)])
+def test_quantized_index_saves_memory_and_rescoring_restores_recall(corpus, quantization, max_resident):
+    ids, embeddings, queries, expected = corpus
+    index = NumpyIndex(mode="exact", quantization=quantization)
+    for start in range(0, N, 500):  # later batches widen the int8 range
+        index.add(ids=ids[start:start + 500], embeddings=embeddings[start:start + 500])
+    results = index.query(queries, n_results=10, include=["embeddings", "distances"])
+
+    memory = index.memory_usage()
+    assert memory.resident_bytes <= max_resident * memory.float32_bytes
+    assert memory.disk_bytes == N * embeddings.shape[1] * 4
+    assert recall(results["ids"], expected) >= 0.99
+    # Returned embeddings and distances are full precision
+    first = embeddings[int(results["ids"][0][0])]
+    np.testing.assert_allclose(results["embeddings"][0][0], first)
+    assert results["distances"][0][0] == pytest.approx(float(((queries[0] - first) ** 2).sum()), rel=1e-4)
+
+
+@pytest.mark.quantization
+@pytest.mark.parametrize("mode", ["ivf", "hnsw"])
+def test_quantized_approximate_modes(corpus, mode):
+    ids, embeddings, queries, expected = corpus
+    index = NumpyIndex(mode=mode, quantization="int8", exact_search_limit=0, ef_construction=48)
+    index.add(ids=ids, embeddings=embeddings, metadatas=[{"even": i % 2 == 0} for i in range(N)])
+
+    assert recall(index.query(queries, n_results=10, include=[])["ids"], expected) >= 0.9
+    filtered = index.query(queries, n_results=10, where={"even": True}, include=[])
+    assert all(int(id) % 2 == 0 for row in filtered["ids"] for id in row)
+
+
+@pytest.mark.quantization
+def test_quantized_index_survives_compaction_and_removes_its_file(corpus):
+    ids, embeddings, queries, _ = corpus
+    index = NumpyIndex(mode="exact", quantization="int8")
+    index.add(ids=ids, embeddings=embeddings)
+    index.delete(ids=ids[:1000])
+    path = index._full_precision_path
+
+    assert index.count() == 1000
+    assert set(index.query(queries, n_results=5, include=[])["ids"][0]) <= set(ids[1000:])
+    assert os.path.exists(path)
+    del index
+    assert not os.path.exists(path)
+
+
+@pytest.mark.quantization
+def test_unknown_quantization_is_rejected():
+    with pytest.raises(ValueError):
+        NumpyIndex(quantization="int4")
@@ -0,0 +1,95 @@
+import time
+
+import openai
+import pytest
+
+import rag.rate_limit as rate_limit
+from rag.llm import OpenAI_LLM
+from rag.rate_limit import RateLimiter, RetryPolicy, TokenBucket
+from tests.utilities.fake_clock import FakeClock
+
+RATE_LIMITED = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(rate_limit, "LLM_CALL_STATS", rate_limit.LLMCallStats())
+    monkeypatch.setattr(rate_limit, "LLM_RETRY_POLICY", RetryPolicy(max_retries=3, base_delay=0.01, max_delay=1))
+
+
+@pytest.mark.rate_limit
+def test_token_bucket_refills_per_minute():
+    clock = FakeClock()
+    bucket = TokenBucket(per_minute=60, clock=clock)
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.now = 2.0
+    assert bucket.reserve(1) == 0
+
+
+@pytest.mark.rate_limit
+def test_rate_limiter_waits_for_the_tighter_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1200, clock=clock)
+    assert limiter.reserve(1200) == 0
+    assert limiter.reserve(100) == pytest.approx(5.0)
+
+
+@pytest.mark.rate_limit
+def test_retries_429_honouring_retry_after(fake_openai):
+    fake_openai.enqueue(429, RATE_LIMITED, {"Retry-After": "0.2"})
+    fake_openai.enqueue(429, RATE_LIMITED, {"Retry-After": "0.2"})
+    llm = OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url)
+    start = time.perf_counter()
+    assert llm.generate_response("Hi", "gpt-4o-mini") == "True"
+    assert time.perf_counter() - start >= 0.4
+    assert rate_limit.LLM_CALL_STATS.retries == 2
+    assert rate_limit.LLM_CALL_STATS.failures == 0
+
+
+@pytest.mark.rate_limit
+def test_gives_up_after_max_retries(fake_openai):
+    llm = OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url)
+    llm.generate_response("Hi", "gpt-4o-mini")
+    for _ in range(4):
+        fake_openai.enqueue(429, RATE_LIMITED)
+    with pytest.raises(openai.RateLimitError):
+        llm.generate_response("Hi", "gpt-4o-mini")
+    assert rate_limit.LLM_CALL_STATS.retries == 3
+    assert rate_limit.LLM_CALL_STATS.failures == 1
+
+
+@pytest.mark.rate_limit
+def test_does_not_retry_client_errors(fake_openai):
+    llm = OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url)
+    llm.generate_response("Hi", "gpt-4o-mini")
+    fake_openai.enqueue(400, {"error": {"message": "bad request"}})
+    with pytest.raises(openai.BadRequestError):
+        llm.generate_response("Hi", "gpt-4o-mini")
+    assert rate_limit.LLM_CALL_STATS.retries == 0
+
+
+@pytest.mark.rate_limit
+def test_does_not_retry_an_exhausted_quota(fake_openai):
+    llm = OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url)
+    llm.generate_response("Hi", "gpt-4o-mini")
+    fake_openai.enqueue(429, {"error": {"message": "You exceeded your current quota", "type": "insufficient_quota",
+                                        "code": "insufficient_quota"}})
+    with pytest.raises(openai.RateLimitError):
+        llm.generate_response("Hi", "gpt-4o-mini")
+    assert rate_limit.LLM_CALL_STATS.retries == 0
+    assert rate_limit.LLM_CALL_STATS.failures == 1
+
+
+@pytest.mark.rate_limit
+def test_shared_limiter_throttles_requests(fake_openai, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "LLM_RATE_LIMITER", RateLimiter(requests_per_minute=600, clock=clock))
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    llm = OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url)
+    rate_limit.LLM_RATE_LIMITER.requests.reserve(600)
+    llm.generate_response("Hi", "gpt-4o-mini")
+    # models.list and the completion each wait 0.1s for the bucket to refill
+    assert clock.now == pytest.approx(0.2)
+    assert rate_limit.LLM_CALL_STATS.throttled == 2
+    assert rate_limit.LLM_CALL_STATS.throttle_seconds == pytest.approx(0.2)
@@ -0,0 +1,160 @@
+import dataclasses
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from rag.model_registry import MODEL_REGISTRY
+from rag.retriever import BI_ENCODER_RANKER, SCORE_DELTA, CascadeStats, Retriever
+from schema.document import Document, MetaData
+
+
+class FakeRanker:
+    """Cross-encoder stand-in that scores documents from a table and records its calls"""
+
+    def __init__(self, scores: dict[str, float]):
+        self.scores = scores
+        self.calls = []
+
+    def predict(self, pairs):
+        self.calls.append([text for _, text in pairs])
+        return np.array([self.scores[text] for _, text in pairs])
+
+
+CHEAP = {"a": 0.9, "b": 0.5, "c": 0.45, "d": 0.1, "e": 0.05}
+HEAVY = {"a": 0.3, "b": 0.8, "c": 0.6, "d": 0.99, "e": 0.99}
+
+
+def _documents(texts: str) -> list[Document]:
+    return [Document(id=text, data=text, metadata=MetaData(title=text, source_species="", data_source="test"))
+            for text in texts]
+
+
+@pytest.fixture
+def cascade_retriever(fake_retriever):
+    """Build a Retriever wired to the fake heavy and cheap rankers"""
+    def _factory(cascade: bool = True, top_m: int = 3, early_exit: bool = False) -> Retriever:
+        return fake_retriever(FakeRanker(HEAVY), ranker_model_name="heavy",
+                              cascade_ranker_name="cheap" if cascade else None,
+                              cascade_ranker=FakeRanker(CHEAP) if cascade else None,
+                              cascade_top_m=top_m, early_exit=early_exit, early_exit_margin=SCORE_DELTA)
+    return _factory
+
+
+@pytest.mark.rerank_cascade
+def test_without_cascade_every_candidate_goes_to_the_heavy_ranker(cascade_retriever):
+    retriever = cascade_retriever(cascade=False)
+    ranked = retriever.rerank_batch(["q"], [_documents("abcde")])[0]
+    assert [doc.id for doc in ranked] == ["d", "e", "b", "c", "a"]
+    assert retriever.document_ranker.calls == [list("abcde")]
+
+
+@pytest.mark.rerank_cascade
+def test_cascade_sends_only_the_cheap_top_m_to_the_heavy_ranker(cascade_retriever):
+    retriever = cascade_retriever(top_m=3)
+    ranked = retriever.rerank_batch(["q"], [_documents("edcba")])[0]
+    assert retriever.cascade_ranker.calls == [list("edcba")]
+    assert retriever.document_ranker.calls == [list("abc")]
+    # The heavy ranking comes first, then the candidates it did not see in cheap order
+    assert [doc.id for doc in ranked] == ["b", "c", "a", "d", "e"]
+    assert [doc.rank for doc in ranked] == pytest.approx([0.8, 0.6, 0.3, 0.1, 0.05])
+    assert retriever.cascade_stats == CascadeStats(queries=1, early_exits=0, cheap_pairs=5, heavy_pairs=3)
+
+
+@pytest.mark.rerank_cascade
+def test_cascade_skips_the_cheap_ranker_when_few_candidates(cascade_retriever):
+    retriever = cascade_retriever(top_m=3)
+    ranked = retriever.rerank_batch(["q"], [_documents("bc")])[0]
+    assert retriever.cascade_ranker.calls == []
+    assert [doc.id for doc in ranked] == ["b", "c"]
+
+
+@pytest.mark.rerank_cascade
+def test_early_exit_keeps_the_cheap_ranking_when_decisive(cascade_retriever):
+    retriever = cascade_retriever(top_m=3, early_exit=True)
+    ranked = retriever.rerank_batch(["q"], [_documents("abcde")], threshold=0.5)[0]
+    assert retriever.document_ranker.calls == []
+    assert [doc.id for doc in ranked] == ["a", "b", "c", "d", "e"]
+    assert ranked[0].rank == pytest.approx(0.9)
+    assert retriever.cascade_stats.early_exits == 1
+
+
+@pytest.mark.rerank_cascade
+@pytest.mark.parametrize("texts,threshold", [
+    ("abcde", 0.95),  # top cheap score below the threshold
+    ("bcde", 0.3),    # top cheap score clears the threshold, but leads by less than SCORE_DELTA
+])
+def test_early_exit_falls_through_to_the_heavy_ranker(cascade_retriever, texts, threshold):
+    retriever = cascade_retriever(top_m=3, early_exit=True)
+    ranked = retriever.rerank_batch(["q"], [_documents(texts)], threshold=threshold)[0]
+    assert len(retriever.document_ranker.calls) == 1
+    assert ranked[0].rank == pytest.approx(max(HEAVY[text] for text in retriever.document_ranker.calls[0]))
+    assert retriever.cascade_stats.early_exits == 0
+
+
+@pytest.mark.rerank_cascade
+def test_cascade_batches_each_stage_across_queries(cascade_retriever):
+    retriever = cascade_retriever(top_m=2, early_exit=True)
+    ranked = retriever.rerank_batch(["q1", "q2", "q3"], [_documents("abcde"), _documents("bcde"), []], threshold=0.5)
+    assert len(retriever.cascade_ranker.calls) == 1 and len(retriever.document_ranker.calls) == 1
+    assert retriever.document_ranker.calls == [list("bc")]
+    assert [[doc.id for doc in documents] for documents in ranked] == [list("abcde"), list("bcde"), []]
+
+
+class _SlowStats(CascadeStats):
+    """CascadeStats that yields to other threads between reading and writing a counter"""
+
+    def __setattr__(self, name, value):
+        time.sleep(0.0001)
+        super().__setattr__(name, value)
+
+
+@pytest.mark.rerank_cascade
+def test_cascade_stats_count_every_concurrent_query(cascade_retriever):
+    retriever = cascade_retriever(top_m=3, early_exit=True)
+    retriever.cascade_stats = _SlowStats()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda texts: retriever.rerank_batch(["q"], [_documents(texts)], threshold=0.5),
+                          ["abcde", "edcb"] * 50))
+    assert dataclasses.astuple(retriever.cascade_stats) == (100, 50, 450, 150)
+
+
+@pytest.mark.rerank_cascade
+def test_unpromoted_candidates_never_outrank_the_heavy_ranking(fake_retriever):
+    cheap = {"a": 0.9, "b": 0.8, "c": 0.7}
+    heavy = {"a": 0.2, "b": 0.1, "c": 0.0}
+    retriever = fake_retriever(FakeRanker(heavy), cascade_ranker_name="cheap", cascade_ranker=FakeRanker(cheap),
+                               cascade_top_m=2)
+    ranked = retriever.rerank_batch(["q"], [_documents("abc")])[0]
+    assert [doc.id for doc in ranked] == ["a", "b", "c"]
+    assert [doc.rank for doc in ranked] == pytest.approx([0.2, 0.1, 0.1])
+
+
+@pytest.mark.rerank_cascade
+def test_bi_encoder_cascade_rejects_early_exit(fake_retriever):
+    with pytest.raises(ValueError):
+        fake_retriever(FakeRanker(HEAVY), cascade_ranker_name=BI_ENCODER_RANKER, early_exit=True)
+    retriever = fake_retriever(FakeRanker(HEAVY), cascade_ranker_name=BI_ENCODER_RANKER, cascade_top_m=2)
+    ranked = retriever.rerank_batch(["q"], [_documents("abcde")])[0]
+    assert len(ranked) == 5 and retriever.cascade_stats.heavy_pairs == 2
+
+
+@pytest.mark.rerank_cascade
+@pytest.mark.parametrize("bi_encoder", [True, False])
+def test_cascaded_retriever_finds_the_same_top_document(create_retriever, monkeypatch, bi_encoder):
+    """Pruning to the cheap top 3 must not change the document the heavy ranker puts first"""
+    queries = ["Do platypuses lay eggs?", "Tell me about crocodiles", "Are penguins flightless?"]
+    expected = [create_retriever.retrieve(query, n_results=10, threshold=-1)[0].id for query in queries]
+    ranker_name = BI_ENCODER_RANKER if bi_encoder else create_retriever.ranker_model_name
+    monkeypatch.setattr(create_retriever, "cascade_ranker_name", ranker_name)
+    monkeypatch.setattr(create_retriever, "cascade_ranker",
+                        None if bi_encoder else MODEL_REGISTRY.cross_encoder(ranker_name))
+    monkeypatch.setattr(create_retriever, "cascade_top_m", 3)
+    monkeypatch.setattr(create_retriever, "cascade_stats", CascadeStats())
+
+    for query, expected_id in zip(queries, expected):
+        documents = create_retriever.retrieve(query, n_results=10, threshold=-1)
+        assert documents[0].id == expected_id
+    assert create_retriever.cascade_stats.queries == len(queries)
+    assert create_retriever.cascade_stats.heavy_pairs <= 3 * len(queries)
@@ -179,3 +179,15 @@ def test_fallback_logic_for_garbage_queries(create_retriever, query, n_results,
     assert len(documents) == 1 
     assert documents[0].id == 'insufficient_relevance'
 
+
+@pytest.mark.batch_retrieval
+@pytest.mark.parametrize("n_results,threshold", [(1, 0.5), (5, -1), (3, 0.9)])
+def test_retrieve_batch_matches_retrieve(create_retriever, n_results, threshold):
+    """Batched retrieval must return the same documents, ranks and fallbacks per query as retrieve"""
+    queries = ["Do platypuses lay eggs?", "Tell me all about whales", "asdfew?", "Which reptiles are oviparous?"]
+    batched = create_retriever.retrieve_batch(queries, n_results, threshold)
+    assert len(batched) == len(queries)
+    for query, batch_documents in zip(queries, batched):
+        documents = create_retriever.retrieve(query, n_results, threshold)
+        assert [doc.id for doc in batch_documents] == [doc.id for doc in documents]
+        assert [doc.rank for doc in batch_documents] == pytest.approx([doc.rank for doc in documents], abs=1e-5)
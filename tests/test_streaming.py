@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from rag.completion_cache import InMemoryCompletionCache
+from rag.generator import Generator
+from rag.llm import OpenAI_LLM
+from rag.pipeline import RagPipeline
+from schema.generator_config import GeneratorConfig
+from tests.utilities.documents import PLATYPUS, StubRetriever
+
+REPLY = "Yes, platypuses lay eggs even though they are mammals."
+
+
+STREAMING_SERVER = pytest.mark.parametrize("fake_openai", [{"reply": REPLY, "token_delay": 0.05}], indirect=True)
+
+
+@pytest.mark.streaming
+@STREAMING_SERVER
+def test_run_stream_yields_tokens_before_the_completion_finishes(fake_openai):
+    generator = Generator(GeneratorConfig(mode="strict"), llm=OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url))
+    pipeline = RagPipeline(StubRetriever(), generator)
+
+    start = time.perf_counter()
+    stream = pipeline.run_stream("Do platypuses lay eggs?")
+    first = next(stream)
+    first_token_at = time.perf_counter() - start
+    pieces = [first, *stream]
+    total = time.perf_counter() - start
+
+    assert len(pieces) == len(REPLY.split(" "))
+    assert "".join(pieces) == generator.last_response == REPLY
+    assert "Platypus are mammals" in generator.last_prompt
+    assert first_token_at < total / 2
+    stats = generator.last_stream_stats
+    assert stats.tokens == len(pieces)
+    assert 0 < stats.time_to_first_token < stats.seconds
+    assert stats.tokens_per_second > 0
+    assert fake_openai.requests[-1][2]["stream"] is True
+
+
+@pytest.mark.streaming
+@STREAMING_SERVER
+def test_streamed_response_matches_and_fills_completion_cache(fake_openai):
+    cache = InMemoryCompletionCache()
+    generator = Generator(GeneratorConfig(mode="strict"),
+                          llm=OpenAI_LLM(api_key="sk-test", base_url=fake_openai.url, cache=cache))
+    streamed = "".join(generator.generate_stream("Do platypuses lay eggs?", [PLATYPUS]))
+    assert streamed == REPLY
+    assert generator.generate("Do platypuses lay eggs?", [PLATYPUS]) == REPLY
+    assert list(generator.generate_stream("Do platypuses lay eggs?", [PLATYPUS])) == [REPLY]
+    assert fake_openai.count("/v1/chat/completions") == 1
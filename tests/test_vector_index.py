@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from benchmarks._data import clustered_embeddings, recall
+from rag.vector_index import NumpyIndex, VectorIndex, compile_where
+
+N = 1500
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    embeddings = clustered_embeddings(N + 50, dimensions=32, clusters=50)
+    ids = [str(i) for i in range(N)]
+    metadatas = [{"species": ["mammal", "bird", "fish"][i % 3], "year": i} for i in range(N)]
+    return ids, embeddings[:N], metadatas, embeddings[N:]
+
+
+def _brute_force(embeddings, queries, k):
+    distances = ((queries[:, None, :] - embeddings[None, :, :]) ** 2).sum(-1)
+    return [[str(i) for i in np.argsort(row, kind="stable")[:k]] for row in distances]
+
+
+@pytest.mark.vector_index
+def test_exact_search_matches_brute_force(corpus):
+    ids, embeddings, metadatas, queries = corpus
+    index = NumpyIndex(mode="exact")
+    index.add(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=[f"doc {i}" for i in ids])
+    results = index.query(queries, n_results=5)
+
+    assert isinstance(index, VectorIndex)
+    assert results["ids"] == _brute_force(embeddings, queries, 5)
+    assert results["documents"][0][0] == f"doc {results['ids'][0][0]}"
+    assert np.all(np.diff(results["distances"], axis=1) >= 0)
+
+
+@pytest.mark.vector_index
+@pytest.mark.parametrize("mode, params", [("ivf", {"nprobe": 8}), ("hnsw", {"ef_construction": 48, "ef_search": 48})])
+def test_approximate_modes_have_high_recall(corpus, mode, params):
+    ids, embeddings, metadatas, queries = corpus
+    index = NumpyIndex(mode=mode, exact_search_limit=0, **params)
+    index.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+    expected = _brute_force(embeddings, queries, 10)
+
+    assert recall(index.query(queries, n_results=10)["ids"], expected) >= 0.9
+    where = {"species": "bird"}
+    filtered = index.query(queries, n_results=10, where=where)
+    assert all(metadata["species"] == "bird" for row in filtered["metadatas"] for metadata in row)
+
+
+@pytest.mark.vector_index
+def test_upsert_delete_and_get_follow_chroma_semantics(corpus):
+    ids, embeddings, metadatas, _ = corpus
+    index = NumpyIndex(mode="hnsw", ef_construction=32)
+    index.add(ids=ids[:200], embeddings=embeddings[:200], metadatas=metadatas[:200])
+    index.add(ids=ids[:10], embeddings=embeddings[300:310])  # existing ids are skipped
+    assert index.count() == 200
+
+    index.upsert(ids=["5"], embeddings=embeddings[400:401], metadatas=[{"species": "platypus", "year": 0}])
+    assert index.query(embeddings[400:401], n_results=1)["ids"] == [["5"]]
+    assert index.get(where={"species": "platypus"})["ids"] == ["5"]
+
+    index.delete(ids=ids[:100])
+    assert index.count() == 100
+    assert len(index._ids) < 201  # compacted
+    assert index.get(ids=["5", "150"], include=["embeddings"])["ids"] == ["150"]
+    assert index.get(limit=5, offset=10)["ids"] == ids[110:115]
+    assert set(index.query(embeddings[:20], n_results=100)["ids"][0]) == set(ids[100:200])
+
+
+@pytest.mark.vector_index
+def test_compile_where_supports_chroma_operators():
+    metadata = {"species": "mammal", "year": 2001}
+    assert compile_where({"species": "mammal"})(metadata)
+    assert compile_where({"year": {"$gte": 2000}})(metadata)
+    assert not compile_where({"year": {"$lt": 2000}})(metadata)
+    assert compile_where({"$or": [{"species": "bird"}, {"species": {"$in": ["mammal", "fish"]}}]})(metadata)
+    assert not compile_where({"$and": [{"species": "mammal"}, {"year": {"$ne": 2001}}]})(metadata)
+    with pytest.raises(ValueError):
+        compile_where({"year": {"$regex": "20.*"}})
@@ -0,0 +1,27 @@
+import json
+import time
+
+from schema.document import Document, MetaData
+
+PLATYPUS = Document(id="3",
+                    metadata=MetaData(title="Platypus", source_species="mammal", data_source="test"),
+                    data="Platypus are mammals that lay eggs.  They are very strange mammals.")
+
+
+def seed_record(i, data=None) -> str:
+    """A seed data JSONL line for document i"""
+    return json.dumps({"id": str(i),
+                       "metadata": {"title": f"Doc {i}", "source_species": "avian", "data_source": "test"},
+                       "data": data or f"Document number {i}"})
+
+
+class StubRetriever:
+    """Retriever stand-in that returns PLATYPUS for every query, after delay seconds"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def retrieve(self, query, n_results=10, threshold=0.5):
+        if self.delay:
+            time.sleep(self.delay)
+        return [PLATYPUS]
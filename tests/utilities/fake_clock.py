@@ -0,0 +1,14 @@
+class FakeClock:
+    """
+    Clock for code that takes a clock callable.  Tests move time forward by setting now
+    or by calling sleep, which can stand in for time.sleep.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
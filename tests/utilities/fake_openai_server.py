@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Union
+
+
+class FakeOpenAIServer:
+    """
+    Minimal OpenAI-compatible HTTP server for tests.
+
+    Serves GET /v1/models and POST /v1/chat/completions on a local port.  Completions
+    return `reply` (a string, or a callable taking the request body) after `delay`
+    seconds.  Streaming requests receive the reply word by word as server-sent events,
+    `token_delay` seconds apart.  Responses queued with `enqueue` are returned first, which
+    lets tests script errors such as 429s.  Use it as a context manager:
+
+        with FakeOpenAIServer(reply="hello") as server:
+            llm = OpenAI_LLM(api_key="sk-test", base_url=server.url)
+    """
+
+    def __init__(self, reply: Union[str, Callable[[dict], str]] = "True", delay: float = 0.0,
+                 token_delay: float = 0.0):
+        self.reply = reply
+        self.delay = delay
+        self.token_delay = token_delay
+        self.requests: list[tuple[str, str, Optional[dict]]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._scripted: deque = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def enqueue(self, status: int, body: Optional[dict] = None, headers: Optional[dict] = None):
+        """Queue a response to be returned, in order, before the default reply."""
+        self._scripted.append((status, body or {}, headers or {}))
+
+    def count(self, path: str) -> int:
+        """Number of requests received for a path, e.g. '/v1/chat/completions'."""
+        return sum(1 for _, request_path, _ in self.requests if request_path == path)
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _content(self, body: dict) -> str:
+        return self.reply(body) if callable(self.reply) else self.reply
+
+    def _chunks(self, body: dict):
+        words = self._content(body).split(" ")
+        deltas = [{"role": "assistant", "content": ""}] + [
+            {"content": word if i == 0 else " " + word} for i, word in enumerate(words)]
+        for i, delta in enumerate(deltas):
+            yield {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": body.get("model", "fake"),
+                   "choices": [{"index": 0, "delta": delta,
+                                "finish_reason": "stop" if i == len(deltas) - 1 else None}]}
+
+    def _completion(self, body: dict) -> dict:
+        content = self._content(body)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0,
+                         "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: Optional[dict] = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body: dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for chunk in server._chunks(body):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    if server.token_delay:
+                        time.sleep(server.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _track(self, body: Optional[dict]):
+                with server._lock:
+                    server.requests.append((self.command, self.path, body))
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+            def _done(self):
+                with server._lock:
+                    server.in_flight -= 1
+
+            def do_GET(self):
+                self._track(None)
+                try:
+                    if self.path.rstrip("/") == "/v1/models":
+                        self._send(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model",
+                                                                     "created": 0, "owned_by": "fake"}]})
+                    else:
+                        self._send(404, {"error": {"message": "not found"}})
+                finally:
+                    self._done()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                self._track(body)
+                try:
+                    if server.delay:
+                        time.sleep(server.delay)
+                    with server._lock:
+                        scripted = server._scripted.popleft() if server._scripted else None
+                    if scripted is not None:
+                        self._send(*scripted)
+                    elif self.path.rstrip("/") == "/v1/chat/completions" and body.get("stream"):
+                        self._stream(body)
+                    elif self.path.rstrip("/") == "/v1/chat/completions":
+                        self._send(200, server._completion(body))
+                    else:
+                        self._send(404, {"error": {"message": "not found"}})
+                finally:
+                    self._done()
+
+        return Handler
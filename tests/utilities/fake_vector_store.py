@@ -0,0 +1,53 @@
+import numpy as np
+
+from rag.cache import content_hash
+
+
+class FakeEmbedder:
+    """
+    Embedder stand-in that gives every text the same vector and records the size of
+    each batch it embeds, so no model is loaded.
+    """
+    model_name = "fake"
+
+    def __init__(self):
+        self.query_batcher = None
+        self.batches = []
+
+    def embed_batch_array(self, texts):
+        self.batches.append(len(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    def embed_queries_array(self, queries):
+        return self.embed_batch_array(queries)
+
+
+class FakeVectorStore:
+    """
+    In-memory stand-in exposing the VectorStore methods the ingestion pipeline and the
+    retriever use.  Set fail_on_batch to make that write raise.
+    """
+
+    def __init__(self, fail_on_batch=None):
+        self.embedder = FakeEmbedder()
+        self.documents = {}
+        self.document_listeners = []
+        self.writes = 0
+        self.fail_on_batch = fail_on_batch
+
+    def stored_hashes(self, ids):
+        return {id: content_hash(self.documents[id]) for id in ids if id in self.documents}
+
+    def stored_ids(self):
+        yield from list(self.documents)
+
+    def upsert_documents(self, documents, embeddings=None):
+        self.writes += 1
+        if self.writes == self.fail_on_batch:
+            raise RuntimeError("simulated failure")
+        assert embeddings is None or len(embeddings) == len(documents)
+        self.documents.update({document.id: document for document in documents})
+
+    def delete_documents(self, ids):
+        for id in ids:
+            del self.documents[id]